@@ -1,16 +1,38 @@
 
+import contextvars
 import os
-from typing import Dict, List, Optional
+from contextlib import contextmanager
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional, Tuple
 from langchain_openai import ChatOpenAI
-from langchain.memory import ConversationBufferMemory
 from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain.output_parsers import PydanticOutputParser
 from langchain_community.callbacks import get_openai_callback
+from langchain_core.messages import AIMessage, HumanMessage
 from pydantic import BaseModel, Field
 from agents.naming_agent import NamingAgent
 from agents.marketing_agent import MarketingAgent
 from agents.product_agent import ProductAgent
-import json
+from orchestration.cache_warmup import CacheWarmer, PriorityGate, RequestLog, configured_hot_pairs
+from orchestration.checkpoints import CheckpointStore
+from orchestration.circuit_breaker import CircuitBreaker, CircuitOpenError
+from orchestration.coordination import CoordinationBackend, RateLimiter, backend_from_env
+from orchestration.demo_corpus import get_demo_response
+from orchestration.hedging import HedgedRunner, StageTimeoutError
+from orchestration.helper_pool import HelperPool, PoolExhaustedError
+from orchestration.output_profiles import OutputProfile, get_output_profile
+from orchestration.plan_archive import PlanArchive
+from orchestration.postprocess import PostProcessor, extract_store_name, render_export
+from orchestration.profiling import Profiler, profiled
+from orchestration.prompt_cache import PrefixCacheReport, track_prefix_cache
+from orchestration.response_cache import ResponseCache
+from orchestration.routing import ModelRouter, ModelRoutingPolicy, RequestBudget, RoutingDecision
+from orchestration.session_store import SessionStore
+from orchestration.shared_components import chat_model
+from orchestration.spend_ledger import SpendCapError, SpendLedger, api_key_id
+from orchestration.token_budget import estimate_tokens, fit_sections
+from orchestration.tracing import Tracer
 
 # Pydantic models for structured output
 class StoreAnalysis(BaseModel):
@@ -36,6 +58,16 @@ class SuccessFactor(BaseModel):
     risk_mitigation: str = Field(description="Risk mitigation strategies")
     growth_potential: str = Field(description="Growth opportunities")
 
+class LocationDelta(BaseModel):
+    market_fit_score: int = Field(description="How well the base plan fits this location, 1 (poor) to 10 (excellent)")
+    local_demand: str = Field(description="Local demand and participation for the sport")
+    competition: str = Field(description="Local competitors and how to differentiate from them")
+    pricing_adjustment: str = Field(description="How pricing should change from the base plan")
+    product_adjustments: List[str] = Field(description="Assortment changes for this location")
+    marketing_adjustments: List[str] = Field(description="Local channels, partnerships and events to add")
+    risks: str = Field(description="Location-specific risks")
+    recommendation: str = Field(description="One-sentence go/no-go recommendation")
+
 class ComprehensiveAnalysis(BaseModel):
     store_analysis: StoreAnalysis
     products: List[ProductRecommendation]
@@ -45,195 +77,829 @@ class ComprehensiveAnalysis(BaseModel):
     marketing_strategy: str = Field(description="Marketing approach")
     product_strategy: str = Field(description="Product and inventory strategy")
 
+STRUCTURED_ANALYSIS_PROMPT = """You are a sports business consultant. Create a structured analysis of a sports store concept.
+            Provide detailed, actionable insights in the following format:
+            
+            Store Analysis:
+            - Store Name: [Creative name]
+            - Tagline: [Catchy tagline]
+            - Target Audience: [Specific demographics]
+            - Price Range: [Budget, mid-range, premium]
+            - Unique Selling Proposition: [What makes this store special]
+            
+            Product Recommendations:
+            - Category: [Equipment/Apparel/Accessories]
+            - Items: [Specific product list]
+            - Description: [Why these products are recommended]
+            
+            Market Insights:
+            - Trend Analysis: [Current market trends]
+            - Competitive Landscape: [Competition analysis]
+            - Opportunities: [Market opportunities]
+            - Challenges: [Potential challenges]
+            
+            Success Factors:
+            - Key Factors: [Critical success factors]
+            - Risk Mitigation: [Risk strategies]
+            - Growth Potential: [Growth opportunities]"""
+
+# Static instructions first so every request shares a byte-identical prompt prefix; built once per process
+STRUCTURED_ANALYSIS_TEMPLATE = ChatPromptTemplate.from_messages([
+    ("system", STRUCTURED_ANALYSIS_PROMPT + "\n\nPlease provide a comprehensive, structured analysis of the store concept in the request."),
+    ("human", """Sport: {sport}
+Store Name: {store_name}
+Location: {location}
+
+Branding Package: {branding_package}
+Marketing Strategy: {marketing_strategy}
+Product Strategy: {product_strategy}""")
+])
+
+LOCATION_DELTA_PROMPT = """You are a sports retail expansion analyst. The base plan below was written for a {sport} store
+without a specific location. For the candidate location in the request, describe only what changes:
+local demand, competition, pricing, assortment and marketing adjustments, risks and a recommendation.
+Do not restate the parts of the base plan that stay the same.
+
+Base plan:
+{base_plan}"""
+
+# Base plan first so every city of a comparison shares a byte-identical prompt prefix
+LOCATION_DELTA_TEMPLATE = ChatPromptTemplate.from_messages([
+    ("system", LOCATION_DELTA_PROMPT),
+    ("human", "Candidate location: {location}")
+])
+
+# Conversation history key each agent-backed stage reads and appends to
+STAGE_HISTORY_KEYS = {"naming": "naming", "marketing": "marketing", "product": "product"}
+
 class AdvancedLangChainHelper:
     """Enhanced LangChain helper with multi-agent orchestration and advanced features."""
     
-    def __init__(self, api_key: str = None):
-        self.api_key = api_key or os.getenv("OPENAI_API_KEY")
-        self.llm = ChatOpenAI(
-            model="gpt-3.5-turbo",  # Changed from gpt-4 to gpt-3.5-turbo for cost efficiency
-            temperature=0.7,
-            api_key=self.api_key
-        )
-        self.memory = ConversationBufferMemory(
-            memory_key="chat_history",
-            return_messages=True
+    def __init__(self, api_key: str = None, routing_policy: ModelRoutingPolicy = None,
+                 checkpoint_store: CheckpointStore = None, response_cache: ResponseCache = None,
+                 warmup_pairs: List[Tuple[str, Optional[str]]] = None, session_store: SessionStore = None,
+                 plan_archive: PlanArchive = None, tracer: Tracer = None, profiler: Profiler = None,
+                 hedger: HedgedRunner = None, breaker: CircuitBreaker = None, postprocessor: PostProcessor = None,
+                 ledger: SpendLedger = None, coordination: CoordinationBackend = None):
+        self.profiler = profiler or Profiler()
+        with self.profiler.profile("helper_init"):
+            self.api_key = api_key or os.getenv("OPENAI_API_KEY")
+            self.router = ModelRouter(routing_policy)
+            self.checkpoints = checkpoint_store or CheckpointStore()
+            # Cache entries, rate-limit buckets and single-flight locks; shared across processes when configured
+            self.coordination = coordination or backend_from_env()
+            self.response_cache = response_cache or ResponseCache(backend=self.coordination if self.coordination.shared else None)
+            self.rate_limiter = RateLimiter(self.coordination)
+            self.single_flight_wait = float(os.getenv("SINGLE_FLIGHT_WAIT", 120))
+            # Lease of a single-flight lock, renewed while its holder runs, so a crashed holder frees it quickly
+            self.single_flight_lease = float(os.getenv("SINGLE_FLIGHT_LEASE", 30))
+            self.plan_archive = plan_archive or PlanArchive()
+            self.priority_gate = PriorityGate()
+            self.tracer = tracer or Tracer()
+            self.hedger = hedger or HedgedRunner()
+            self.breaker = breaker or CircuitBreaker()
+            self.postprocessor = postprocessor or PostProcessor()
+            self.ledger = ledger or SpendLedger()
+            self.prefix_cache_report = PrefixCacheReport()
+            self.request_log = RequestLog(os.getenv("REQUEST_LOG_PATH")) if os.getenv("REQUEST_LOG_PATH") else None
+            analysis_route = self.router.stage_route("structured_analysis")
+            self.llm = chat_model(analysis_route.models[0], analysis_route.temperature, api_key=self.api_key)
+            # Conversation state lives per session here; agents and this helper stay stateless
+            self.sessions = session_store or SessionStore()
+            
+            # Initialize specialized agents on their routed default models
+            self.naming_agent = NamingAgent(self.api_key, **self._agent_settings("naming"))
+            self.marketing_agent = MarketingAgent(self.api_key, **self._agent_settings("marketing"))
+            self.product_agent = ProductAgent(self.api_key, **self._agent_settings("product"))
+        
+        # Warm the response cache for hot plans in the background
+        self.cache_warmer = CacheWarmer(
+            self._warm_plan,
+            self.response_cache.contains,
+            self.priority_gate,
+            warmup_pairs if warmup_pairs is not None else configured_hot_pairs(self.request_log)
         )
+        self.cache_warmer.start()
+    
+    def _warm_plan(self, sport: str, location: str = None) -> Dict:
+        """Generate a hot plan for the cache warmer, sharing single-flight with interactive requests."""
+        return self._single_flight(sport, location, "comprehensive",
+                                   lambda: self._run_comprehensive_analysis(sport, location, session_id=None))
+    
+    def _agent_settings(self, stage: str) -> Dict:
+        """Model and temperature an agent is built with, taken from the routing policy."""
+        route = self.router.stage_route(stage)
+        return {"model": route.models[0], "temperature": route.temperature}
+    
+    def _get_llm(self, model: str, max_tokens: int = None) -> ChatOpenAI:
+        """Get the shared structured-analysis LLM for a routed model and completion limit."""
+        return chat_model(model, self.router.stage_route("structured_analysis").temperature, max_tokens, self.api_key)
+    
+    def _run_stage(self, budget: RequestBudget, decision: RoutingDecision, stage_fn: Callable[[], Dict],
+                   run_id: str = None, stage_key: str = None, session_id: str = None) -> Dict:
+        """Run a routed stage under its deadline, record its actual token and cost spend and checkpoint the output.
+        
+        Each attempt gets its own callback so stages running on worker threads are counted too.
+        A straggling call may be hedged with a duplicate; the duplicate only runs if its estimate
+        fits the request budget, and its spend is recorded whichever attempt finishes first.
+        Attempts wait for the API key's rate-limit bucket, are refused while the circuit breaker is
+        open and report their outcome to it.
+        The stage is refused before any call once its estimate would pass a daily spend cap, and
+        each attempt's actual spend is appended to the spend ledger. The agent exchange is appended to the session's history when a session id is given.
+        """
+        def attempt(index: int) -> Tuple[Dict, object, object]:
+            self.rate_limiter.wait(api_key_id(self.api_key))
+            if not self.breaker.allow():
+                # Release the attempt's reservation; nothing was spent
+                (budget.record if index == 0 else budget.record_hedge)(decision, 0, 0.0)
+                raise CircuitOpenError("LLM backend circuit breaker is open")
+            result, error = {}, None
+            started = time.perf_counter()
+            try:
+                with get_openai_callback() as cb, track_prefix_cache() as prefix_cache:
+                    result = stage_fn()
+                return result, cb, prefix_cache
+            except Exception as e:
+                error = e
+                raise
+            finally:
+                self.breaker.record(time.perf_counter() - started, error)
+                if index == 0:
+                    budget.record(decision, cb.total_tokens, cb.total_cost, cb.prompt_tokens, cb.completion_tokens,
+                                  result.get("preflight"), prefix_cache.cached_tokens)
+                else:
+                    budget.record_hedge(decision, cb.total_tokens, cb.total_cost)
+                if cb.total_tokens or cb.total_cost:
+                    self.ledger.record(decision.stage, decision.model, cb.prompt_tokens, cb.completion_tokens,
+                                       cb.total_cost, self.api_key, budget.labels, hedge=index > 0)
+                self.prefix_cache_report.record(decision.stage, prefix_cache)
         
-        # Initialize specialized agents
-        self.naming_agent = NamingAgent(self.api_key)
-        self.marketing_agent = MarketingAgent(self.api_key)
-        self.product_agent = ProductAgent(self.api_key)
+        try:
+            self.ledger.check(self.api_key, decision.estimated_cost)
+        except SpendCapError:
+            # Release the stage's reservation; nothing was spent
+            budget.record(decision, 0, 0.0)
+            raise
+        with self.tracer.span(f"stage:{decision.stage}", "stage", model=decision.model, action=decision.action) as span:
+            try:
+                (result, cb, prefix_cache), hedging = self.hedger.run(
+                    (decision.stage, decision.model), attempt, decision.timeout_seconds,
+                    allow_hedge=lambda: self.ledger.allows(self.api_key, decision.estimated_cost) and budget.reserve_hedge(decision)
+                )
+            except StageTimeoutError:
+                decision.timed_out = True
+                span.set(timed_out=True, hedged=decision.hedged)
+                raise
+            decision.hedge_won = hedging["winner"] == 1
+            span.set(prompt_tokens=cb.prompt_tokens, completion_tokens=cb.completion_tokens,
+                     cached_prompt_tokens=prefix_cache.cached_tokens, total_cost=cb.total_cost,
+                     hedged=decision.hedged, hedge_won=decision.hedge_won)
+        if run_id:
+            self.checkpoints.save_stage(run_id, stage_key, result)
+        history_key = STAGE_HISTORY_KEYS.get(decision.stage)
+        if session_id and history_key and "exchange" in result:
+            self.sessions.append(session_id, history_key, [
+                HumanMessage(content=result["exchange"]["input"]),
+                AIMessage(content=result["exchange"]["output"])
+            ])
+        return result
+    
+    def _route(self, stage: str, budget: RequestBudget, profile: OutputProfile) -> RoutingDecision:
+        """Route a stage and cap its completion limit by the analysis tier's output profile."""
+        decision = self.router.route(stage, budget)
+        decision.max_output_tokens = profile.output_limit(stage, decision.max_output_tokens)
+        return decision
+    
+    def _history(self, session_id: Optional[str], agent: str) -> List:
+        """A session's replayed history with one agent; empty when no session is used."""
+        return self.sessions.history(session_id, agent) if session_id else []
         
-        # Initialize output parser
-        self.output_parser = PydanticOutputParser(pydantic_object=ComprehensiveAnalysis)
+    @profiled("basic_analysis")
+    def generate_store_name_and_items(self, sport: str, session_id: Optional[str] = None) -> Dict:
+        """Basic store name and items generation (backward compatibility).
         
-    def generate_store_name_and_items(self, sport: str) -> Dict:
-        """Basic store name and items generation (backward compatibility)."""
+        Runs the basic tier: a small structured name call and a capped product list, in parallel.
+        The product agent replays and extends the given session's history; without one no history is kept.
+        """
+        if not self.breaker.accepting():
+            return self._degraded_basic(sport, "LLM backend circuit breaker is open")
+        profile = get_output_profile("basic")
         try:
-            # Use the naming agent for store name
-            branding_result = self.naming_agent.generate_complete_branding(sport)
-            
-            # Use the product agent for items
-            product_result = self.product_agent.generate_product_strategy(sport, "Store", None)
-            
-            return {
-                'store': branding_result.get('branding_package', 'Store Name'),
-                'goods_name': product_result.get('product_strategy', 'Product List')
-            }
+            self.ledger.check(self.api_key)
+            with self.tracer.trace("basic_analysis", sport=sport, tier=profile.name):
+                budget = self.router.new_budget(sport=sport, session_id=session_id, tier=profile.name)
+                naming = self._route("store_name", budget, profile)
+                product = self._route("product", budget, profile)
+                with ThreadPoolExecutor(max_workers=2) as pool:
+                    name_future = pool.submit(contextvars.copy_context().run, self._run_stage, budget, naming, lambda: self.naming_agent.generate_store_name(
+                        sport, model=naming.model, max_tokens=naming.max_output_tokens
+                    ))
+                    product_future = pool.submit(contextvars.copy_context().run, self._run_stage, budget, product, lambda: self.product_agent.generate_product_strategy(
+                        sport, "Store", None, model=product.model,
+                        max_tokens=product.max_output_tokens, max_input_tokens=product.max_input_tokens,
+                        chat_history=self._history(session_id, "product"), instructions=profile.instructions("product")
+                    ), session_id=session_id)
+                    name_result = name_future.result()
+                    product_result = product_future.result()
+                
+                return {
+                    'store': name_result.get('store_name') or 'Store Name',
+                    'tagline': name_result.get('tagline', ''),
+                    'goods_name': product_result.get('product_strategy', 'Product List'),
+                    'tier': profile.name,
+                    'routing': budget.report()
+                }
         except Exception as e:
+            if isinstance(e, SpendCapError):
+                return self._degraded_basic(sport, str(e), e)
+            if isinstance(e, CircuitOpenError) or not self.breaker.accepting():
+                return self._degraded_basic(sport, str(e))
             return {
                 'store': f"Error generating store name: {str(e)}",
                 'goods_name': f"Error generating products: {str(e)}"
             }
     
-    def generate_comprehensive_store_analysis(self, sport: str, location: str = None) -> Dict:
-        """Generate comprehensive analysis using multi-agent orchestration."""
-        try:
+    @profiled("batch_store_names")
+    def generate_batch_store_names(self, requests: List[Dict]) -> Dict:
+        """Store names and taglines for many sport/location requests, packed into few LLM calls.
+        
+        Each packed call waits for the API key's rate-limit bucket, is refused once a daily spend
+        cap is reached or while the circuit breaker is open, reports its outcome to the breaker and
+        has its spend appended to the ledger.
+        """
+        route = self.router.stage_route("store_name")
+        usage = {"total_tokens": 0, "total_cost": 0.0, "successful_requests": 0}
+        
+        @contextmanager
+        def metered_call():
+            self.ledger.check(self.api_key)
+            self.rate_limiter.wait(api_key_id(self.api_key))
+            if not self.breaker.allow():
+                raise CircuitOpenError("LLM backend circuit breaker is open")
+            error, started = None, time.perf_counter()
             with get_openai_callback() as cb:
-                # Step 1: Generate branding with naming agent
-                branding_result = self.naming_agent.generate_complete_branding(sport, location)
-                
-                # Extract store name from branding result
+                try:
+                    yield
+                except Exception as e:
+                    error = e
+                    raise
+                finally:
+                    self.breaker.record(time.perf_counter() - started, error)
+                    usage["total_tokens"] += cb.total_tokens
+                    usage["total_cost"] += cb.total_cost
+                    usage["successful_requests"] += cb.successful_requests
+                    if cb.total_tokens or cb.total_cost:
+                        self.ledger.record("batch_store_names", route.models[0], cb.prompt_tokens,
+                                           cb.completion_tokens, cb.total_cost, self.api_key)
+        
+        with self.tracer.trace("batch_store_names", requests=len(requests)):
+            names = self.naming_agent.generate_batch_store_names(requests, model=route.models[0], call_guard=metered_call)
+        return {"names": names, "token_usage": usage}
+    
+    @profiled("comprehensive_analysis")
+    def generate_comprehensive_store_analysis(self, sport: str, location: str = None, run_id: str = None,
+                                              session_id: Optional[str] = None, tier: str = "comprehensive") -> Dict:
+        """Generate comprehensive analysis using multi-agent orchestration.
+        
+        Completed stages are checkpointed under the run id; passing the id of a failed run resumes it.
+        A cached plan is served whether or not a run id is given.
+        Agents replay and extend the history of the given session; without one no history is kept.
+        The tier ("standard" or "comprehensive") selects the output profile: sections, lengths and stages.
+        Concurrent misses for the same plan, in this or another process, generate it only once.
+        """
+        get_output_profile(tier)  # reject unknown tiers before touching the cache
+        if self.request_log is not None:
+            self.request_log.record(sport, location)
+        with self.tracer.trace("comprehensive_analysis", sport=sport, location=location, run_id=run_id, tier=tier) as span:
+            cached = self.response_cache.get(sport, location, tier)
+            span.set(cache_hit=cached is not None)
+            if cached is not None:
+                return cached
+            if not self.breaker.accepting():
+                # Backend is failing: answer now from stored content instead of queueing doomed calls
+                span.set(degraded=True)
+                return self._degraded_response(sport, location, "LLM backend circuit breaker is open", run_id)
+            try:
+                self.ledger.check(self.api_key)
+            except SpendCapError as e:
+                span.set(degraded=True, spend_cap=e.scope)
+                return self._degraded_response(sport, location, str(e), run_id, e)
+            with self.priority_gate.interactive():
+                response = self._single_flight(sport, location, tier, lambda: self._run_comprehensive_analysis(
+                    sport, location, run_id, session_id, tier
+                ))
+            if "error" in response:
+                span.set(error=response["error"])
+            return response
+    
+    def _single_flight(self, sport: str, location: str, tier: str, run: Callable[[], Dict]) -> Dict:
+        """Run a cache miss once across every helper sharing the coordination backend.
+        
+        The first caller holds a lock while it generates the plan; the others wait up to
+        SINGLE_FLIGHT_WAIT seconds for it to reach the response cache, and run it themselves
+        if it does not (the first caller failed or its plan was not cacheable). The lock's
+        SINGLE_FLIGHT_LEASE is renewed for as long as the plan is generating, however long that takes.
+        """
+        name = "flight:" + "|".join(ResponseCache.key(sport, location, tier))
+        token = self.coordination.try_lock(name, self.single_flight_lease)
+        deadline = time.monotonic() + self.single_flight_wait
+        while token is None and time.monotonic() < deadline:
+            time.sleep(0.2)
+            if self.response_cache.contains(sport, location, tier):
+                cached = self.response_cache.get(sport, location, tier)
+                if cached is not None:
+                    cached["single_flight"] = True
+                    return cached
+            token = self.coordination.try_lock(name, self.single_flight_lease)
+        try:
+            # The previous holder may have cached the plan between our cache check and taking the lock
+            if token is not None and self.response_cache.contains(sport, location, tier):
+                cached = self.response_cache.get(sport, location, tier)
+                if cached is not None:
+                    return cached
+            with self._renewing_lease(name, token):
+                return run()
+        finally:
+            if token is not None:
+                self.coordination.unlock(name, token)
+    
+    @contextmanager
+    def _renewing_lease(self, name: str, token: Optional[str]):
+        """Renew a single-flight lock every third of its lease while the block runs."""
+        if token is None:
+            yield
+            return
+        stop = threading.Event()
+        
+        def renew():
+            while not stop.wait(self.single_flight_lease / 3):
+                if not self.coordination.renew_lock(name, token, self.single_flight_lease):
+                    return
+        
+        renewer = threading.Thread(target=renew, name="single-flight-lease", daemon=True)
+        renewer.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            renewer.join()
+    
+    def _run_comprehensive_analysis(self, sport: str, location: str = None, run_id: str = None,
+                                    session_id: str = None, tier: str = "comprehensive") -> Dict:
+        """Run the multi-agent pipeline and cache a successful result."""
+        profile = get_output_profile(tier)
+        run_id = run_id or self.checkpoints.new_run_id()
+        self.checkpoints.start_run(run_id, {"sport": sport, "location": location, "tier": tier})
+        completed = self.checkpoints.load_stages(run_id)
+        budget = self.router.new_budget(sport=sport, location=location, session_id=session_id, tier=tier, run_id=run_id)
+        try:
+            # Step 1: Get the store name first with a small structured call
+            name_result = completed.get("store_name")
+            if name_result is None:
+                naming = self._route("store_name", budget, profile)
+                name_result = self._run_stage(budget, naming, lambda: self.naming_agent.generate_store_name(
+                    sport, location, model=naming.model, max_tokens=naming.max_output_tokens
+                ), run_id, "store_name")
+            store_name = name_result["store_name"]
+            branding_result = completed.get("branding")
+            
+            if not store_name:
+                # No structured name: fall back to parsing it out of the full branding package
+                if branding_result is None:
+                    branding = self._route("naming", budget, profile)
+                    branding_result = self._run_stage(budget, branding, lambda: self.naming_agent.generate_complete_branding(
+                        sport, location, model=branding.model,
+                        max_tokens=branding.max_output_tokens, max_input_tokens=branding.max_input_tokens,
+                        chat_history=self._history(session_id, "naming"), instructions=profile.instructions("naming")
+                    ), run_id, "branding", session_id)
                 store_name = self._extract_store_name(branding_result['branding_package'])
+            
+            # Step 2: Run the remaining branding, marketing and product stages in parallel now that the name is known
+            marketing_result = completed.get("marketing")
+            product_result = completed.get("product")
+            # Each stage runs in a copy of this context so its spans nest under the request's trace
+            with ThreadPoolExecutor(max_workers=3) as pool:
+                branding_future = None
+                if branding_result is None:
+                    branding = self._route("naming", budget, profile)
+                    branding_future = pool.submit(contextvars.copy_context().run, self._run_stage, budget, branding, lambda: self.naming_agent.generate_complete_branding(
+                        sport, location, model=branding.model, store_name=store_name,
+                        max_tokens=branding.max_output_tokens, max_input_tokens=branding.max_input_tokens,
+                        chat_history=self._history(session_id, "naming"), instructions=profile.instructions("naming")
+                    ), run_id, "branding", session_id)
                 
-                # Step 2: Generate marketing strategy
-                marketing_result = self.marketing_agent.generate_marketing_strategy(
-                    store_name, sport, location
-                )
+                # Marketing is optional and may be skipped near the budget
+                marketing_future = None
+                if marketing_result is None and "marketing" in profile.skip_stages:
+                    marketing_result = {"marketing_strategy": f"Marketing strategy is not part of the {tier} tier."}
+                elif marketing_result is None:
+                    marketing = self._route("marketing", budget, profile)
+                    if marketing.action == "skipped":
+                        marketing_result = {"marketing_strategy": f"Marketing strategy skipped: {marketing.reason}."}
+                    else:
+                        marketing_future = pool.submit(contextvars.copy_context().run, self._run_stage, budget, marketing, lambda: self.marketing_agent.generate_marketing_strategy(
+                            store_name, sport, location, model=marketing.model,
+                            max_tokens=marketing.max_output_tokens, max_input_tokens=marketing.max_input_tokens,
+                            chat_history=self._history(session_id, "marketing"), instructions=profile.instructions("marketing")
+                        ), run_id, "marketing", session_id)
                 
-                # Step 3: Generate product strategy
-                product_result = self.product_agent.generate_product_strategy(
-                    sport, store_name, location
-                )
+                product_future = None
+                if product_result is None:
+                    product = self._route("product", budget, profile)
+                    product_future = pool.submit(contextvars.copy_context().run, self._run_stage, budget, product, lambda: self.product_agent.generate_product_strategy(
+                        sport, store_name, location, model=product.model,
+                        max_tokens=product.max_output_tokens, max_input_tokens=product.max_input_tokens,
+                        chat_history=self._history(session_id, "product"), instructions=profile.instructions("product")
+                    ), run_id, "product", session_id)
                 
-                # Step 4: Generate comprehensive analysis
-                comprehensive_analysis = self._generate_structured_analysis(
-                    sport, store_name, location, branding_result, marketing_result, product_result
-                )
-                
-                return {
-                    "comprehensive_analysis": comprehensive_analysis,
-                    "branding_package": branding_result['branding_package'],
-                    "marketing_strategy": marketing_result['marketing_strategy'],
-                    "product_strategy": product_result['product_strategy'],
-                    "token_usage": {
-                        "total_tokens": cb.total_tokens,
-                        "total_cost": cb.total_cost
-                    },
-                    "conversation_history": self.memory.chat_memory.messages
+                if branding_future is not None:
+                    branding_result = branding_future.result()
+                if marketing_future is not None:
+                    try:
+                        marketing_result = marketing_future.result()
+                    except StageTimeoutError as e:
+                        # Optional stage: a straggler degrades the plan instead of failing it
+                        marketing_result = {"marketing_strategy": f"Marketing strategy skipped: {e}."}
+                if product_future is not None:
+                    product_result = product_future.result()
+            
+            # Step 3: Generate comprehensive analysis (optional, may be skipped near the budget)
+            comprehensive_analysis = completed.get("structured_analysis")
+            if comprehensive_analysis is None and "structured_analysis" in profile.skip_stages:
+                comprehensive_analysis = {
+                    "structured_analysis": f"Structured analysis is not part of the {tier} tier.",
+                    "sport": sport,
+                    "store_name": store_name,
+                    "location": location
                 }
-                
+            elif comprehensive_analysis is None:
+                analysis = self._route("structured_analysis", budget, profile)
+                if analysis.action == "skipped":
+                    comprehensive_analysis = {
+                        "structured_analysis": f"Structured analysis skipped: {analysis.reason}.",
+                        "sport": sport,
+                        "store_name": store_name,
+                        "location": location
+                    }
+                else:
+                    try:
+                        comprehensive_analysis = self._run_stage(budget, analysis, lambda: self._generate_structured_analysis(
+                            sport, store_name, location, branding_result, marketing_result, product_result,
+                            model=analysis.model, max_tokens=analysis.max_output_tokens,
+                            max_input_tokens=analysis.max_input_tokens
+                        ), run_id, "structured_analysis")
+                    except StageTimeoutError as e:
+                        comprehensive_analysis = {
+                            "structured_analysis": f"Structured analysis skipped: {e}.",
+                            "sport": sport,
+                            "store_name": store_name,
+                            "location": location
+                        }
+            
+            response = {
+                "run_id": run_id,
+                "resumed_stages": sorted(completed),
+                "store_name": store_name,
+                "tagline": name_result.get("tagline", ""),
+                "comprehensive_analysis": comprehensive_analysis,
+                "branding_package": branding_result['branding_package'],
+                "marketing_strategy": marketing_result['marketing_strategy'],
+                "product_strategy": product_result['product_strategy'],
+                "token_usage": {
+                    "total_tokens": budget.spent_tokens,
+                    "total_cost": budget.spent_cost
+                },
+                "routing": budget.report(),
+                "tier": tier,
+                "conversation_history": self.sessions.transcript(session_id) if session_id else [],
+                "source": "live"
+            }
+            response["archive_id"] = self.plan_archive.save(response, sport, location)
+            # Plans degraded by a timed-out stage are not cached, so the next request retries the stage
+            if not any(decision.timed_out for decision in budget.decisions):
+                self.response_cache.set(sport, location, response, tier)
+            # Nothing is left to resume
+            self.checkpoints.delete(run_id)
+            return response
+            
         except Exception as e:
+            self.checkpoints.mark_status(run_id, "failed", str(e))
+            if isinstance(e, SpendCapError):
+                return self._degraded_response(sport, location, str(e), run_id, e)
+            if isinstance(e, CircuitOpenError) or not self.breaker.accepting():
+                return self._degraded_response(sport, location, str(e), run_id)
             return {
                 "error": f"Error in comprehensive analysis: {str(e)}",
-                "fallback": self.generate_store_name_and_items(sport)
+                "run_id": run_id,
+                "fallback": self._checkpoint_fallback(run_id, sport, {d.stage for d in budget.decisions if d.timed_out})
             }
     
-    def _extract_store_name(self, branding_package: str) -> str:
-        """Extract store name from branding package."""
+    def _checkpoint_fallback(self, run_id: str, sport: str, timed_out: set = frozenset()) -> Dict:
+        """Basic store name and items for a failed run, reusing checkpointed stages instead of re-running them.
+        
+        Missing parts are generated at the basic tier through _run_stage, so the calls are
+        spend-capped, metered, rate limited, admitted by the breaker and bounded by the stage
+        deadline like any other stage. A part whose stage just timed out is not retried, so a
+        straggler cannot hold the request for a second deadline.
+        """
+        completed = self.checkpoints.load_stages(run_id)
+        store = (completed.get("store_name") or {}).get("store_name") \
+            or (completed.get("branding") or {}).get("branding_package")
+        goods_name = (completed.get("product") or {}).get("product_strategy")
         try:
-            # Simple extraction - look for patterns like "Store Name:" or "Name:"
-            lines = branding_package.split('\n')
-            for line in lines:
-                if any(keyword in line.lower() for keyword in ['store name:', 'name:', 'brand name:']):
-                    return line.split(':')[-1].strip()
-            return "Sports Store"  # Fallback
-        except:
-            return "Sports Store"
+            if (not store or not goods_name) and not self.breaker.accepting():
+                raise CircuitOpenError("LLM backend circuit breaker is open")
+            profile = get_output_profile("basic")
+            budget = self.router.new_budget(sport=sport, run_id=run_id, tier=profile.name)
+            if not store and timed_out & {"store_name", "naming"}:
+                store = "Error generating store name: the naming stage timed out"
+            if not goods_name and "product" in timed_out:
+                goods_name = "Error generating products: the product stage timed out"
+            if not store:
+                naming = self._route("store_name", budget, profile)
+                store = self._run_stage(budget, naming, lambda: self.naming_agent.generate_store_name(
+                    sport, model=naming.model, max_tokens=naming.max_output_tokens
+                ))['store_name'] or 'Store Name'
+            if not goods_name:
+                product = self._route("product", budget, profile)
+                goods_name = self._run_stage(budget, product, lambda: self.product_agent.generate_product_strategy(
+                    sport, "Store", None, model=product.model,
+                    max_tokens=product.max_output_tokens, max_input_tokens=product.max_input_tokens,
+                    instructions=profile.instructions("product")
+                ))['product_strategy']
+            return {'store': store, 'goods_name': goods_name}
+        except Exception as e:
+            return {
+                'store': store or f"Error generating store name: {str(e)}",
+                'goods_name': goods_name or f"Error generating products: {str(e)}"
+            }
     
-    def _generate_structured_analysis(self, sport: str, store_name: str, location: str,
-                                   branding_result: Dict, marketing_result: Dict, product_result: Dict) -> Dict:
-        """Generate structured analysis using the main LLM."""
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", """You are a sports business consultant. Create a structured analysis of a sports store concept.
-            Provide detailed, actionable insights in the following format:
-            
-            Store Analysis:
-            - Store Name: [Creative name]
-            - Tagline: [Catchy tagline]
-            - Target Audience: [Specific demographics]
-            - Price Range: [Budget, mid-range, premium]
-            - Unique Selling Proposition: [What makes this store special]
-            
-            Product Recommendations:
-            - Category: [Equipment/Apparel/Accessories]
-            - Items: [Specific product list]
-            - Description: [Why these products are recommended]
-            
-            Market Insights:
-            - Trend Analysis: [Current market trends]
-            - Competitive Landscape: [Competition analysis]
-            - Opportunities: [Market opportunities]
-            - Challenges: [Potential challenges]
+    def _degraded_response(self, sport: str, location: str = None, reason: str = "", run_id: str = None,
+                           spend_cap: SpendCapError = None) -> Dict:
+        """Stored plan for a request while the LLM backend is unavailable or a spend cap is reached, labeled as degraded.
+        
+        Tries the response cache, then the most recent archived plan, then the demo corpus.
+        """
+        response = self.response_cache.get(sport, location)
+        if response is None:
+            matches = self.plan_archive.search(sport=sport, location=location, limit=1)
+            response = self.plan_archive.get(matches[0]["id"]) if matches else None
+        if response is None:
+            response = get_demo_response(sport, location)
+        degraded = {"reason": reason, "retry_after": self.breaker.retry_after(), "run_id": run_id}
+        if spend_cap is not None:
+            degraded.update(retry_after=spend_cap.retry_after, spend_cap=spend_cap.scope)
+        if response is None:
+            return {
+                "error": f"AI service temporarily unavailable ({reason}) and no stored plan covers {sport}",
+                "run_id": run_id,
+                "degraded": degraded
+            }
+        degraded["source"] = response["source"]
+        response["degraded"] = degraded
+        return response
+    
+    def _degraded_basic(self, sport: str, reason: str, spend_cap: SpendCapError = None) -> Dict:
+        """Basic store name and items taken from a stored plan while the LLM backend is unavailable."""
+        response = self._degraded_response(sport, None, reason, spend_cap=spend_cap)
+        if "error" in response:
+            return {'store': response["error"], 'goods_name': response["error"], 'degraded': response["degraded"]}
+        return {
+            'store': response['store_name'],
+            'goods_name': response['product_strategy'],
+            'degraded': response['degraded']
+        }
+    
+    @profiled("batch_store_analyses")
+    def generate_batch_store_analyses(self, requests: List[Dict], batch_id: str = None,
+                                      max_workers: int = 1, export_formats: List[str] = None) -> List[Dict]:
+        """Run comprehensive analyses for many sport/location requests.
+        
+        Each item is checkpointed as "<batch_id>-<index>", so re-running a failed batch id
+        only pays for the stages that did not complete. As each item finishes, its section
+        parsing and exports are handed to the post-processing pool while the others are in flight.
+        Items run without a conversation session, so they neither read nor extend anyone's history.
+        """
+        batch_id = batch_id or self.checkpoints.new_run_id()
+        results = [None] * len(requests)
+        postprocessing = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = {
+                pool.submit(self.generate_comprehensive_store_analysis,
+                            request["sport"], request.get("location"), f"{batch_id}-{index}", session_id=None): index
+                for index, request in enumerate(requests)
+            }
+            for future in as_completed(futures):
+                index = futures[future]
+                results[index] = future.result()
+                if "error" not in results[index]:
+                    postprocessing[index] = self.postprocessor.submit(results[index], export_formats or ())
+        for index, derived in postprocessing.items():
+            try:
+                PostProcessor.merge(results[index], derived.result())
+            except Exception as e:
+                results[index]["postprocess_error"] = str(e)
+        return results
+    
+    @profiled("location_comparison")
+    def generate_location_comparison(self, sport: str, locations: List[str], max_workers: int = None,
+                                     tier: str = "comprehensive") -> Dict:
+        """Compare candidate locations for one sport from a shared base plan.
+        
+        The location-independent plan (name, branding, products, marketing) is generated, or served
+        from cache, once; each city then only costs a small structured delta call, run in parallel.
+        """
+        locations = list(dict.fromkeys(location.strip() for location in locations if location and location.strip()))
+        if not locations:
+            return {"error": "Provide at least one location to compare"}
+        max_locations = int(os.getenv("COMPARISON_MAX_LOCATIONS", 25))
+        if len(locations) > max_locations:
+            return {"error": f"Comparisons are limited to {max_locations} locations"}
+        
+        with self.tracer.trace("location_comparison", sport=sport, locations=len(locations)):
+            base = self.generate_comprehensive_store_analysis(sport, None, session_id=None, tier=tier)
+            if "error" in base:
+                return {"error": f"Base plan failed: {base['error']}", "stage": "base_plan", "sport": sport, "locations": locations}
             
-            Success Factors:
-            - Key Factors: [Critical success factors]
-            - Risk Mitigation: [Risk strategies]
-            - Growth Potential: [Growth opportunities]"""),
-            ("human", f"""
-            Sport: {sport}
-            Store Name: {store_name}
-            Location: {location or 'General'}
+            route = self.router.stage_route("location_delta")
+            base_plan = self._base_plan_summary(base, route.models[0], route.max_input_tokens)
+            max_workers = max_workers or int(os.getenv("COMPARISON_MAX_WORKERS", 8))
+            budgets = {location: self.router.new_budget(sport=sport, location=location, tier=tier) for location in locations}
             
-            Branding Package: {branding_result['branding_package']}
-            Marketing Strategy: {marketing_result['marketing_strategy']}
-            Product Strategy: {product_result['product_strategy']}
+            def compare(location: str) -> Dict:
+                budget = budgets[location]
+                delta = self.router.route("location_delta", budget)
+                try:
+                    result = self._run_stage(budget, delta, lambda: self._generate_location_delta(
+                        sport, location, base_plan, model=delta.model, max_tokens=delta.max_output_tokens
+                    ))
+                except Exception as e:
+                    return {"location": location, "error": str(e)}
+                result.pop("preflight", None)
+                return dict(result, total_tokens=budget.spent_tokens, total_cost=budget.spent_cost)
             
-            Please provide a comprehensive, structured analysis.
-            """)
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(locations))) as pool:
+                comparisons = list(pool.map(lambda location: contextvars.copy_context().run(compare, location), locations))
+        
+        base_usage = base.get("token_usage", {}) if base.get("source") == "live" else {}
+        delta_tokens = sum(budget.spent_tokens for budget in budgets.values())
+        delta_cost = sum(budget.spent_cost for budget in budgets.values())
+        return {
+            "sport": sport,
+            "store_name": base["store_name"],
+            "tagline": base.get("tagline", ""),
+            "base_plan": base,
+            "locations": comparisons,
+            "ranking": [item["location"] for item in sorted(
+                (item for item in comparisons if "error" not in item),
+                key=lambda item: item["market_fit_score"], reverse=True
+            )],
+            "token_usage": {
+                "total_tokens": base_usage.get("total_tokens", 0) + delta_tokens,
+                "total_cost": base_usage.get("total_cost", 0.0) + delta_cost,
+                "base_tokens": base_usage.get("total_tokens", 0),
+                "location_tokens": delta_tokens
+            },
+            "routing": {"decisions": [decision.model_dump() for budget in budgets.values() for decision in budget.decisions]},
+            "source": "live"
+        }
+    
+    def _base_plan_summary(self, base: Dict, model: str, max_input_tokens: int = None) -> str:
+        """Location-independent parts of a plan, shrunk to leave room for the delta prompt."""
+        sections, _ = fit_sections({
+            "branding_package": base['branding_package'],
+            "product_strategy": base['product_strategy'],
+            "marketing_strategy": base['marketing_strategy']
+        }, max_input_tokens - estimate_tokens(LOCATION_DELTA_PROMPT, model) - 60 if max_input_tokens else None, model)
+        return "\n\n".join([
+            f"Store Name: {base['store_name']}",
+            f"Branding:\n{sections['branding_package']}",
+            f"Products:\n{sections['product_strategy']}",
+            f"Marketing:\n{sections['marketing_strategy']}"
         ])
+    
+    def _generate_location_delta(self, sport: str, location: str, base_plan: str,
+                                 model: str = None, max_tokens: int = None) -> Dict:
+        """Location-specific adjustments to a base plan, as structured fields."""
+        model = model or self.llm.model_name
+        chain = LOCATION_DELTA_TEMPLATE | self._get_llm(model, max_tokens).with_structured_output(LocationDelta)
+        delta = chain.invoke({"sport": sport, "base_plan": base_plan, "location": location})
+        return dict(
+            delta.model_dump(),
+            location=location,
+            model=model,
+            preflight={
+                "estimated_prompt_tokens": estimate_tokens(LOCATION_DELTA_PROMPT + base_plan + location, model) + 20,
+                "max_input_tokens": None,
+                "max_output_tokens": max_tokens,
+                "dropped_history_messages": 0,
+                "truncated_input": False
+            }
+        )
+    
+    def _extract_store_name(self, branding_package: str) -> str:
+        """Extract store name from branding package."""
+        return extract_store_name(branding_package)
+    
+    def _generate_structured_analysis(self, sport: str, store_name: str, location: str,
+                                   branding_result: Dict, marketing_result: Dict, product_result: Dict,
+                                   model: str = None, max_tokens: int = None, max_input_tokens: int = None) -> Dict:
+        """Generate structured analysis using the main LLM."""
+        model = model or self.llm.model_name
         
-        chain = prompt | self.llm
-        response = chain.invoke({})
+        # Pre-flight: shrink the verbatim hand-off so the prompt fits the stage's input budget
+        frame_tokens = estimate_tokens(STRUCTURED_ANALYSIS_PROMPT, model) + estimate_tokens(
+            f"{sport} {store_name} {location or 'General'}", model) + 80
+        sections, truncated = fit_sections({
+            "branding_package": branding_result['branding_package'],
+            "marketing_strategy": marketing_result['marketing_strategy'],
+            "product_strategy": product_result['product_strategy']
+        }, max_input_tokens - frame_tokens if max_input_tokens else None, model)
+        
+        chain = STRUCTURED_ANALYSIS_TEMPLATE | self._get_llm(model, max_tokens)
+        response = chain.invoke({
+            "sport": sport,
+            "store_name": store_name,
+            "location": location or 'General',
+            **sections
+        })
         
         return {
             "structured_analysis": response.content,
             "sport": sport,
             "store_name": store_name,
-            "location": location
+            "location": location,
+            "preflight": {
+                "estimated_prompt_tokens": frame_tokens + sum(estimate_tokens(text, model) for text in sections.values()),
+                "max_input_tokens": max_input_tokens,
+                "max_output_tokens": max_tokens,
+                "dropped_history_messages": 0,
+                "truncated_input": truncated
+            }
         }
     
-    def get_conversation_history(self) -> List:
-        """Get conversation history for context."""
-        return self.memory.chat_memory.messages
+    def search_archived_plans(self, query: str = None, sport: str = None, location: str = None,
+                              limit: int = 20) -> List[Dict]:
+        """Search previously generated plans by full text, sport and location."""
+        return self.plan_archive.search(query, sport, location, limit)
+    
+    def get_archived_plan(self, plan_id: int) -> Optional[Dict]:
+        """Load an archived plan so it can be reused without regenerating it."""
+        return self.plan_archive.get(plan_id)
     
-    def clear_memory(self):
-        """Clear conversation memory."""
-        self.memory.clear()
+    def get_prefix_cache_report(self) -> Dict[str, Dict]:
+        """Provider prompt-cache hit rate per stage since this helper started."""
+        return self.prefix_cache_report.report()
     
+    def get_conversation_history(self, session_id: str) -> List[Dict[str, str]]:
+        """Get a session's conversation history as role/content dicts."""
+        return self.sessions.transcript(session_id)
+    
+    def clear_memory(self, session_id: str):
+        """Clear a session's conversation memory."""
+        self.sessions.clear(session_id)
+    
+    @profiled("export_analysis")
     def export_analysis(self, analysis: Dict, format: str = "json") -> str:
         """Export analysis in specified format."""
-        if format.lower() == "json":
-            return json.dumps(analysis, indent=2)
-        elif format.lower() == "txt":
-            # Convert to readable text format
-            text_output = f"""
-SPORTS STORE ANALYSIS
-====================
-
-Sport: {analysis.get('sport', 'N/A')}
-Store Name: {analysis.get('store_name', 'N/A')}
-Location: {analysis.get('location', 'N/A')}
-
-BRANDING PACKAGE:
-{analysis.get('branding_package', 'N/A')}
-
-MARKETING STRATEGY:
-{analysis.get('marketing_strategy', 'N/A')}
-
-PRODUCT STRATEGY:
-{analysis.get('product_strategy', 'N/A')}
-
-STRUCTURED ANALYSIS:
-{analysis.get('comprehensive_analysis', {}).get('structured_analysis', 'N/A')}
-            """
-            return text_output
-        else:
-            return str(analysis)
+        return render_export(analysis, format)
+
+_legacy_pool: Optional[HelperPool] = None
+_legacy_pool_lock = threading.Lock()
+
+def get_legacy_helper_pool() -> HelperPool:
+    """Pool of helpers behind the legacy module-level API, created on first use.
+    
+    Pooled helpers share the coordination backend, the thread-safe caches, breaker, hedger and spend
+    ledger, and start no cache warm-up of their own. Legacy calls use no conversation session, so nothing needs resetting.
+    """
+    global _legacy_pool
+    with _legacy_pool_lock:
+        if _legacy_pool is None:
+            coordination = backend_from_env()
+            shared = {
+                "coordination": coordination,
+                "response_cache": ResponseCache(backend=coordination if coordination.shared else None),
+                "breaker": CircuitBreaker(),
+                "hedger": HedgedRunner(),
+                "ledger": SpendLedger(),
+                "plan_archive": PlanArchive()
+            }
+            _legacy_pool = HelperPool(lambda: AdvancedLangChainHelper(warmup_pairs=[], **shared))
+        return _legacy_pool
+
+def legacy_helper_pool_stats() -> Optional[Dict]:
+    """Usage metrics of the legacy helper pool, or None if the legacy API was never called."""
+    return _legacy_pool.stats() if _legacy_pool is not None else None
 
 # Backward compatibility function
 def generate_store_name_and_items(sport: str) -> Dict:
-    """Legacy function for backward compatibility."""
-    helper = AdvancedLangChainHelper()
-    return helper.generate_store_name_and_items(sport)
+    """Legacy function for backward compatibility; runs on a pooled helper without conversation history."""
+    try:
+        with get_legacy_helper_pool().acquire() as helper:
+            return helper.generate_store_name_and_items(sport, session_id=None)
+    except PoolExhaustedError as e:
+        return {
+            'store': f"Error generating store name: {str(e)}",
+            'goods_name': f"Error generating products: {str(e)}"
+        }
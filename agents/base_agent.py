@@ -0,0 +1,84 @@
+from langchain.agents import AgentExecutor, create_openai_tools_agent
+from langchain_openai import ChatOpenAI
+from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain.tools import BaseTool
+from langchain_core.messages import BaseMessage
+from abc import ABC, abstractmethod
+from typing import List
+import os
+from orchestration.token_budget import fit_agent_prompt
+from orchestration.shared_components import chat_model, shared_component
+
+
+def build_agent_prompt(system_prompt: str, task_prompt: str) -> ChatPromptTemplate:
+    """Tools-agent prompt for a system and task prompt."""
+    # Static content first so every request shares a byte-identical prompt prefix; built once per process
+    return ChatPromptTemplate.from_messages([
+        ("system", system_prompt + "\n\n" + task_prompt),
+        MessagesPlaceholder(variable_name="chat_history"),
+        ("human", "{input}"),
+        MessagesPlaceholder(variable_name="agent_scratchpad"),
+    ])
+
+class BaseAgent(ABC):
+    """Chat client, tool-calling executor and budgeted invocation shared by the specialized agents.
+    
+    Subclasses set ``kind``, ``system_prompt``, ``task_prompt`` and ``agent_prompt`` and build
+    their tools in ``_create_tools``.
+    """
+    
+    kind = "base"
+    system_prompt = ""
+    task_prompt = ""
+    agent_prompt: ChatPromptTemplate = None
+    
+    def __init__(self, api_key: str = None, model: str = "gpt-3.5-turbo", temperature: float = 0.7):
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY")
+        self.model = model
+        self.temperature = temperature
+        # Tools, chat clients and executors hold no request state, so every instance shares them
+        self.tools = shared_component(f"{self.kind}_tools", self._create_tools)
+        self.llm = self._create_llm(model)
+        self.agent = self._get_agent()
+        # Static prompt text (system prompt and tool schemas) sent with every call
+        self._static_prompt = "\n".join([self.system_prompt, self.task_prompt] + [f"{t.name}: {t.description}" for t in self.tools])
+    
+    @abstractmethod
+    def _create_tools(self) -> List[BaseTool]:
+        """Tools the agent may call; built once per process and shared."""
+    
+    def _create_llm(self, model: str, max_tokens: int = None) -> ChatOpenAI:
+        """Get the shared chat model client for the given model name and completion limit."""
+        return chat_model(model, self.temperature, max_tokens, self.api_key)
+    
+    def _get_agent(self, model: str = None, max_tokens: int = None) -> AgentExecutor:
+        """Get the shared agent executor for a routed model, building it on first use."""
+        llm = self._create_llm(model or self.model, max_tokens)
+        return shared_component((f"{self.kind}_agent", id(llm)), lambda: self._create_agent(llm))
+    
+    def _create_agent(self, llm: ChatOpenAI = None) -> AgentExecutor:
+        """Create the tool-calling agent executor with the subclass's prompt."""
+        agent = create_openai_tools_agent(llm or self.llm, self.tools, self.agent_prompt)
+        return AgentExecutor(
+            agent=agent,
+            tools=self.tools,
+            verbose=True
+        )
+    
+    def _invoke_agent(self, prompt: str, model: str = None, max_tokens: int = None,
+                      max_input_tokens: int = None, chat_history: List[BaseMessage] = None) -> dict:
+        """Run the agent after fitting the replayed history and request into the input budget.
+        
+        The agent holds no conversation state; callers pass the session history in and
+        record the returned exchange themselves.
+        """
+        history, prompt, preflight = fit_agent_prompt(
+            self._static_prompt, chat_history or [], prompt, max_input_tokens, model or self.model
+        )
+        preflight["max_output_tokens"] = max_tokens
+        response = self._get_agent(model, max_tokens).invoke({"input": prompt, "chat_history": history})
+        return {
+            "output": response["output"],
+            "preflight": preflight,
+            "exchange": {"input": prompt, "output": response["output"]}
+        }
@@ -1,27 +1,83 @@
-from langchain.agents import AgentExecutor, create_openai_tools_agent
+import openai
 from langchain_openai import ChatOpenAI
-from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain.memory import ConversationBufferMemory
+from langchain.prompts import ChatPromptTemplate
 from langchain.tools import BaseTool
-from typing import List
-import os
+from langchain_core.messages import BaseMessage
+from pydantic import BaseModel, Field
+from contextlib import nullcontext
+from typing import Callable, ContextManager, Dict, List
+from agents.base_agent import BaseAgent, build_agent_prompt
+from orchestration.token_budget import MESSAGE_OVERHEAD_TOKENS, estimate_tokens
 
-class NamingAgent:
+
+SYSTEM_PROMPT = """You are a creative branding expert specializing in sports business naming and branding.
+            Your expertise includes:
+            - Creating memorable, marketable store names
+            - Developing catchy taglines and slogans
+            - Suggesting brand colors and visual identity
+            - Understanding sports culture and fan psychology
+            
+            Always consider:
+            - Target audience demographics
+            - Local market appeal
+            - Brand memorability
+            - SEO-friendly naming
+            - Trademark availability (mention if needed)"""
+
+TASK_PROMPT = """Create a complete branding package for the sports store described in the request.
+
+Please provide:
+1. A creative store name, or a short rationale for the store name when the request gives one
+2. A catchy tagline
+3. Brand color suggestions
+4. Brand personality description
+5. Target audience analysis
+
+Make it market-ready and appealing to sports enthusiasts."""
+
+NAME_PROMPT = """You are a creative branding expert specializing in sports business naming.
+Suggest one memorable, market-ready store name and a catchy tagline for the sports store described in the request."""
+
+BATCH_NAME_PROMPT = """You are a creative branding expert specializing in sports business naming.
+Suggest one memorable, market-ready store name and a catchy tagline for each numbered sports store request.
+Answer every number, using the request number as the index."""
+
+AGENT_PROMPT = build_agent_prompt(SYSTEM_PROMPT, TASK_PROMPT)
+STORE_NAME_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", NAME_PROMPT),
+    ("human", "{request}")
+])
+BATCH_STORE_NAME_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", BATCH_NAME_PROMPT),
+    ("human", "{request}")
+])
+
+# Expected completion tokens per item of a batched naming request
+BATCH_NAME_OUTPUT_TOKENS = 40
+
+class StoreNameSuggestion(BaseModel):
+    store_name: str = Field(description="Creative, memorable store name")
+    tagline: str = Field(description="Catchy tagline for the store")
+
+class BatchStoreName(BaseModel):
+    index: int = Field(description="Number of the request this name answers")
+    store_name: str = Field(description="Creative, memorable store name")
+    tagline: str = Field(description="Catchy tagline for the store")
+
+class BatchStoreNames(BaseModel):
+    names: List[BatchStoreName] = Field(description="One entry per numbered request")
+
+class NamingAgent(BaseAgent):
     """Specialized agent for generating creative store names and branding elements."""
     
-    def __init__(self, api_key: str = None):
-        self.llm = ChatOpenAI(
-            model="gpt-3.5-turbo",  # Changed from gpt-4 to gpt-3.5-turbo for cost efficiency
-            temperature=0.8,
-            api_key=api_key or os.getenv("OPENAI_API_KEY")
-        )
-        self.memory = ConversationBufferMemory(
-            memory_key="chat_history",
-            return_messages=True
-        )
-        self.tools = self._create_tools()
-        self.agent = self._create_agent()
-        
+    kind = "naming"
+    system_prompt = SYSTEM_PROMPT
+    task_prompt = TASK_PROMPT
+    agent_prompt = AGENT_PROMPT
+    
+    def __init__(self, api_key: str = None, model: str = "gpt-3.5-turbo", temperature: float = 0.8):
+        super().__init__(api_key, model, temperature)
+    
     def _create_tools(self) -> List[BaseTool]:
         """Create specialized tools for naming and branding."""
         from langchain.tools import tool
@@ -43,54 +99,149 @@ class NamingAgent:
         
         return [generate_store_name, create_tagline, suggest_brand_colors]
     
-    def _create_agent(self) -> AgentExecutor:
-        """Create the naming agent with specialized prompts."""
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", """You are a creative branding expert specializing in sports business naming and branding.
-            Your expertise includes:
-            - Creating memorable, marketable store names
-            - Developing catchy taglines and slogans
-            - Suggesting brand colors and visual identity
-            - Understanding sports culture and fan psychology
-            
-            Always consider:
-            - Target audience demographics
-            - Local market appeal
-            - Brand memorability
-            - SEO-friendly naming
-            - Trademark availability (mention if needed)"""),
-            MessagesPlaceholder(variable_name="chat_history"),
-            ("human", "{input}"),
-            MessagesPlaceholder(variable_name="agent_scratchpad"),
-        ])
+    def _get_llm(self, model: str = None, max_tokens: int = None) -> ChatOpenAI:
+        """Get the chat model client for a routed model."""
+        return self._create_llm(model or self.model, max_tokens)
+    
+    def generate_store_name(self, sport: str, location: str = None, model: str = None,
+                            max_tokens: int = None) -> dict:
+        """Generate only the store name and tagline as structured fields with a small dedicated call."""
+        request = f"Sport: {sport}\nLocation: {location or 'General'}"
+        chain = STORE_NAME_PROMPT | self._get_llm(model, max_tokens).with_structured_output(StoreNameSuggestion)
+        suggestion = chain.invoke({"request": request})
+        return {
+            "sport": sport,
+            "location": location,
+            "store_name": suggestion.store_name.strip(),
+            "tagline": suggestion.tagline.strip(),
+            "agent_type": "naming",
+            "model": model or self.model,
+            "preflight": {
+                "estimated_prompt_tokens": estimate_tokens(NAME_PROMPT + request, model or self.model) + 2 * MESSAGE_OVERHEAD_TOKENS,
+                "max_input_tokens": None,
+                "max_output_tokens": max_tokens,
+                "dropped_history_messages": 0,
+                "truncated_input": False
+            }
+        }
+    
+    def generate_batch_store_names(self, requests: List[Dict], model: str = None,
+                                   max_input_tokens: int = 3000, max_output_tokens: int = 2000,
+                                   max_retries: int = 1, call_guard: Callable[[], ContextManager] = nullcontext) -> List[dict]:
+        """Generate store names and taglines for many sport/location requests in as few calls as possible.
+        
+        Requests are packed into structured batches that fit the token budgets. A batch that was too
+        long or whose output did not parse is split in half, and only the items left without a name
+        are retried; any other failure (authentication, connection, rate limit) ends the whole run.
+        Every call runs inside ``call_guard()``, which may meter it or refuse it by raising.
+        """
+        model = model or self.model
+        results = [None] * len(requests)
+        pending = list(range(len(requests)))
+        
+        for _ in range(max_retries + 1):
+            for chunk in self._pack_name_batches(pending, requests, model, max_input_tokens, max_output_tokens):
+                self._run_name_batch(chunk, requests, results, model, max_output_tokens, call_guard)
+            pending = [index for index in pending if results[index] is None]
+            if not pending:
+                break
         
-        agent = create_openai_tools_agent(self.llm, self.tools, prompt)
-        return AgentExecutor(
-            agent=agent,
-            tools=self.tools,
-            memory=self.memory,
-            verbose=True
+        for index in pending:
+            results[index] = {
+                "sport": requests[index]["sport"],
+                "location": requests[index].get("location"),
+                "store_name": "",
+                "tagline": "",
+                "agent_type": "naming",
+                "model": model,
+                "error": "No name returned after retries"
+            }
+        return results
+    
+    def _name_batch_request(self, chunk: List[int], requests: List[Dict]) -> str:
+        return "\n".join(
+            f"{index}. {requests[index]['sport']} store"
+            + (f" in {requests[index]['location']}" if requests[index].get("location") else "")
+            for index in chunk
         )
     
-    def generate_complete_branding(self, sport: str, location: str = None) -> dict:
-        """Generate complete branding package for a sports store."""
-        prompt = f"""
-        Create a complete branding package for a {sport} store{f" in {location}" if location else ""}.
+    def _pack_name_batches(self, pending: List[int], requests: List[Dict], model: str,
+                           max_input_tokens: int, max_output_tokens: int) -> List[List[int]]:
+        """Greedily pack pending items into batches that fit the input and output budgets."""
+        header_tokens = estimate_tokens(BATCH_NAME_PROMPT, model) + 2 * MESSAGE_OVERHEAD_TOKENS
+        max_items = max(1, max_output_tokens // BATCH_NAME_OUTPUT_TOKENS)
+        batches, current, current_tokens = [], [], header_tokens
+        for index in pending:
+            line_tokens = estimate_tokens(self._name_batch_request([index], requests), model) + 1
+            if current and (current_tokens + line_tokens > max_input_tokens or len(current) >= max_items):
+                batches.append(current)
+                current, current_tokens = [], header_tokens
+            current.append(index)
+            current_tokens += line_tokens
+        if current:
+            batches.append(current)
+        return batches
+    
+    @staticmethod
+    def _splittable(error: Exception) -> bool:
+        """Whether a failed batch may succeed in smaller pieces: its prompt or output was too long, or the output did not parse."""
+        if isinstance(error, openai.BadRequestError):
+            return getattr(error, "code", None) == "context_length_exceeded"
+        # Parser and schema validation errors are ValueErrors
+        return isinstance(error, (openai.LengthFinishReasonError, ValueError))
+    
+    def _run_name_batch(self, chunk: List[int], requests: List[Dict], results: List, model: str,
+                        max_output_tokens: int, call_guard: Callable[[], ContextManager] = nullcontext):
+        """Name one batch in a single call, bisecting it when it was too long or its output did not parse."""
+        chain = BATCH_STORE_NAME_PROMPT | self._get_llm(model, max_output_tokens).with_structured_output(BatchStoreNames)
+        response = None
+        # Refusals raised by the guard and permanent call failures end the whole batch
+        with call_guard():
+            try:
+                response = chain.invoke({"request": self._name_batch_request(chunk, requests)})
+            except Exception as e:
+                if not self._splittable(e):
+                    raise
+        if response is None:
+            if len(chunk) > 1:
+                middle = len(chunk) // 2
+                self._run_name_batch(chunk[:middle], requests, results, model, max_output_tokens, call_guard)
+                self._run_name_batch(chunk[middle:], requests, results, model, max_output_tokens, call_guard)
+            return
         
-        Please provide:
-        1. A creative store name
-        2. A catchy tagline
-        3. Brand color suggestions
-        4. Brand personality description
-        5. Target audience analysis
+        for name in response.names:
+            if name.index in chunk and name.store_name.strip():
+                results[name.index] = {
+                    "sport": requests[name.index]["sport"],
+                    "location": requests[name.index].get("location"),
+                    "store_name": name.store_name.strip(),
+                    "tagline": name.tagline.strip(),
+                    "agent_type": "naming",
+                    "model": model
+                }
+    
+    def generate_complete_branding(self, sport: str, location: str = None, model: str = None,
+                                   max_tokens: int = None, max_input_tokens: int = None,
+                                   store_name: str = None, chat_history: List[BaseMessage] = None,
+                                   instructions: str = None) -> dict:
+        """Generate complete branding package for a sports store.
         
-        Make it market-ready and appealing to sports enthusiasts.
+        Instructions (sections and length for an analysis tier) follow the request, after the shared prompt prefix.
         """
+        prompt = f"Sport: {sport}\nLocation: {location or 'General'}"
+        if store_name:
+            prompt += f"\nStore name: {store_name}"
+        if instructions:
+            prompt += f"\n\n{instructions}"
         
-        response = self.agent.invoke({"input": prompt})
+        response = self._invoke_agent(prompt, model, max_tokens, max_input_tokens, chat_history)
         return {
             "sport": sport,
             "location": location,
+            "store_name": store_name,
             "branding_package": response["output"],
-            "agent_type": "naming"
-        } 
\ No newline at end of file
+            "agent_type": "naming",
+            "model": model or self.model,
+            "preflight": response["preflight"],
+            "exchange": response["exchange"]
+        }
@@ -1,27 +1,52 @@
-from langchain.agents import AgentExecutor, create_openai_tools_agent
-from langchain_openai import ChatOpenAI
-from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain.memory import ConversationBufferMemory
 from langchain.tools import BaseTool
+from langchain_core.messages import BaseMessage
 from typing import List
-import os
+from agents.base_agent import BaseAgent, build_agent_prompt
 
-class ProductAgent:
+
+SYSTEM_PROMPT = """You are a sports retail expert specializing in product strategy and inventory management.
+            Your expertise includes:
+            - Sports equipment and apparel trends
+            - Inventory optimization and stock management
+            - Supplier relationships and sourcing
+            - Product pricing and margin analysis
+            - Seasonal product planning
+            
+            Always consider:
+            - Current market trends and consumer preferences
+            - Seasonal demand patterns
+            - Price point optimization
+            - Quality vs. cost trade-offs
+            - Local market preferences
+            - E-commerce vs. brick-and-mortar product mix"""
+
+TASK_PROMPT = """Create a comprehensive product strategy for the sports store described in the request.
+
+Please provide:
+1. Core product categories and must-have items
+2. Trending products and seasonal items
+3. Inventory mix recommendations (apparel, equipment, accessories)
+4. Pricing strategy and margin analysis
+5. Supplier recommendations and sourcing strategy
+6. Seasonal product planning
+7. E-commerce product selection
+8. Exclusive or private-label opportunities
+
+Focus on profitable, high-demand products that align with the target market."""
+
+AGENT_PROMPT = build_agent_prompt(SYSTEM_PROMPT, TASK_PROMPT)
+
+class ProductAgent(BaseAgent):
     """Specialized agent for generating product recommendations and inventory strategies."""
     
-    def __init__(self, api_key: str = None):
-        self.llm = ChatOpenAI(
-            model="gpt-3.5-turbo",  # Changed from gpt-4 to gpt-3.5-turbo for cost efficiency
-            temperature=0.6,
-            api_key=api_key or os.getenv("OPENAI_API_KEY")
-        )
-        self.memory = ConversationBufferMemory(
-            memory_key="chat_history",
-            return_messages=True
-        )
-        self.tools = self._create_tools()
-        self.agent = self._create_agent()
-        
+    kind = "product"
+    system_prompt = SYSTEM_PROMPT
+    task_prompt = TASK_PROMPT
+    agent_prompt = AGENT_PROMPT
+    
+    def __init__(self, api_key: str = None, model: str = "gpt-3.5-turbo", temperature: float = 0.6):
+        super().__init__(api_key, model, temperature)
+    
     def _create_tools(self) -> List[BaseTool]:
         """Create specialized tools for product analysis."""
         from langchain.tools import tool
@@ -49,60 +74,22 @@ class ProductAgent:
         return [analyze_trending_products, suggest_inventory_mix, 
                 identify_profit_margins, recommend_suppliers]
     
-    def _create_agent(self) -> AgentExecutor:
-        """Create the product agent with specialized prompts."""
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", """You are a sports retail expert specializing in product strategy and inventory management.
-            Your expertise includes:
-            - Sports equipment and apparel trends
-            - Inventory optimization and stock management
-            - Supplier relationships and sourcing
-            - Product pricing and margin analysis
-            - Seasonal product planning
-            
-            Always consider:
-            - Current market trends and consumer preferences
-            - Seasonal demand patterns
-            - Price point optimization
-            - Quality vs. cost trade-offs
-            - Local market preferences
-            - E-commerce vs. brick-and-mortar product mix"""),
-            MessagesPlaceholder(variable_name="chat_history"),
-            ("human", "{input}"),
-            MessagesPlaceholder(variable_name="agent_scratchpad"),
-        ])
-        
-        agent = create_openai_tools_agent(self.llm, self.tools, prompt)
-        return AgentExecutor(
-            agent=agent,
-            tools=self.tools,
-            memory=self.memory,
-            verbose=True
-        )
-    
-    def generate_product_strategy(self, sport: str, store_name: str, location: str = None) -> dict:
-        """Generate comprehensive product strategy for a sports store."""
-        prompt = f"""
-        Create a comprehensive product strategy for {store_name}, a {sport} store{f" in {location}" if location else ""}.
-        
-        Please provide:
-        1. Core product categories and must-have items
-        2. Trending products and seasonal items
-        3. Inventory mix recommendations (apparel, equipment, accessories)
-        4. Pricing strategy and margin analysis
-        5. Supplier recommendations and sourcing strategy
-        6. Seasonal product planning
-        7. E-commerce product selection
-        8. Exclusive or private-label opportunities
-        
-        Focus on profitable, high-demand products that align with the target market.
-        """
+    def generate_product_strategy(self, sport: str, store_name: str, location: str = None, model: str = None,
+                                  max_tokens: int = None, max_input_tokens: int = None,
+                                  chat_history: List[BaseMessage] = None, instructions: str = None) -> dict:
+        """Generate comprehensive product strategy for a sports store, optionally narrowed by tier instructions."""
+        prompt = f"Store name: {store_name}\nSport: {sport}\nLocation: {location or 'General'}"
+        if instructions:
+            prompt += f"\n\n{instructions}"
         
-        response = self.agent.invoke({"input": prompt})
+        response = self._invoke_agent(prompt, model, max_tokens, max_input_tokens, chat_history)
         return {
             "sport": sport,
             "store_name": store_name,
             "location": location,
             "product_strategy": response["output"],
-            "agent_type": "product"
+            "agent_type": "product",
+            "model": model or self.model,
+            "preflight": response["preflight"],
+            "exchange": response["exchange"]
         } 
\ No newline at end of file
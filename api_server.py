@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+HTTP API for SportStore AI, for machine-to-machine use alongside the Streamlit UI.
+
+Usage:
+    python api_server.py --host 0.0.0.0 --port 8000
+    uvicorn api_server:app --port 8000
+
+Endpoints:
+    POST /v1/analysis        {"sport", "location"?, "run_id"?, "tier"?}  standard or comprehensive analysis
+    POST /v1/basic           {"sport"}                          store name and products
+    POST /v1/comparison      {"sport", "locations": [...]}      one base plan adapted to several cities
+    POST /v1/batches         {"kind": "analysis"|"names", "requests": [{"sport", "location"?}], "export_formats"?: ["json", "txt"]}
+    GET  /v1/batches/{id}    batch status and results
+    POST /v1/export          {"analysis" | "archive_id", "format": "json"|"txt"}
+    GET  /healthz            liveness and queue saturation
+    GET  /metrics            request, queue and cache metrics
+    GET  /v1/spend           today's token and cost spend by stage, model, sport and API key
+"""
+
+import argparse
+import asyncio
+import os
+import time
+import uuid
+from collections import Counter, OrderedDict
+from contextlib import asynccontextmanager
+from typing import Dict
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+from LangChainHelper import AdvancedLangChainHelper, legacy_helper_pool_stats
+from orchestration.work_queue import QueueFullError, WorkQueue
+
+MAX_BATCHES_KEPT = 1000
+
+
+class ApiError(Exception):
+    """Error returned to the client as a JSON body with the given status code."""
+
+    def __init__(self, status_code: int, message: str, headers: Dict = None, **extra):
+        super().__init__(message)
+        self.status_code = status_code
+        self.headers = headers
+        self.body = dict(extra, error=message)
+
+
+class ApiService:
+    """Routes API requests onto the work queue in front of one shared helper."""
+
+    def __init__(self, helper: AdvancedLangChainHelper = None, queue: WorkQueue = None,
+                 request_timeout: float = None, max_batch_size: int = None):
+        self._helper = helper
+        self.queue = queue or WorkQueue()
+        self.request_timeout = request_timeout or float(os.getenv("API_REQUEST_TIMEOUT", 120))
+        self.max_batch_size = max_batch_size or int(os.getenv("API_MAX_BATCH_SIZE", 100))
+        self.batches: "OrderedDict[str, Dict]" = OrderedDict()
+        self.started_at = time.time()
+        self.responses = Counter()
+
+    @property
+    def helper(self) -> AdvancedLangChainHelper:
+        if self._helper is None:
+            self._helper = AdvancedLangChainHelper()
+        return self._helper
+
+    async def _run(self, fn, *args, **kwargs):
+        if not self.helper.breaker.accepting():
+            # Degraded answers come from stored plans without LLM calls: skip the queue of slow jobs
+            return await asyncio.to_thread(fn, *args, **kwargs)
+        try:
+            return await self.queue.run(fn, *args, timeout=self.request_timeout, **kwargs)
+        except QueueFullError as e:
+            raise ApiError(429, str(e), headers={"Retry-After": "5"})
+
+    # Endpoints
+
+    async def analysis(self, body: Dict) -> Dict:
+        sport = _require_sport(body)
+        tier = body.get("tier", "comprehensive")
+        if tier not in ("standard", "comprehensive"):
+            raise ApiError(400, "tier must be 'standard' or 'comprehensive'")
+        run_id = body.get("run_id") or self.helper.checkpoints.new_run_id()
+        try:
+            response = await self._run(self.helper.generate_comprehensive_store_analysis,
+                                       sport, body.get("location"), run_id, session_id=None, tier=tier)
+        except asyncio.TimeoutError:
+            raise ApiError(504, f"Analysis did not finish within {self.request_timeout:.0f}s; "
+                                "retry with the same run_id to resume from its checkpoints", run_id=run_id)
+        if "error" in response and "degraded" in response:
+            retry_after = max(1, round(response["degraded"]["retry_after"]))
+            # A reached spend cap is a quota limit, not an outage
+            status = 429 if response["degraded"].get("spend_cap") else 503
+            raise ApiError(status, response["error"], headers={"Retry-After": str(retry_after)}, run_id=run_id)
+        if "error" in response:
+            raise ApiError(502, response["error"], run_id=run_id, fallback=response.get("fallback"))
+        return response
+
+    async def basic(self, body: Dict) -> Dict:
+        try:
+            return await self._run(self.helper.generate_store_name_and_items, _require_sport(body), session_id=None)
+        except asyncio.TimeoutError:
+            raise ApiError(504, f"Request did not finish within {self.request_timeout:.0f}s")
+
+    async def comparison(self, body: Dict) -> Dict:
+        sport = _require_sport(body)
+        locations = body.get("locations")
+        if not isinstance(locations, list) or not all(isinstance(location, str) for location in locations):
+            raise ApiError(400, "locations must be a list of strings")
+        try:
+            response = await self._run(self.helper.generate_location_comparison, sport, locations)
+        except asyncio.TimeoutError:
+            raise ApiError(504, f"Comparison did not finish within {self.request_timeout:.0f}s")
+        if "error" in response:
+            raise ApiError(502 if response.get("stage") == "base_plan" else 400, response["error"])
+        return response
+
+    async def submit_batch(self, body: Dict) -> Dict:
+        kind = body.get("kind", "analysis")
+        requests = body.get("requests")
+        if kind not in ("analysis", "names"):
+            raise ApiError(400, "kind must be 'analysis' or 'names'")
+        if not isinstance(requests, list) or not requests:
+            raise ApiError(400, "requests must be a non-empty list")
+        if len(requests) > self.max_batch_size:
+            raise ApiError(413, f"Batches are limited to {self.max_batch_size} requests")
+        for request in requests:
+            _require_sport(request)
+        export_formats = body.get("export_formats") or []
+        if not isinstance(export_formats, list) or not set(export_formats) <= {"json", "txt"}:
+            raise ApiError(400, "export_formats must be a list of 'json' and/or 'txt'")
+
+        batch_id = uuid.uuid4().hex
+        try:
+            if kind == "analysis":
+                future = self.queue.submit(self.helper.generate_batch_store_analyses, requests, batch_id,
+                                           export_formats=export_formats)
+            else:
+                future = self.queue.submit(self.helper.generate_batch_store_names, requests)
+        except QueueFullError as e:
+            raise ApiError(429, str(e), headers={"Retry-After": "5"})
+        batch = {"batch_id": batch_id, "kind": kind, "status": "queued", "size": len(requests),
+                 "submitted_at": time.time(), "results": None}
+        self.batches[batch_id] = batch
+        while len(self.batches) > MAX_BATCHES_KEPT:
+            self.batches.popitem(last=False)
+        future.add_done_callback(lambda done: self._finish_batch(batch, done))
+        return {key: batch[key] for key in ("batch_id", "kind", "status", "size")}
+
+    def _finish_batch(self, batch: Dict, future: asyncio.Future):
+        if future.exception() is not None:
+            batch.update(status="failed", error=str(future.exception()))
+        else:
+            batch.update(status="complete", results=future.result())
+        batch["completed_at"] = time.time()
+
+    def get_batch(self, batch_id: str) -> Dict:
+        batch = self.batches.get(batch_id)
+        if batch is None:
+            raise ApiError(404, f"Unknown batch: {batch_id}")
+        return batch
+
+    def export(self, body: Dict) -> Response:
+        export_format = body.get("format", "json")
+        if export_format not in ("json", "txt"):
+            raise ApiError(400, "format must be 'json' or 'txt'")
+        analysis = body.get("analysis")
+        if analysis is None and body.get("archive_id") is not None:
+            analysis = self.helper.get_archived_plan(int(body["archive_id"]))
+            if analysis is None:
+                raise ApiError(404, f"Unknown archive_id: {body['archive_id']}")
+        if not isinstance(analysis, dict):
+            raise ApiError(400, "Provide an analysis object or an archive_id")
+        media_type = "application/json" if export_format == "json" else "text/plain"
+        return Response(self.helper.export_analysis(analysis, export_format), media_type=media_type)
+
+    def spend(self) -> Dict:
+        return self.helper.ledger.summary(days=1)
+
+    def health(self) -> Dict:
+        saturated = self.queue.free_slots == 0
+        status = "saturated" if saturated else "ok"
+        if self._helper is not None and not self._helper.breaker.accepting():
+            status = "degraded"
+        return {"status": status, "queue_depth": self.queue.depth,
+                "in_flight": self.queue.stats()["in_flight"], "uptime_seconds": time.time() - self.started_at}
+
+    def metrics(self) -> Dict:
+        metrics = {
+            "uptime_seconds": time.time() - self.started_at,
+            "responses": dict(self.responses),
+            "queue": self.queue.stats(),
+            "batches": dict(Counter(batch["status"] for batch in self.batches.values()))
+        }
+        if self._helper is not None:
+            metrics["response_cache"] = self._helper.response_cache.stats()
+            metrics["prefix_cache"] = self._helper.get_prefix_cache_report()
+            metrics["hedging"] = self._helper.hedger.stats()
+            metrics["circuit_breaker"] = self._helper.breaker.stats()
+            metrics["spend"] = self._helper.ledger.stats()
+            metrics["coordination"] = dict(self._helper.coordination.stats(), rate_limit=self._helper.rate_limiter.stats())
+        if legacy_helper_pool_stats() is not None:
+            metrics["legacy_helper_pool"] = legacy_helper_pool_stats()
+        return metrics
+
+
+def _require_sport(body: Dict) -> str:
+    sport = body.get("sport") if isinstance(body, dict) else None
+    if not isinstance(sport, str) or not sport.strip():
+        raise ApiError(400, "sport is required")
+    return sport.strip()
+
+
+def create_app(service: ApiService = None) -> Starlette:
+    """Build the Starlette app around a service (a default one is created from the environment)."""
+    service = service or ApiService()
+
+    def endpoint(handler, with_body: bool = True):
+        async def route(request: Request):
+            try:
+                if with_body:
+                    try:
+                        body = await request.json()
+                    except ValueError:
+                        raise ApiError(400, "Request body must be JSON")
+                    if not isinstance(body, dict):
+                        raise ApiError(400, "Request body must be a JSON object")
+                    result = handler(body)
+                else:
+                    result = handler(**request.path_params)
+                if asyncio.iscoroutine(result):
+                    result = await result
+                response = result if isinstance(result, Response) else JSONResponse(_jsonable(result))
+            except ApiError as e:
+                response = JSONResponse(e.body, status_code=e.status_code, headers=e.headers)
+            except Exception as e:
+                response = JSONResponse({"error": f"Internal error: {str(e)}"}, status_code=500)
+            service.responses[response.status_code] += 1
+            return response
+        return route
+
+    @asynccontextmanager
+    async def lifespan(app):
+        await service.queue.start()
+        # Build the helper (agents, clients, caches) before the first request instead of inside it
+        await asyncio.to_thread(lambda: service.helper)
+        yield
+        await service.queue.stop()
+
+    app = Starlette(routes=[
+        Route("/v1/analysis", endpoint(service.analysis), methods=["POST"]),
+        Route("/v1/basic", endpoint(service.basic), methods=["POST"]),
+        Route("/v1/comparison", endpoint(service.comparison), methods=["POST"]),
+        Route("/v1/batches", endpoint(service.submit_batch), methods=["POST"]),
+        Route("/v1/batches/{batch_id}", endpoint(service.get_batch, with_body=False), methods=["GET"]),
+        Route("/v1/export", endpoint(service.export), methods=["POST"]),
+        Route("/v1/spend", endpoint(service.spend, with_body=False), methods=["GET"]),
+        Route("/healthz", endpoint(service.health, with_body=False), methods=["GET"]),
+        Route("/metrics", endpoint(service.metrics, with_body=False), methods=["GET"]),
+    ], lifespan=lifespan)
+    app.state.service = service
+    return app
+
+
+def _jsonable(value):
+    """Convert responses to JSON-safe values (chat messages and other objects become strings)."""
+    if isinstance(value, dict):
+        return {key: _jsonable(item) for key, item in value.items() if key != "conversation_history"}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(item) for item in value]
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+app = create_app()
+
+
+def main():
+    import uvicorn
+    parser = argparse.ArgumentParser(description="SportStore AI HTTP API")
+    parser.add_argument("--host", default=os.getenv("API_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("API_PORT", 8000)))
+    args = parser.parse_args()
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
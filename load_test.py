@@ -0,0 +1,446 @@
+#!/usr/bin/env python3
+"""
+Headless concurrent-user load test for the SportStore AI Streamlit app.
+Starts main.py under `streamlit run` against a local fake OpenAI-compatible backend, drives N
+concurrent scripted browser sessions over Streamlit's websocket protocol, and reports rerun
+latency, per-session server memory and server CPU per user.
+
+Streamlit's AppTest runs the script in the test process and is not safe to drive from several
+threads at once, so sessions talk to a real server instead, the same way browsers do.
+
+Usage:
+    python load_test.py --users 20 --iterations 3 --llm-latency 0.2 --mix basic,comprehensive,demo
+"""
+
+import argparse
+import json
+import os
+import re
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.request import urlopen
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+SPORTS = ["Basketball", "Soccer", "Baseball", "Cricket", "Tennis", "Football",
+          "Hockey", "Volleyball", "Golf", "Swimming", "Running", "Cycling"]
+FLOWS = ("basic", "comprehensive", "demo")
+
+
+# ---------------------------------------------------------------------------
+# Fake LLM backend
+# ---------------------------------------------------------------------------
+
+def _fake_value(schema: Dict, defs: Dict, numbers: List[int], name: str = "value", number: int = 1):
+    """Build a value that satisfies a JSON schema, one array item per numbered request line."""
+    if "$ref" in schema:
+        return _fake_value(defs[schema["$ref"].split("/")[-1]], defs, numbers, name, number)
+    if "anyOf" in schema:
+        options = [option for option in schema["anyOf"] if option.get("type") != "null"]
+        return _fake_value(options[0], defs, numbers, name, number)
+    kind = schema.get("type")
+    if kind == "object":
+        return {key: _fake_value(value, defs, numbers, key, number) for key, value in schema.get("properties", {}).items()}
+    if kind == "array":
+        return [_fake_value(schema["items"], defs, numbers, name, n) for n in numbers or [1]]
+    if kind == "integer":
+        return number
+    if kind == "number":
+        return float(number)
+    if kind == "boolean":
+        return True
+    return f"Load Test {name.replace('_', ' ').title()} {number}"
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    """Minimal OpenAI chat completions endpoint: plain text, tool calls, JSON schema and streaming."""
+
+    latency = 0.2
+    response_chars = 1500
+    on_request = None
+
+    def do_POST(self):
+        self.on_request()
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        time.sleep(self.latency)
+        messages = body.get("messages", [])
+        last_user = next((str(m.get("content")) for m in reversed(messages) if m.get("role") == "user"), "")
+        numbers = [int(n) for n in re.findall(r"^(\d+)\.", last_user, re.M)]
+        message = {"role": "assistant", "content": None}
+
+        response_format = body.get("response_format") or {}
+        tool_choice = body.get("tool_choice")
+        if response_format.get("type") == "json_schema":
+            schema = response_format["json_schema"]["schema"]
+            message["content"] = json.dumps(_fake_value(schema, schema.get("$defs", {}), numbers))
+        elif isinstance(tool_choice, dict) or tool_choice == "required":
+            tool = body["tools"][0]["function"]
+            schema = tool.get("parameters", {})
+            message["tool_calls"] = [{"id": "call_load_test", "type": "function", "function": {
+                "name": tool["name"], "arguments": json.dumps(_fake_value(schema, schema.get("$defs", {}), numbers))}}]
+        else:
+            text = "Store Name: Load Test Arena\nTagline: Built for traffic\n\n"
+            message["content"] = text + ("Lorem ipsum sports retail plan. " * (self.response_chars // 32 + 1))[:self.response_chars]
+
+        usage = {"prompt_tokens": sum(len(str(m.get("content") or "")) for m in messages) // 4,
+                 "completion_tokens": len(str(message["content"] or "")) // 4}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        if body.get("stream"):
+            self._stream(body["model"], message, usage)
+        else:
+            self._send_json({"id": "chatcmpl-load-test", "object": "chat.completion", "created": int(time.time()),
+                             "model": body["model"], "usage": usage,
+                             "choices": [{"index": 0, "message": message, "finish_reason": "stop"}]})
+
+    def _send_json(self, payload: Dict):
+        data = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self, model: str, message: Dict, usage: Dict):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        chunk = {"id": "chatcmpl-load-test", "object": "chat.completion.chunk", "created": int(time.time()), "model": model}
+        delta = {key: value for key, value in message.items() if value is not None}
+        if "tool_calls" in delta:
+            delta["tool_calls"] = [dict(call, index=0) for call in delta["tool_calls"]]
+        events = [dict(chunk, choices=[{"index": 0, "delta": delta, "finish_reason": None}]),
+                  dict(chunk, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}]),
+                  dict(chunk, choices=[], usage=usage)]
+        for event in events:
+            self.wfile.write(f"data: {json.dumps(event)}\n\n".encode())
+        self.wfile.write(b"data: [DONE]\n\n")
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeLLMServer:
+    """Fake OpenAI backend on a background thread of the harness; the app server runs in its own process."""
+
+    def __init__(self, latency: float = 0.2, response_chars: int = 1500):
+        self.calls = 0
+        self._lock = threading.Lock()
+        handler = type("ConfiguredFakeOpenAIHandler", (FakeOpenAIHandler,),
+                       {"latency": latency, "response_chars": response_chars, "on_request": self._count})
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self._server.daemon_threads = True
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}/v1"
+
+    def _count(self):
+        with self._lock:
+            self.calls += 1
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, name="fake-llm", daemon=True).start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+# ---------------------------------------------------------------------------
+# App server
+# ---------------------------------------------------------------------------
+
+class AppServer:
+    """main.py running under `streamlit run` in a child process, with its CPU and memory readable from /proc."""
+
+    def __init__(self, env: Dict[str, str], workdir: str):
+        self.port = _free_port()
+        self.env = env
+        self.workdir = workdir
+        self.process: Optional[subprocess.Popen] = None
+
+    @property
+    def stream_url(self) -> str:
+        return f"ws://127.0.0.1:{self.port}/_stcore/stream"
+
+    def start(self, timeout: float = 60):
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "streamlit", "run", APP_PATH, "--server.headless", "true",
+             "--server.port", str(self.port), "--server.fileWatcherType", "none",
+             "--browser.gatherUsageStats", "false"],
+            env=self.env, cwd=self.workdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            try:
+                with urlopen(f"http://127.0.0.1:{self.port}/_stcore/health", timeout=1) as response:
+                    if response.status == 200:
+                        return
+            except OSError:
+                time.sleep(0.2)
+        raise RuntimeError(f"Streamlit server did not become healthy within {timeout}s")
+
+    def stop(self):
+        if self.process is not None:
+            self.process.send_signal(signal.SIGTERM)
+            try:
+                self.process.wait(10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+    def rss_bytes(self) -> int:
+        """Resident set size of the server process."""
+        with open(f"/proc/{self.process.pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+        return 0
+
+    def cpu_seconds(self) -> float:
+        """User plus system CPU time used by the server process."""
+        with open(f"/proc/{self.process.pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+# ---------------------------------------------------------------------------
+# Simulated sessions
+# ---------------------------------------------------------------------------
+
+class BrowserSession:
+    """Scripted browser session speaking Streamlit's websocket protocol: sets widgets and waits for reruns."""
+
+    def __init__(self, url: str, timeout: float = 120):
+        from websockets.sync.client import connect
+        self.timeout = timeout
+        self.connection = connect(url, subprotocols=["streamlit"], max_size=None, open_timeout=timeout)
+        self.widget_ids: Dict[str, str] = {}
+        self.widget_states: Dict[str, object] = {}
+        self.errors: List[str] = []
+
+    def set(self, label_prefix: str, **value):
+        """Set a widget by label, e.g. set("🎮", bool_value=True); sent with every following rerun."""
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+        self.widget_states[label_prefix] = WidgetState(id=self._widget_id(label_prefix), **value)
+
+    def click(self, label_prefix: str) -> float:
+        """Click a button and return the rerun latency."""
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+        return self.rerun(WidgetState(id=self._widget_id(label_prefix), trigger_value=True))
+
+    def rerun(self, trigger=None) -> float:
+        """Send the current widget states, wait for the script run to finish and return its latency."""
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+        message = BackMsg()
+        message.rerun_script.query_string = ""
+        message.rerun_script.page_script_hash = ""
+        states = list(self.widget_states.values()) + ([trigger] if trigger is not None else [])
+        message.rerun_script.widget_states.widgets.extend(states)
+
+        start = time.perf_counter()
+        self.connection.send(message.SerializeToString())
+        while True:
+            forward = ForwardMsg()
+            forward.ParseFromString(self.connection.recv(timeout=self.timeout))
+            kind = forward.WhichOneof("type")
+            if kind == "delta" and forward.delta.WhichOneof("type") == "new_element":
+                self._record_element(forward.delta.new_element)
+            elif kind == "script_finished":
+                return time.perf_counter() - start
+
+    def _record_element(self, element):
+        kind = element.WhichOneof("type")
+        widget = getattr(element, kind)
+        if getattr(widget, "id", None) and getattr(widget, "label", None):
+            self.widget_ids[widget.label] = widget.id
+        elif kind == "alert" and widget.format == 1:
+            self.errors.append(widget.body)
+        elif kind == "exception":
+            self.errors.append(f"{widget.type}: {widget.message}")
+
+    def _widget_id(self, label_prefix: str) -> str:
+        for label, widget_id in self.widget_ids.items():
+            if label.startswith(label_prefix):
+                return widget_id
+        raise LookupError(f"No widget labelled {label_prefix!r} on the page")
+
+    def close(self):
+        self.connection.close()
+
+
+def run_session(url: str, user: int, flow: str, iterations: int, timeout: float, reuse_plans: bool,
+                sessions: List[BrowserSession]) -> Dict:
+    """Drive one simulated user through the app and time every rerun."""
+    timings = {"initial": [], flow: []}
+    session = BrowserSession(url, timeout)
+    sessions.append(session)
+    timings["initial"].append(session.rerun())
+
+    for iteration in range(iterations):
+        sport = SPORTS[(user + iteration) % len(SPORTS)]
+        session.set("🏈", string_value=sport)
+        session.set("📍", string_value="Chicago, IL" if reuse_plans else f"Load City {user}-{iteration}")
+        session.set("📊", string_value="Basic (Store Name + Products)" if flow == "basic"
+                    else "Comprehensive (Multi-Agent Analysis)")
+        session.set("🎮", bool_value=flow == "demo")
+        session.rerun()
+        timings[flow].append(session.click("🚀"))
+
+    return {"user": user, "flow": flow, "timings": timings, "errors": session.errors}
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run_load_test(users: int = 10, iterations: int = 2, mix: List[str] = None, llm_latency: float = 0.2,
+                  response_chars: int = 1500, timeout: float = 120, reuse_plans: bool = False) -> Dict:
+    """Run the load test and return the report."""
+    mix = mix or list(FLOWS)
+    fake_llm = FakeLLMServer(llm_latency, response_chars)
+    fake_llm.start()
+    workdir = tempfile.mkdtemp(prefix="sportstore-load-")
+    env = dict(os.environ, **{
+        "OPENAI_API_KEY": "sk-load-test",
+        "OPENAI_BASE_URL": fake_llm.base_url,
+        "CHECKPOINT_DIR": os.path.join(workdir, "checkpoints"),
+        "PLAN_ARCHIVE_PATH": os.path.join(workdir, "plans.db"),
+        "TRACE_SAMPLE_RATE": "0",
+        "CACHE_WARMUP_PAIRS": "",
+        "CACHE_WARMUP_FROM_LOG": "0"
+    })
+    env.pop("REQUEST_LOG_PATH", None)
+    server = AppServer(env, workdir)
+    open_sessions: List[BrowserSession] = []
+
+    try:
+        server.start()
+        # One untimed session first, so imports and the shared cached helper are not billed to the users
+        start = time.perf_counter()
+        warmup = run_session(server.stream_url, -1, "basic" if "basic" in mix else mix[0], 1, timeout,
+                             reuse_plans, open_sessions)
+        cold_start_seconds = time.perf_counter() - start
+        open_sessions.pop().close()
+
+        rss_before, cpu_before, calls_before = server.rss_bytes(), server.cpu_seconds(), fake_llm.calls
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=users) as pool:
+            futures = [pool.submit(run_session, server.stream_url, user, mix[user % len(mix)], iterations,
+                                   timeout, reuse_plans, open_sessions)
+                       for user in range(users)]
+            sessions = []
+            for future in futures:
+                try:
+                    sessions.append(future.result())
+                except Exception as e:
+                    sessions.append({"user": None, "flow": None, "timings": {}, "errors": [f"Session crashed: {e!r}"]})
+        wall_seconds = time.perf_counter() - start
+        # Sessions are still connected here, so their server-side state is part of the measurement
+        rss_after, cpu_after, llm_calls = server.rss_bytes(), server.cpu_seconds(), fake_llm.calls - calls_before
+    finally:
+        for session in open_sessions:
+            session.close()
+        server.stop()
+        fake_llm.stop()
+
+    latency = {}
+    for name in ("initial",) + FLOWS:
+        values = [value for session in sessions for value in session["timings"].get(name, [])]
+        if values:
+            latency[name] = {
+                "reruns": len(values),
+                "p50": statistics.median(values),
+                "p95": _percentile(values, 95),
+                "max": max(values)
+            }
+
+    cpu_seconds = cpu_after - cpu_before
+    reruns = sum(len(values) for session in sessions for values in session["timings"].values())
+    return {
+        "users": users,
+        "iterations": iterations,
+        "mix": mix,
+        "llm_latency": llm_latency,
+        "wall_seconds": wall_seconds,
+        "cold_start_seconds": cold_start_seconds,
+        "llm_calls": llm_calls,
+        "rerun_latency": latency,
+        "memory": {
+            "server_rss_before_mb": rss_before / 1e6,
+            "server_rss_after_mb": rss_after / 1e6,
+            "per_session_mb": (rss_after - rss_before) / users / 1e6
+        },
+        "cpu": {
+            "server_cpu_seconds": cpu_seconds,
+            "cpu_seconds_per_user": cpu_seconds / users,
+            "cpu_ms_per_rerun": cpu_seconds / reruns * 1000 if reruns else 0.0,
+            "avg_cores_busy": cpu_seconds / wall_seconds if wall_seconds else 0.0
+        },
+        "errors": warmup["errors"] + [error for session in sessions for error in session["errors"]]
+    }
+
+
+def print_report(report: Dict):
+    print("\n📈 SportStore AI - Load Test Report")
+    print("=" * 50)
+    print(f"Users: {report['users']}  Iterations: {report['iterations']}  Mix: {', '.join(report['mix'])}")
+    print(f"Fake LLM latency: {report['llm_latency']:.2f}s  Wall time: {report['wall_seconds']:.1f}s  "
+          f"Cold start: {report['cold_start_seconds']:.1f}s  LLM calls: {report['llm_calls']}")
+    print("\nRerun latency (seconds):")
+    for name, stats in report["rerun_latency"].items():
+        print(f"  {name:<14} n={stats['reruns']:<4} p50={stats['p50']:.3f}  p95={stats['p95']:.3f}  max={stats['max']:.3f}")
+    memory, cpu = report["memory"], report["cpu"]
+    print(f"\nServer memory: RSS {memory['server_rss_before_mb']:.1f} MB -> {memory['server_rss_after_mb']:.1f} MB "
+          f"({memory['per_session_mb']:.2f} MB per session)")
+    print(f"Server CPU: {cpu['server_cpu_seconds']:.2f}s total, {cpu['cpu_seconds_per_user']:.3f}s per user, "
+          f"{cpu['cpu_ms_per_rerun']:.1f} ms per rerun, {cpu['avg_cores_busy']:.2f} cores busy on average")
+    if report["errors"]:
+        print(f"\n❌ {len(report['errors'])} errors, e.g.: {report['errors'][0]}")
+    else:
+        print("\n✅ No errors")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless concurrent-user load test for the Streamlit app")
+    parser.add_argument("--users", type=int, default=10, help="Concurrent simulated sessions")
+    parser.add_argument("--iterations", type=int, default=2, help="Generate clicks per session")
+    parser.add_argument("--mix", default=",".join(FLOWS), help="Comma-separated flows assigned round-robin to users")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Seconds the fake LLM takes per call")
+    parser.add_argument("--response-chars", type=int, default=1500, help="Length of fake LLM text responses")
+    parser.add_argument("--timeout", type=float, default=120, help="Per-rerun timeout in seconds")
+    parser.add_argument("--reuse-plans", action="store_true", help="Request the same plans so the response cache is hit")
+    parser.add_argument("--json", help="Also write the report to this JSON file")
+    args = parser.parse_args()
+
+    mix = [flow.strip() for flow in args.mix.split(",") if flow.strip()]
+    unknown = [flow for flow in mix if flow not in FLOWS]
+    if unknown:
+        parser.error(f"Unknown flows: {', '.join(unknown)} (choose from {', '.join(FLOWS)})")
+
+    report = run_load_test(args.users, args.iterations, mix, args.llm_latency, args.response_chars,
+                           args.timeout, args.reuse_plans)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    return 1 if report["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,11 @@
 import streamlit as st
 import LangChainHelper
+from orchestration import demo_corpus
+from orchestration.plan_archive import PlanArchive
 import json
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 import os
+import uuid
 
 # Page configuration
 st.set_page_config(
@@ -64,109 +67,171 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-def generate_demo_response(sport, location=None):
-    """Generate demo response for testing without API key."""
-    demo_data = {
-        "Basketball": {
-            "store_name": "🏀 Hoops Haven",
-            "tagline": "Where Champions Shop",
-            "products": ["Basketballs", "Jerseys", "Sneakers", "Training Equipment", "Court Gear"],
-            "branding": "Modern, energetic brand with orange and black colors",
-            "marketing": "Social media campaigns, local team partnerships, community events",
-            "strategy": "Focus on youth leagues and amateur tournaments"
-        },
-        "Soccer": {
-            "store_name": "⚽ Goal Getter Pro",
-            "tagline": "Score Your Dreams",
-            "products": ["Soccer Balls", "Cleats", "Jerseys", "Training Cones", "Goal Posts"],
-            "branding": "Professional green and white theme with European influence",
-            "marketing": "Academy partnerships, tournament sponsorships, online presence",
-            "strategy": "Target youth development and competitive leagues"
-        },
-        "Tennis": {
-            "store_name": "🎾 Ace Tennis Elite",
-            "tagline": "Serve Your Passion",
-            "products": ["Tennis Rackets", "Balls", "Court Shoes", "Apparel", "Training Aids"],
-            "branding": "Elegant white and gold design with premium positioning",
-            "marketing": "Club partnerships, tournament gear, coaching programs",
-            "strategy": "Premium equipment and coaching services"
-        }
-    }
-    
-    sport_data = demo_data.get(sport, demo_data["Basketball"])
-    
-    return {
-        "comprehensive_analysis": {
-            "structured_analysis": f"""
-Store Analysis:
-- Store Name: {sport_data['store_name']}
-- Tagline: {sport_data['tagline']}
-- Target Audience: Sports enthusiasts and athletes
-- Price Range: Mid to premium
-- Unique Selling Proposition: Specialized {sport} expertise
-
-Product Recommendations:
-- Category: Equipment and Apparel
-- Items: {', '.join(sport_data['products'])}
-- Description: Comprehensive {sport} gear for all skill levels
-
-Market Insights:
-- Trend Analysis: Growing interest in {sport} participation
-- Competitive Landscape: Focus on specialized expertise
-- Opportunities: Local community engagement
-- Challenges: Competition from big-box retailers
-
-Success Factors:
-- Key Factors: Expert staff, quality products, community involvement
-- Risk Mitigation: Diversified product mix, strong online presence
-- Growth Potential: Youth programs and tournament partnerships
-            """
-        },
-        "branding_package": f"""
-BRANDING PACKAGE FOR {sport.upper()} STORE
-
-Store Name: {sport_data['store_name']}
-Tagline: {sport_data['tagline']}
-Brand Colors: {sport_data['branding']}
-Target Audience: {sport} enthusiasts of all ages
-Brand Personality: Professional, passionate, community-focused
-            """,
-        "marketing_strategy": f"""
-MARKETING STRATEGY
+@st.cache_resource
+def get_helper(api_key):
+    """Build one long-lived helper per API key so its response cache and warm-up survive reruns."""
+    return LangChainHelper.AdvancedLangChainHelper(api_key)
 
-{sport_data['marketing']}
+@st.cache_resource
+def get_plan_archive():
+    """Open the local plan archive once per process."""
+    return PlanArchive()
 
-Key Channels:
-• Social Media Marketing
-• Local Community Events
-• Partnership Programs
-• Online Advertising
-• Email Campaigns
-
-Budget Allocation:
-• Digital Marketing: 40%
-• Local Advertising: 30%
-• Community Events: 20%
-• Partnerships: 10%
-            """,
-        "product_strategy": f"""
-PRODUCT STRATEGY
+def show_plan_archive(sport):
+    """Search panel for reusing previously generated plans instead of regenerating them."""
+    archive = get_plan_archive()
+    with st.expander(f"📚 Plan Archive ({archive.count()} saved plans)"):
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            query = st.text_input("🔎 Search plans", placeholder="e.g., eco-friendly running shoes Chicago")
+        with col2:
+            only_sport = st.checkbox(f"Only {sport}", value=False)
+        
+        results = archive.search(query, sport if only_sport else None, limit=10)
+        if not results:
+            st.info("No archived plans match your search yet.")
+            return
+        
+        for plan in results:
+            label = f"**{plan['store_name'] or 'Untitled'}** · {plan['sport']} · {plan['location'] or 'General'} · {plan['created_at'][:16]}"
+            col1, col2 = st.columns([4, 1])
+            with col1:
+                st.markdown(label)
+                if plan['snippet']:
+                    st.caption(plan['snippet'])
+            with col2:
+                if st.button("Open", key=f"archive_open_{plan['id']}"):
+                    st.session_state.archived_plan_id = plan['id']
+        
+        plan_id = st.session_state.get("archived_plan_id")
+        archived = archive.get(plan_id) if plan_id else None
+        if archived:
+            st.markdown("---")
+            st.markdown(f"### {archived.get('store_name', '')}")
+            if archived.get('tagline'):
+                st.caption(archived['tagline'])
+            st.markdown("#### Branding Package")
+            st.write(archived.get('branding_package', 'N/A'))
+            st.markdown("#### Product Strategy")
+            st.write(archived.get('product_strategy', 'N/A'))
+            st.markdown("#### Marketing Strategy")
+            st.write(archived.get('marketing_strategy', 'N/A'))
+            st.markdown("#### Structured Analysis")
+            st.write((archived.get('comprehensive_analysis') or {}).get('structured_analysis', 'N/A'))
+            st.download_button(
+                label="⬇️ Download JSON",
+                data=json.dumps(archived, indent=2),
+                file_name=f"sportstore_archived_plan_{plan_id}.json",
+                mime="application/json"
+            )
 
-Core Products: {', '.join(sport_data['products'])}
+def show_spend_dashboard(ledger, api_key):
+    """Token and cost spend from the persistent ledger, against the daily caps."""
+    spent = ledger.spent_today(api_key)
+    with st.expander(f"💰 Spend Dashboard (${spent['all']:.4f} today)"):
+        col1, col2 = st.columns(2)
+        for col, label, amount, cap in ((col1, "Spent Today", spent['all'], ledger.daily_cap),
+                                        (col2, "This API Key Today", spent['key'], ledger.key_daily_cap)):
+            with col:
+                st.metric(label, f"${amount:.4f}", help=f"Daily cap: ${cap:.2f}" if cap else "No daily cap")
+                if cap:
+                    st.progress(min(1.0, amount / cap))
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            days = st.selectbox("Period", [1, 7, 30], format_func=lambda d: "Today" if d == 1 else f"Last {d} days")
+        with col2:
+            group = st.selectbox("Group by", ["stage", "model", "sport", "session_id", "api_key_id", "day"])
+        since = (datetime.now(timezone.utc).date() - timedelta(days=days - 1)).isoformat()
+        rows = ledger.aggregate(group, since)
+        if rows:
+            st.dataframe(rows, use_container_width=True, hide_index=True)
+        else:
+            st.info("No LLM spend recorded in this period yet.")
 
-{sport_data['strategy']}
+def show_degraded_notice(response):
+    """Label content served from stored plans while the AI backend is unavailable."""
+    degraded = response.get('degraded')
+    if not degraded:
+        return
+    sources = {"cache": "a recently cached plan", "semantic_cache": "a cached plan for a similar location", "archive": "an archived plan", "demo": "sample demo content"}
+    if degraded.get('spend_cap'):
+        message = f"💰 New plans are paused: {degraded['reason']}."
+    else:
+        message = f"⚠️ The AI service is currently degraded ({degraded['reason']})."
+    if degraded.get('source'):
+        message += f" Showing {sources.get(degraded['source'], 'stored content')} instead of a freshly generated plan."
+    if degraded.get('spend_cap'):
+        message += " Spend caps reset at midnight UTC."
+    elif degraded.get('retry_after'):
+        message += f" Try again in about {degraded['retry_after']:.0f}s."
+    st.warning(message)
 
-Inventory Management:
-• Seasonal planning
-• Trend analysis
-• Supplier relationships
-• Quality control
-            """,
-        "token_usage": {
-            "total_tokens": 1500,
-            "total_cost": 0.045
+def show_location_comparison(response, sport):
+    """Side-by-side comparison of candidate locations built on one shared base plan."""
+    st.markdown('<div class="success-message">✅ Location comparison generated successfully!</div>', unsafe_allow_html=True)
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Locations", len(response['locations']))
+    with col2:
+        st.metric("Total Tokens", f"{response['token_usage']['total_tokens']:,}")
+    with col3:
+        st.metric("Total Cost", f"${response['token_usage']['total_cost']:.4f}")
+    
+    st.markdown(f"### {response['store_name']}")
+    if response.get('tagline'):
+        st.caption(response['tagline'])
+    
+    ranked = sorted(response['locations'], key=lambda item: item.get('market_fit_score', -1), reverse=True)
+    st.markdown('<h3 class="sub-header">📊 Ranking</h3>', unsafe_allow_html=True)
+    st.dataframe([
+        {
+            "Location": item['location'],
+            "Fit Score": item.get('market_fit_score'),
+            "Recommendation": item.get('recommendation', item.get('error', '')),
+            "Pricing": item.get('pricing_adjustment', ''),
+            "Tokens": item.get('total_tokens', 0)
         }
-    }
+        for item in ranked
+    ], use_container_width=True)
+    
+    st.markdown('<h3 class="sub-header">🏙️ Side by Side</h3>', unsafe_allow_html=True)
+    for start in range(0, len(ranked), 3):
+        columns = st.columns(3)
+        for column, item in zip(columns, ranked[start:start + 3]):
+            with column:
+                st.markdown(f"#### {item['location']}")
+                if "error" in item:
+                    st.error(item['error'])
+                    continue
+                st.metric("Fit Score", f"{item['market_fit_score']}/10")
+                st.markdown(f"**Demand:** {item['local_demand']}")
+                st.markdown(f"**Competition:** {item['competition']}")
+                st.markdown(f"**Pricing:** {item['pricing_adjustment']}")
+                st.markdown("**Products:**\n" + "\n".join(f"- {change}" for change in item['product_adjustments']))
+                st.markdown("**Marketing:**\n" + "\n".join(f"- {change}" for change in item['marketing_adjustments']))
+                st.markdown(f"**Risks:** {item['risks']}")
+    
+    with st.expander("📋 Shared Base Plan"):
+        base = response['base_plan']
+        st.markdown("#### Branding Package")
+        st.write(base['branding_package'])
+        st.markdown("#### Product Strategy")
+        st.write(base['product_strategy'])
+        st.markdown("#### Marketing Strategy")
+        st.write(base['marketing_strategy'])
+    
+    st.download_button(
+        label="⬇️ Download Comparison JSON",
+        data=json.dumps(response, indent=2, default=str),
+        file_name=f"sportstore_comparison_{sport}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
+        mime="application/json"
+    )
+
+def generate_demo_response(sport, location=None):
+    """Serve a precomputed demo response for testing without API key."""
+    return demo_corpus.get_demo_response(sport, location)
 
 def main():
     # Header
@@ -190,13 +255,23 @@ def main():
         # Analysis type
         analysis_type = st.radio(
             "📊 Analysis Type",
-            ["Basic (Store Name + Products)", "Comprehensive (Multi-Agent Analysis)"],
-            help="Basic: Quick store name and products\nComprehensive: Full business plan with branding, marketing, and strategy"
+            ["Basic (Store Name + Products)", "Standard (Focused Plan)", "Comprehensive (Multi-Agent Analysis)",
+             "Multi-Location Comparison"],
+            help="Basic: Quick store name and products\nStandard: Key branding, marketing and product decisions, kept short\n"
+                 "Comprehensive: Full business plan with branding, marketing, and strategy\n"
+                 "Comparison: One shared plan adapted to several candidate cities"
         )
         
+        comparison_locations = []
+        if analysis_type == "Multi-Location Comparison":
+            comparison_locations = st.text_area(
+                "🏙️ Candidate Locations (one per line)",
+                placeholder="Chicago, IL\nAustin, TX\nDenver, CO"
+            ).splitlines()
+        
         # Demo mode toggle
         demo_mode = st.checkbox("🎮 Demo Mode", value=False, 
-                              help="Try the app without an API key (limited sports)")
+                              help="Try the app instantly without an API key")
         
         # Advanced options
         with st.expander("🔧 Advanced Options"):
@@ -211,6 +286,9 @@ def main():
         
         st.markdown("---")
     
+    # Previously generated plans
+    show_plan_archive(sport)
+    
     # Main content area
     if sport:
         # Check for API key or demo mode
@@ -237,13 +315,25 @@ def main():
         helper = None
         if not demo_mode:
             try:
-                helper = LangChainHelper.AdvancedLangChainHelper(api_key_to_use)
+                helper = get_helper(api_key_to_use)
             except Exception as e:
                 st.markdown('<div class="error-message">❌ Error Initializing AI Assistant</div>', unsafe_allow_html=True)
                 st.error(f"Failed to initialize AI assistant: {str(e)}")
                 st.info("Please check your API key and internet connection, or enable Demo Mode.")
                 return
         
+        # Each browser session gets its own conversation state on the shared helper
+        if "session_id" not in st.session_state:
+            st.session_state.session_id = uuid.uuid4().hex
+        session_id = st.session_state.session_id if enable_memory else None
+        
+        # Background cache warm-up progress
+        if helper is not None:
+            warmup = helper.cache_warmer.progress()
+            if warmup['running']:
+                st.caption(f"🔥 Warming popular plans: {warmup['completed'] + warmup['skipped']}/{warmup['total']}")
+            show_spend_dashboard(helper.ledger, api_key_to_use)
+        
         # Generate button
         col1, col2, col3 = st.columns([1, 2, 1])
         with col2:
@@ -255,10 +345,18 @@ def main():
                     if demo_mode:
                         st.markdown('<div class="demo-message">🎮 Demo Mode: Showing sample data</div>', unsafe_allow_html=True)
                         response = generate_demo_response(sport, location)
+                    elif analysis_type == "Multi-Location Comparison":
+                        response = helper.generate_location_comparison(sport, comparison_locations)
+                        if "error" in response:
+                            st.error(f"❌ Error: {response['error']}")
+                        else:
+                            show_location_comparison(response, sport)
+                        return
                     else:
                         if analysis_type == "Basic (Store Name + Products)":
                             # Basic analysis
-                            response = helper.generate_store_name_and_items(sport)
+                            response = helper.generate_store_name_and_items(sport, session_id=session_id)
+                            show_degraded_notice(response)
                             
                             # Display results
                             st.markdown('<h2 class="sub-header">🏪 Store Concept</h2>', unsafe_allow_html=True)
@@ -267,6 +365,8 @@ def main():
                             with col1:
                                 st.markdown("### Store Name")
                                 st.success(response['store'].strip())
+                                if response.get('tagline'):
+                                    st.caption(response['tagline'])
                             
                             with col2:
                                 st.markdown("### Products")
@@ -276,8 +376,12 @@ def main():
                             
                             return
                         else:
-                            # Comprehensive analysis
-                            response = helper.generate_comprehensive_store_analysis(sport, location)
+                            # Standard or comprehensive analysis
+                            tier = "standard" if analysis_type.startswith("Standard") else "comprehensive"
+                            response = helper.generate_comprehensive_store_analysis(sport, location, session_id=session_id, tier=tier)
+                            show_degraded_notice(response)
+                            if response.get('semantic_match') and not response.get('degraded'):
+                                st.info(f"♻️ Reusing the plan generated for {response['semantic_match']['location']}, a near-identical location.")
                             
                             if "error" in response:
                                 st.error(f"❌ Error: {response['error']}")
@@ -301,6 +405,15 @@ def main():
                         with col3:
                             st.metric("Analysis Type", "Multi-Agent" if not demo_mode else "Demo")
                     
+                    # Profile of this request when started with --profile or PROFILE_ENABLED
+                    if helper is not None and helper.profiler.last_report:
+                        st.caption(f"🧪 Profile written to {helper.profiler.last_report['report']}")
+                    
+                    # Model routing decisions
+                    if "routing" in response:
+                        with st.expander("🧭 Model Routing"):
+                            st.dataframe(response['routing']['decisions'], use_container_width=True)
+                    
                     # Create tabs for organized display
                     tab1, tab2, tab3, tab4, tab5 = st.tabs(["🏪 Store & Branding", "📦 Products", "📈 Marketing", "📊 Analysis", "💾 Export"])
                     
@@ -374,7 +487,7 @@ STRUCTURED ANALYSIS:
                             st.markdown("### 💬 Conversation History")
                             with st.expander("View conversation history"):
                                 for msg in response['conversation_history']:
-                                    st.write(f"**{msg.type}**: {msg.content}")
+                                    st.write(f"**{msg['role']}**: {msg['content']}")
                 
                 except Exception as e:
                     st.error(f"❌ An error occurred: {str(e)}")
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+tracemalloc memory benchmark for AdvancedLangChainHelper.
+Measures the memory one helper instance retains (the first one, which also builds the
+process-wide shared clients and agents, and each further one), and the memory retained per
+comprehensive plan generated against a local fake OpenAI-compatible backend.
+
+Results are compared with memory_baseline.json so footprint regressions show up.
+
+Usage:
+    python memory_benchmark.py --instances 5 --plans 10
+    python memory_benchmark.py --update-baseline
+"""
+
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import sys
+import tempfile
+import tracemalloc
+from typing import Callable, Dict, List
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "memory_baseline.json")
+# Tracked numbers and the relative growth over the baseline that counts as a regression
+TRACKED = ("first_instance_kib", "per_instance_kib", "per_plan_kib")
+DEFAULT_TOLERANCE = 0.25
+
+
+def retained_kib(build: Callable[[], object], count: int = 1) -> Dict:
+    """KiB still allocated after ``count`` calls of ``build`` once garbage is collected, and the top sources."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    kept = [build() for _ in range(count)]
+    gc.collect()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    stats = after.compare_to(before, "filename")
+    del kept
+    return {
+        "kib": sum(stat.size_diff for stat in stats) / 1024 / count,
+        "top": [f"{stat.traceback[0].filename}: {stat.size_diff / 1024 / count:+.1f} KiB" for stat in stats[:5]]
+    }
+
+
+def run_memory_benchmark(instances: int = 5, plans: int = 10, response_chars: int = 1500) -> Dict:
+    """Per-instance and per-plan retained memory of the helper, in KiB."""
+    from load_test import FakeLLMServer
+    backend = FakeLLMServer(latency=0.0, response_chars=response_chars)
+    backend.start()
+    workdir = tempfile.mkdtemp(prefix="memory-benchmark-")
+    os.environ.update({
+        "OPENAI_BASE_URL": backend.base_url,
+        "CHECKPOINT_DIR": os.path.join(workdir, "checkpoints"),
+        "PLAN_ARCHIVE_PATH": os.path.join(workdir, "plans.db"),
+        "SPEND_LEDGER_PATH": os.path.join(workdir, "spend.db"),
+        # Every measured plan must be generated, not served as a near-duplicate of an earlier one
+        "SEMANTIC_CACHE_ENABLED": "false"
+    })
+    os.environ.pop("REQUEST_LOG_PATH", None)
+    from LangChainHelper import AdvancedLangChainHelper
+
+    def new_helper(api_key: str = "sk-benchmark"):
+        return AdvancedLangChainHelper(api_key=api_key, warmup_pairs=[])
+
+    try:
+        # Shared clients are keyed by API key: a helper on another key loads lazy imports without
+        # building the components measured as part of the first instance
+        new_helper("sk-warmup")
+        first = retained_kib(new_helper)
+        further = retained_kib(new_helper, instances)
+
+        helper = new_helper()
+        locations = iter(f"Benchmark City {index}" for index in range(plans))
+        with contextlib.redirect_stdout(io.StringIO()):
+            # Verbose agent executors print every chain step
+            helper.generate_comprehensive_store_analysis("Tennis", "Warmup City")
+            per_plan = retained_kib(lambda: helper.generate_comprehensive_store_analysis("Tennis", next(locations)), plans)
+        return {
+            "instances": instances,
+            "plans": plans,
+            "response_chars": response_chars,
+            "first_instance_kib": round(first["kib"], 1),
+            "per_instance_kib": round(further["kib"], 1),
+            "per_plan_kib": round(per_plan["kib"], 1),
+            "top_per_instance": further["top"],
+            "top_per_plan": per_plan["top"],
+            "llm_calls": backend.calls
+        }
+    finally:
+        backend.stop()
+
+
+def compare_with_baseline(report: Dict, baseline: Dict, tolerance: float = DEFAULT_TOLERANCE) -> List[str]:
+    """Tracked numbers that grew more than ``tolerance`` over the baseline."""
+    regressions = []
+    for name in TRACKED:
+        if name in baseline and report[name] > baseline[name] * (1 + tolerance):
+            regressions.append(f"{name}: {report[name]:.1f} KiB vs baseline {baseline[name]:.1f} KiB")
+    return regressions
+
+
+def print_report(report: Dict, regressions: List[str]):
+    print("\n🧠 SportStore AI - Memory Benchmark")
+    print("=" * 50)
+    print(f"First helper instance: {report['first_instance_kib']:.1f} KiB (includes shared clients and agents)")
+    print(f"Each further instance: {report['per_instance_kib']:.1f} KiB")
+    for line in report["top_per_instance"]:
+        print(f"  {line}")
+    print(f"Per comprehensive plan: {report['per_plan_kib']:.1f} KiB ({report['plans']} plans, {report['llm_calls']} LLM calls)")
+    for line in report["top_per_plan"]:
+        print(f"  {line}")
+    if regressions:
+        print(f"\n❌ Memory regressions over the baseline: {'; '.join(regressions)}")
+    else:
+        print("\n✅ Within the baseline")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="tracemalloc memory benchmark for the LangChain helper")
+    parser.add_argument("--instances", type=int, default=5, help="Helper instances measured after the first")
+    parser.add_argument("--plans", type=int, default=10, help="Comprehensive plans measured on one helper")
+    parser.add_argument("--response-chars", type=int, default=1500, help="Length of fake LLM text responses")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Allowed relative growth over the baseline")
+    parser.add_argument("--update-baseline", action="store_true", help="Write the tracked numbers to memory_baseline.json")
+    parser.add_argument("--json", help="Also write the report to this JSON file")
+    args = parser.parse_args()
+
+    report = run_memory_benchmark(args.instances, args.plans, args.response_chars)
+    baseline = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH) as f:
+            baseline = json.load(f)
+    regressions = [] if args.update_baseline else compare_with_baseline(report, baseline, args.tolerance)
+    print_report(report, regressions)
+    if args.update_baseline:
+        with open(BASELINE_PATH, "w") as f:
+            json.dump({name: report[name] for name in TRACKED}, f, indent=2)
+            f.write("\n")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1 @@
+# Orchestration package for SportStore AI 
\ No newline at end of file
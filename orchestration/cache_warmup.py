@@ -0,0 +1,169 @@
+import json
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+HotPair = Tuple[str, Optional[str]]
+
+
+class PriorityGate:
+    """Tracks in-flight interactive requests so background work only runs while they are idle."""
+
+    def __init__(self):
+        self._active = 0
+        self._condition = threading.Condition()
+
+    @contextmanager
+    def interactive(self):
+        """Mark an interactive request as in flight for the duration of the block."""
+        with self._condition:
+            self._active += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._active -= 1
+                self._condition.notify_all()
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    def wait_for_idle(self, timeout: float = None) -> bool:
+        """Block until no interactive request is in flight."""
+        with self._condition:
+            return self._condition.wait_for(lambda: self._active == 0, timeout)
+
+
+class RequestLog:
+    """Append-only JSONL log of requested sport/location pairs, used to find hot plans."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def record(self, sport: str, location: str = None):
+        """Append one request to the log."""
+        line = json.dumps({"ts": datetime.now().isoformat(), "sport": sport, "location": location or None})
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def hot_pairs(self, limit: int = 10) -> List[HotPair]:
+        """Most frequently requested sport/location pairs."""
+        if not os.path.exists(self.path):
+            return []
+        counts = Counter()
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                counts[(entry["sport"], entry.get("location"))] += 1
+        return [pair for pair, _ in counts.most_common(limit)]
+
+
+def parse_hot_pairs(value: str) -> List[HotPair]:
+    """Parse "Sport|Location;Sport" into (sport, location) pairs."""
+    pairs = []
+    for item in (value or "").split(";"):
+        if not item.strip():
+            continue
+        sport, _, location = item.partition("|")
+        pairs.append((sport.strip(), location.strip() or None))
+    return pairs
+
+
+def configured_hot_pairs(request_log: RequestLog = None) -> List[HotPair]:
+    """Hot pairs from CACHE_WARMUP_PAIRS, plus the top CACHE_WARMUP_FROM_LOG pairs of the request log."""
+    pairs = parse_hot_pairs(os.getenv("CACHE_WARMUP_PAIRS", ""))
+    from_log = int(os.getenv("CACHE_WARMUP_FROM_LOG", "0") or 0)
+    if from_log and request_log is not None:
+        pairs.extend(pair for pair in request_log.hot_pairs(from_log) if pair not in pairs)
+    return pairs
+
+
+class CacheWarmer:
+    """Populates the response cache for hot sport/location pairs on a low-priority background thread.
+
+    Warm-up gives up, reporting ``gave_up``, when interactive traffic stays busy for
+    ``max_wait_seconds`` (WARMUP_MAX_WAIT, default 600) before an item.
+    """
+
+    def __init__(self, generate: Callable[[str, Optional[str]], Dict], is_cached: Callable[[str, Optional[str]], bool],
+                 gate: PriorityGate, pairs: List[HotPair], pause_seconds: float = 1.0, max_wait_seconds: float = None):
+        self.generate = generate
+        self.is_cached = is_cached
+        self.gate = gate
+        self.pairs = list(pairs)
+        self.pause_seconds = pause_seconds
+        self.max_wait_seconds = max_wait_seconds if max_wait_seconds is not None else float(os.getenv("WARMUP_MAX_WAIT", 600))
+        self._stop = threading.Event()
+        self._thread = None
+        self._progress = {"total": len(self.pairs), "completed": 0, "skipped": 0, "failed": 0,
+                          "current": None, "running": False, "gave_up": False}
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start warming in the background; a no-op when already running or nothing is configured."""
+        if not self.pairs or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="cache-warmup", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = None):
+        """Ask the warmer to stop after the current item."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def progress(self) -> Dict:
+        """Snapshot of warm-up progress."""
+        with self._lock:
+            return dict(self._progress)
+
+    def _update(self, **changes):
+        with self._lock:
+            for key, value in changes.items():
+                self._progress[key] = value
+
+    def _run(self):
+        self._update(running=True)
+        for sport, location in self.pairs:
+            if self._stop.is_set():
+                break
+            if self.is_cached(sport, location):
+                self._update(skipped=self._progress["skipped"] + 1)
+                continue
+
+            if not self._wait_for_idle():
+                break
+
+            self._update(current=f"{sport} / {location or 'General'}")
+            response = self.generate(sport, location)
+            if "error" in response:
+                self._update(failed=self._progress["failed"] + 1)
+            else:
+                self._update(completed=self._progress["completed"] + 1)
+        self._update(running=False, current=None)
+
+    def _wait_for_idle(self) -> bool:
+        """Wait for interactive traffic to drain, then pause briefly; False when stopped or traffic stayed busy too long."""
+        # Interactive traffic keeps priority; short waits keep a stop request from hanging behind busy traffic
+        deadline = time.monotonic() + self.max_wait_seconds
+        while not self._stop.is_set():
+            if self.gate.wait_for_idle(self.pause_seconds):
+                if self._stop.wait(self.pause_seconds):
+                    return False
+                if self.gate.active == 0:
+                    return True
+            if time.monotonic() >= deadline:
+                self._update(gave_up=True)
+                return False
+        return False
@@ -0,0 +1,180 @@
+import atexit
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Union
+
+import httpx
+
+RECORD = "record"
+REPLAY = "replay"
+
+
+def request_key(request: httpx.Request) -> str:
+    """Stable key of an LLM request: method, path and the JSON body with sorted keys."""
+    body = request.content
+    try:
+        body = json.dumps(json.loads(body), sort_keys=True, separators=(",", ":")).encode()
+    except ValueError:
+        pass
+    digest = hashlib.sha256(f"{request.method} {request.url.path}\n".encode() + body)
+    return digest.hexdigest()[:24]
+
+
+class Cassette:
+    """Recorded LLM HTTP interactions, stored as one gzipped JSON file.
+
+    Identical requests are recorded in order and replayed in the same order; once a key's
+    recordings are used up its last response keeps being served.
+    """
+
+    def __init__(self, path: str, mode: str = REPLAY, latency: Union[float, str, None] = None):
+        if mode not in (RECORD, REPLAY):
+            raise ValueError(f"Cassette mode must be '{RECORD}' or '{REPLAY}', not {mode!r}")
+        self.path = path
+        self.mode = mode
+        # Seconds to sleep before each replayed response, or "recorded" to reproduce the original timing
+        self.latency = latency
+        self.interactions: Dict[str, List[Dict]] = defaultdict(list)
+        self._cursors: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+        self.counters = {"recorded": 0, "replayed": 0, "misses": 0}
+        if mode == REPLAY or os.path.exists(path):
+            self.load()
+
+    def load(self):
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            data = json.load(f)
+        for interaction in data["interactions"]:
+            self.interactions[interaction["key"]].append(interaction)
+
+    def save(self):
+        """Write the cassette atomically."""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with self._lock:
+            interactions = [interaction for recorded in self.interactions.values() for interaction in recorded]
+        tmp_path = f"{self.path}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump({"version": 1, "interactions": interactions}, f, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+
+    def record(self, request: httpx.Request, response: httpx.Response, body: bytes, elapsed: float):
+        try:
+            model = json.loads(request.content).get("model")
+        except ValueError:
+            model = None
+        key = request_key(request)
+        with self._lock:
+            self.interactions[key].append({
+                "key": key,
+                "method": request.method,
+                "path": request.url.path,
+                "model": model,
+                "status": response.status_code,
+                "content_type": response.headers.get("content-type", "application/json"),
+                "body": body.decode("utf-8"),
+                "elapsed": round(elapsed, 4)
+            })
+            self.counters["recorded"] += 1
+
+    def replay(self, request: httpx.Request) -> Optional[Dict]:
+        """Next recorded interaction for the request, or None when it was never recorded."""
+        key = request_key(request)
+        with self._lock:
+            recorded = self.interactions.get(key)
+            if not recorded:
+                self.counters["misses"] += 1
+                return None
+            interaction = recorded[min(self._cursors[key], len(recorded) - 1)]
+            self._cursors[key] += 1
+            self.counters["replayed"] += 1
+        return interaction
+
+    def replay_delay(self, interaction: Dict) -> float:
+        if self.latency == "recorded":
+            return interaction.get("elapsed", 0.0)
+        return float(self.latency or 0.0)
+
+
+_active_cassette: Optional[Cassette] = None
+
+
+def active_cassette() -> Optional[Cassette]:
+    return _active_cassette
+
+
+@contextmanager
+def use_cassette(path: str, mode: str = REPLAY, latency: Union[float, str, None] = None):
+    """Record or replay all LLM traffic of the process inside the block; a recording is saved on exit."""
+    global _active_cassette
+    previous, _active_cassette = _active_cassette, Cassette(path, mode, latency)
+    try:
+        yield _active_cassette
+    finally:
+        if _active_cassette.mode == RECORD:
+            _active_cassette.save()
+        _active_cassette = previous
+
+
+def configure_from_env():
+    """Activate the cassette named by CASSETTE_MODE and CASSETTE_PATH for the whole process."""
+    global _active_cassette
+    mode = os.getenv("CASSETTE_MODE", "").lower()
+    if mode not in (RECORD, REPLAY):
+        return
+    latency = os.getenv("CASSETTE_LATENCY") or None
+    if latency not in (None, "recorded"):
+        latency = float(latency)
+    _active_cassette = Cassette(os.getenv("CASSETTE_PATH", os.path.join(".cassettes", "default.json.gz")), mode, latency)
+    if mode == RECORD:
+        atexit.register(_active_cassette.save)
+
+
+class CassetteTransport(httpx.BaseTransport):
+    """Transport that records responses of the wrapped transport to, or replays them from, the active cassette.
+
+    Whole responses are captured, so streamed completions are replayed in one chunk.
+    """
+
+    def __init__(self, transport: httpx.BaseTransport):
+        self.transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        cassette = _active_cassette
+        if cassette is None:
+            return self.transport.handle_request(request)
+        request.read()
+
+        if cassette.mode == REPLAY:
+            interaction = cassette.replay(request)
+            if interaction is None:
+                return httpx.Response(404, json={"error": {
+                    "message": f"No cassette recording for {request.method} {request.url.path} in {cassette.path}",
+                    "type": "cassette_miss"
+                }}, request=request)
+            delay = cassette.replay_delay(interaction)
+            if delay:
+                time.sleep(delay)
+            return httpx.Response(interaction["status"], headers={"content-type": interaction["content_type"]},
+                                  content=interaction["body"].encode("utf-8"), request=request)
+
+        start = time.perf_counter()
+        response = self.transport.handle_request(request)
+        try:
+            body = response.read()
+        finally:
+            response.close()
+        cassette.record(request, response, body, time.perf_counter() - start)
+        return httpx.Response(response.status_code, headers={"content-type": response.headers.get("content-type", "application/json")},
+                              content=body, request=request)
+
+    def close(self):
+        self.transport.close()
+
+
+configure_from_env()
@@ -0,0 +1,98 @@
+import json
+import os
+import re
+import threading
+import uuid
+from datetime import datetime
+from typing import Dict, Optional
+
+_RUN_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]+$")
+
+
+class CheckpointStore:
+    """Local store of completed pipeline stages, keyed by run id, so failed runs can resume.
+
+    Checkpoints of completed runs are deleted; only failed or interrupted runs are kept.
+    """
+
+    def __init__(self, directory: str = None):
+        self.directory = directory or os.getenv("CHECKPOINT_DIR", ".checkpoints")
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def new_run_id() -> str:
+        """Create a fresh run id."""
+        return uuid.uuid4().hex
+
+    def _path(self, run_id: str) -> str:
+        if not _RUN_ID_PATTERN.match(run_id):
+            raise ValueError(f"Invalid run id: {run_id!r}")
+        return os.path.join(self.directory, f"{run_id}.json")
+
+    def _write(self, run_id: str, run: Dict):
+        # Write to a temp file and swap it in so a crash never leaves a torn checkpoint
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(run_id)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(run, f, indent=2)
+        os.replace(tmp_path, path)
+
+    def load(self, run_id: str) -> Optional[Dict]:
+        """Load a run checkpoint, or None if the run is unknown."""
+        path = self._path(run_id)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def start_run(self, run_id: str, request: Dict) -> Dict:
+        """Create the checkpoint for a run, keeping any existing progress.
+
+        Progress saved under the same run id for a different request is discarded, so a reused
+        run id never resumes the stages of another sport, location or tier.
+        """
+        with self._lock:
+            run = self.load(run_id)
+            if run is None or run.get("request") != request:
+                run = {
+                    "run_id": run_id,
+                    "request": request,
+                    "status": "running",
+                    "stages": {},
+                    "created_at": datetime.now().isoformat()
+                }
+                self._write(run_id, run)
+            return run
+
+    def load_stages(self, run_id: str) -> Dict:
+        """Completed stage outputs of a run."""
+        run = self.load(run_id)
+        return run["stages"] if run else {}
+
+    def save_stage(self, run_id: str, stage: str, result: Dict):
+        """Checkpoint the output of a completed stage."""
+        with self._lock:
+            run = self.load(run_id) or {"run_id": run_id, "request": {}, "stages": {}}
+            run["stages"][stage] = result
+            run["status"] = "running"
+            run["updated_at"] = datetime.now().isoformat()
+            self._write(run_id, run)
+
+    def mark_status(self, run_id: str, status: str, error: str = None):
+        """Record the run outcome (complete or failed)."""
+        with self._lock:
+            run = self.load(run_id)
+            if run is None:
+                return
+            run["status"] = status
+            run["error"] = error
+            run["updated_at"] = datetime.now().isoformat()
+            self._write(run_id, run)
+
+    def delete(self, run_id: str):
+        """Remove a run checkpoint."""
+        with self._lock:
+            path = self._path(run_id)
+            if os.path.exists(path):
+                os.remove(path)
@@ -0,0 +1,127 @@
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of making an LLM call while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Stops LLM calls while the backend is failing or slow, and probes it for recovery.
+
+    Closed: calls go through; the breaker opens when, over the last ``window_seconds``, at least
+    ``min_calls`` finished and the error rate or slow-call rate reaches its threshold.
+    Open: calls are refused for ``open_seconds``. Half-open: up to ``half_open_probes`` calls go
+    through; a successful probe closes the breaker, a failed or slow one opens it again.
+    """
+
+    def __init__(self, window_seconds: float = None, min_calls: int = None, error_rate: float = None,
+                 slow_call_seconds: float = None, slow_call_rate: float = None, open_seconds: float = None,
+                 half_open_probes: int = None):
+        self.window_seconds = window_seconds or float(os.getenv("CIRCUIT_WINDOW_SECONDS", 60))
+        self.min_calls = min_calls or int(os.getenv("CIRCUIT_MIN_CALLS", 10))
+        self.error_rate = error_rate or float(os.getenv("CIRCUIT_ERROR_RATE", 0.5))
+        self.slow_call_seconds = slow_call_seconds or float(os.getenv("CIRCUIT_SLOW_CALL_SECONDS", 30))
+        self.slow_call_rate = slow_call_rate or float(os.getenv("CIRCUIT_SLOW_CALL_RATE", 0.8))
+        self.open_seconds = open_seconds or float(os.getenv("CIRCUIT_OPEN_SECONDS", 30))
+        self.half_open_probes = half_open_probes or int(os.getenv("CIRCUIT_HALF_OPEN_PROBES", 1))
+        self._calls = deque()  # (finished_at, failed, slow)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._lock = threading.Lock()
+        self.counters = {"opened": 0, "rejected": 0, "probes": 0}
+        self.last_failure = None
+
+    def _refresh(self, now: float):
+        if self._state == OPEN and now - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._probes_in_flight = 0
+        while self._calls and now - self._calls[0][0] > self.window_seconds:
+            self._calls.popleft()
+
+    def _open(self, now: float):
+        self._state = OPEN
+        self._opened_at = now
+        self._calls.clear()
+        self.counters["opened"] += 1
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._refresh(time.monotonic())
+            return self._state
+
+    def accepting(self) -> bool:
+        """Whether a new request may try the backend (closed, or half-open with probe capacity left)."""
+        with self._lock:
+            self._refresh(time.monotonic())
+            return self._state == CLOSED or (self._state == HALF_OPEN and self._probes_in_flight < self.half_open_probes)
+
+    def allow(self) -> bool:
+        """Admit one call; in the half-open state this takes a probe slot that ``record`` gives back."""
+        with self._lock:
+            self._refresh(time.monotonic())
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and self._probes_in_flight < self.half_open_probes:
+                self._probes_in_flight += 1
+                self.counters["probes"] += 1
+                return True
+            self.counters["rejected"] += 1
+            return False
+
+    def record(self, seconds: float, error: Exception = None):
+        """Record the outcome of an admitted call."""
+        now = time.monotonic()
+        slow = seconds >= self.slow_call_seconds
+        with self._lock:
+            if error is not None:
+                self.last_failure = str(error)
+            if self._state == HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                if error is not None or slow:
+                    self._open(now)
+                else:
+                    self._state = CLOSED
+                    self._calls.clear()
+                return
+            if self._state == OPEN:
+                # A call admitted before the breaker opened; its outcome is already accounted for
+                return
+            self._calls.append((now, error is not None, slow))
+            self._refresh(now)
+            calls = len(self._calls)
+            if calls >= self.min_calls:
+                failures = sum(1 for _, failed, _ in self._calls if failed)
+                slow_calls = sum(1 for _, _, was_slow in self._calls if was_slow)
+                if failures / calls >= self.error_rate or slow_calls / calls >= self.slow_call_rate:
+                    self._open(now)
+
+    def retry_after(self) -> float:
+        """Seconds until the breaker lets a probe through; 0 when it is not open."""
+        with self._lock:
+            self._refresh(time.monotonic())
+            if self._state != OPEN:
+                return 0.0
+            return max(0.0, self.open_seconds - (time.monotonic() - self._opened_at))
+
+    def stats(self) -> Dict:
+        """State, recent call outcomes and counters."""
+        with self._lock:
+            self._refresh(time.monotonic())
+            return dict(
+                self.counters,
+                state=self._state,
+                recent_calls=len(self._calls),
+                recent_failures=sum(1 for _, failed, _ in self._calls if failed),
+                recent_slow_calls=sum(1 for _, _, slow in self._calls if slow),
+                last_failure=self.last_failure
+            )
@@ -0,0 +1,282 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+
+class CoordinationBackend(ABC):
+    """State shared by every helper using the backend: cache entries, rate-limit buckets and locks.
+
+    Values are strings (callers serialize); expiry and bucket refill use wall-clock time so that
+    separate processes agree. ``shared`` is True when other processes see the same state.
+    """
+
+    shared = False
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[str]:
+        """Value stored under ``key``, or None when it is missing or expired."""
+
+    @abstractmethod
+    def set(self, key: str, value: str, ttl_seconds: float):
+        """Store ``value`` under ``key`` for ``ttl_seconds``."""
+
+    @abstractmethod
+    def keys(self, prefix: str) -> List[str]:
+        """Unexpired keys starting with ``prefix``."""
+
+    @abstractmethod
+    def delete(self, prefix: str = ""):
+        """Drop every entry whose key starts with ``prefix``."""
+
+    @abstractmethod
+    def take_token(self, bucket: str, rate: float, capacity: float) -> float:
+        """Take one token from a bucket refilled at ``rate`` per second; seconds to wait if it is empty."""
+
+    @abstractmethod
+    def try_lock(self, name: str, ttl_seconds: float) -> Optional[str]:
+        """Owner token if the lock was free (or its holder's lease expired), otherwise None."""
+
+    @abstractmethod
+    def renew_lock(self, name: str, token: str, ttl_seconds: float) -> bool:
+        """Extend a held lock's lease to ``ttl_seconds`` from now; False if ``token`` no longer owns it."""
+
+    @abstractmethod
+    def unlock(self, name: str, token: str):
+        """Release the lock if ``token`` still owns it."""
+
+    def stats(self) -> Dict:
+        return {"backend": type(self).__name__, "shared": self.shared}
+
+
+def _refill(tokens: float, updated_at: float, now: float, rate: float, capacity: float) -> Tuple[float, float]:
+    """Tokens left after taking one, and seconds to wait (0 when the take succeeded)."""
+    tokens = min(capacity, tokens + (now - updated_at) * rate)
+    if tokens >= 1:
+        return tokens - 1, 0.0
+    return tokens, (1 - tokens) / rate
+
+
+class LocalBackend(CoordinationBackend):
+    """In-process backend; the default, coordinating only the helpers of one process."""
+
+    def __init__(self):
+        self._entries: Dict[str, Tuple[float, str]] = {}
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._locks: Dict[str, Tuple[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.time():
+                self._entries.pop(key, None)
+                return None
+            return entry[1]
+
+    def set(self, key: str, value: str, ttl_seconds: float):
+        with self._lock:
+            self._entries[key] = (time.time() + ttl_seconds, value)
+
+    def keys(self, prefix: str) -> List[str]:
+        now = time.time()
+        with self._lock:
+            return [key for key, (expires_at, _) in self._entries.items() if key.startswith(prefix) and expires_at >= now]
+
+    def delete(self, prefix: str = ""):
+        with self._lock:
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                del self._entries[key]
+
+    def take_token(self, bucket: str, rate: float, capacity: float) -> float:
+        now = time.time()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(bucket, (capacity, now))
+            tokens, wait = _refill(tokens, updated_at, now, rate, capacity)
+            self._buckets[bucket] = (tokens, now)
+            return wait
+
+    def try_lock(self, name: str, ttl_seconds: float) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            holder = self._locks.get(name)
+            if holder is not None and holder[1] >= now:
+                return None
+            token = uuid.uuid4().hex
+            self._locks[name] = (token, now + ttl_seconds)
+            return token
+
+    def renew_lock(self, name: str, token: str, ttl_seconds: float) -> bool:
+        with self._lock:
+            if self._locks.get(name, (None,))[0] != token:
+                return False
+            self._locks[name] = (token, time.time() + ttl_seconds)
+            return True
+
+    def unlock(self, name: str, token: str):
+        with self._lock:
+            if self._locks.get(name, (None,))[0] == token:
+                del self._locks[name]
+
+
+class SQLiteBackend(CoordinationBackend):
+    """Backend in a SQLite file in WAL mode, shared by every process on the host that opens the same path.
+
+    Bucket and lock updates run in ``BEGIN IMMEDIATE`` transactions, so a read-modify-write is
+    atomic across processes; readers are not blocked by the single writer under WAL.
+    """
+
+    shared = True
+
+    def __init__(self, path: str = None):
+        self.path = path or os.getenv("COORDINATION_PATH", ".coordination.db")
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._init_schema()
+
+    @contextmanager
+    def _connect(self, immediate: bool = False):
+        # Short-lived connections keep the backend safe to use from worker threads and other processes
+        with self._lock:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            try:
+                conn.execute("PRAGMA synchronous = NORMAL")
+                conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+                try:
+                    yield conn
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+                conn.execute("COMMIT")
+            finally:
+                conn.close()
+
+    def _init_schema(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS locks (name TEXT PRIMARY KEY, token TEXT NOT NULL, expires_at REAL NOT NULL)")
+        finally:
+            conn.close()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM entries WHERE key = ? AND expires_at >= ?", (key, time.time())).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: str, ttl_seconds: float):
+        now = time.time()
+        with self._connect(immediate=True) as conn:
+            conn.execute("INSERT OR REPLACE INTO entries (key, value, expires_at) VALUES (?, ?, ?)", (key, value, now + ttl_seconds))
+            self._writes += 1
+            if self._writes % 100 == 0:
+                conn.execute("DELETE FROM entries WHERE expires_at < ?", (now,))
+
+    def keys(self, prefix: str) -> List[str]:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT key FROM entries WHERE substr(key, 1, ?) = ? AND expires_at >= ?",
+                                (len(prefix), prefix, time.time())).fetchall()
+        return [row[0] for row in rows]
+
+    def delete(self, prefix: str = ""):
+        with self._connect(immediate=True) as conn:
+            conn.execute("DELETE FROM entries WHERE substr(key, 1, ?) = ?", (len(prefix), prefix))
+
+    def take_token(self, bucket: str, rate: float, capacity: float) -> float:
+        with self._connect(immediate=True) as conn:
+            now = time.time()
+            row = conn.execute("SELECT tokens, updated_at FROM buckets WHERE name = ?", (bucket,)).fetchone()
+            tokens, wait = _refill(*(row or (capacity, now)), now, rate, capacity)
+            conn.execute("INSERT OR REPLACE INTO buckets (name, tokens, updated_at) VALUES (?, ?, ?)", (bucket, tokens, now))
+        return wait
+
+    def try_lock(self, name: str, ttl_seconds: float) -> Optional[str]:
+        token = uuid.uuid4().hex
+        with self._connect(immediate=True) as conn:
+            now = time.time()
+            conn.execute("DELETE FROM locks WHERE name = ? AND expires_at < ?", (name, now))
+            acquired = conn.execute("INSERT OR IGNORE INTO locks (name, token, expires_at) VALUES (?, ?, ?)",
+                                    (name, token, now + ttl_seconds)).rowcount
+        return token if acquired else None
+
+    def renew_lock(self, name: str, token: str, ttl_seconds: float) -> bool:
+        with self._connect(immediate=True) as conn:
+            return conn.execute("UPDATE locks SET expires_at = ? WHERE name = ? AND token = ?",
+                                (time.time() + ttl_seconds, name, token)).rowcount > 0
+
+    def unlock(self, name: str, token: str):
+        with self._connect(immediate=True) as conn:
+            conn.execute("DELETE FROM locks WHERE name = ? AND token = ?", (name, token))
+
+    def stats(self) -> Dict:
+        with self._connect() as conn:
+            entries = conn.execute("SELECT COUNT(*) FROM entries WHERE expires_at >= ?", (time.time(),)).fetchone()[0]
+        return dict(super().stats(), path=self.path, entries=entries)
+
+
+BACKENDS = {"local": LocalBackend, "sqlite": SQLiteBackend}
+
+
+def backend_from_env() -> CoordinationBackend:
+    """Backend named by COORDINATION_BACKEND ("local" or "sqlite")."""
+    name = os.getenv("COORDINATION_BACKEND", "local").lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown coordination backend {name!r}; expected one of {', '.join(BACKENDS)}")
+    return BACKENDS[name]()
+
+
+class RateLimiter:
+    """Token-bucket limit on LLM stage calls per API key, enforced across every process sharing the backend.
+
+    ``per_minute`` (LLM_RATE_LIMIT_RPM, empty for no limit) refills the bucket; ``burst``
+    (LLM_RATE_LIMIT_BURST, default one second's worth, at least 1) is its capacity. Callers over the
+    limit sleep until a token is free.
+    """
+
+    def __init__(self, backend: CoordinationBackend, per_minute: float = None, burst: float = None):
+        self.backend = backend
+        configured = os.getenv("LLM_RATE_LIMIT_RPM")
+        self.per_minute = per_minute if per_minute is not None else (float(configured) if configured else None)
+        configured_burst = os.getenv("LLM_RATE_LIMIT_BURST")
+        self.burst = burst if burst is not None else (float(configured_burst) if configured_burst else None)
+        self.counters = {"calls": 0, "throttled": 0}
+        self._wait_seconds = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.per_minute)
+
+    def wait(self, bucket: str) -> float:
+        """Block until the bucket grants a call; returns the seconds waited."""
+        if not self.enabled:
+            return 0.0
+        rate = self.per_minute / 60
+        capacity = max(1.0, self.burst or rate)
+        waited = 0.0
+        while True:
+            delay = self.backend.take_token(f"rate:{bucket}", rate, capacity)
+            if delay <= 0:
+                break
+            # Another process may take the refilled token first, so ask again after sleeping
+            time.sleep(delay)
+            waited += delay
+        with self._lock:
+            self.counters["calls"] += 1
+            if waited:
+                self.counters["throttled"] += 1
+                self._wait_seconds += waited
+        return waited
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return dict(self.counters, per_minute=self.per_minute, wait_seconds=round(self._wait_seconds, 3))
@@ -0,0 +1,159 @@
+import copy
+import json
+import os
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "demo_corpus.json")
+
+
+def _render_response(sport: str, data: Dict, location: str = None, variant: Dict = None) -> Dict:
+    """Render one demo response in the same schema as the live comprehensive analysis."""
+    products = ', '.join(data['products'])
+    market_note = variant['market_note'] if variant else f"Growing interest in {sport} participation"
+    competitors = ', '.join(variant['competitors']) if variant else "Focus on specialized expertise"
+    marketing = f"{data['marketing']}\n\nLocal focus for {location}: {variant['marketing_note']}" if variant else data['marketing']
+
+    structured_analysis = f"""
+Store Analysis:
+- Store Name: {data['store_name']}
+- Tagline: {data['tagline']}
+- Target Audience: Sports enthusiasts and athletes{f" in {location}" if location else ""}
+- Price Range: Mid to premium
+- Unique Selling Proposition: Specialized {sport} expertise
+
+Product Recommendations:
+- Category: Equipment and Apparel
+- Items: {products}
+- Description: Comprehensive {sport} gear for all skill levels
+
+Market Insights:
+- Trend Analysis: {market_note}
+- Competitive Landscape: {competitors}
+- Opportunities: Local community engagement
+- Challenges: Competition from big-box retailers
+
+Success Factors:
+- Key Factors: Expert staff, quality products, community involvement
+- Risk Mitigation: Diversified product mix, strong online presence
+- Growth Potential: Youth programs and tournament partnerships
+            """
+
+    return {
+        "run_id": None,
+        "resumed_stages": [],
+        "store_name": data['store_name'],
+        "tagline": data['tagline'],
+        "comprehensive_analysis": {
+            "structured_analysis": structured_analysis,
+            "sport": sport,
+            "store_name": data['store_name'],
+            "location": location
+        },
+        "branding_package": f"""
+BRANDING PACKAGE FOR {sport.upper()} STORE
+
+Store Name: {data['store_name']}
+Tagline: {data['tagline']}
+Brand Colors: {data['branding']}
+Target Audience: {sport} enthusiasts of all ages
+Brand Personality: Professional, passionate, community-focused
+            """,
+        "marketing_strategy": f"""
+MARKETING STRATEGY
+
+{marketing}
+
+Key Channels:
+• Social Media Marketing
+• Local Community Events
+• Partnership Programs
+• Online Advertising
+• Email Campaigns
+
+Budget Allocation:
+• Digital Marketing: 40%
+• Local Advertising: 30%
+• Community Events: 20%
+• Partnerships: 10%
+            """,
+        "product_strategy": f"""
+PRODUCT STRATEGY
+
+Core Products: {products}
+
+{data['strategy']}
+
+Inventory Management:
+• Seasonal planning
+• Trend analysis
+• Supplier relationships
+• Quality control
+            """,
+        "token_usage": {
+            "total_tokens": 0,
+            "total_cost": 0.0
+        },
+        "routing": {"decisions": [], "spent_tokens": 0, "spent_cost": 0.0, "max_tokens": None, "max_cost": None},
+        "conversation_history": [],
+        "source": "demo"
+    }
+
+
+@lru_cache(maxsize=1)
+def load_demo_corpus() -> Tuple[Dict[Tuple[str, Optional[str]], Dict], Dict[str, str], Dict[str, str]]:
+    """Load the corpus file once and pre-render every sport and location variant.
+
+    Returns the rendered responses keyed by (sport, location), a map of location aliases
+    and a map of lower-cased sport names.
+    """
+    with open(CORPUS_PATH, encoding="utf-8") as f:
+        corpus = json.load(f)
+
+    responses = {}
+    aliases = {}
+    sports = {sport.lower(): sport for sport in corpus["sports"]}
+    for location, variant in corpus["locations"].items():
+        aliases[location.lower()] = location
+        for alias in variant["aliases"]:
+            aliases[alias] = location
+
+    for sport, data in corpus["sports"].items():
+        responses[(sport, None)] = _render_response(sport, data)
+        for location, variant in corpus["locations"].items():
+            responses[(sport, location)] = _render_response(sport, data, location, variant)
+
+    return responses, aliases, sports
+
+
+def match_location(location: str = None) -> Optional[str]:
+    """Map free-text location input onto a precomputed location variant."""
+    if not location:
+        return None
+    _, aliases, _ = load_demo_corpus()
+    key = location.strip().lower()
+    if key in aliases:
+        return aliases[key]
+    city = key.split(",")[0].strip()
+    return aliases.get(city)
+
+
+def available_demo_sports() -> List[str]:
+    """Sports covered by the demo corpus."""
+    _, _, sports = load_demo_corpus()
+    return sorted(sports.values())
+
+
+def get_demo_response(sport: str, location: str = None) -> Optional[Dict]:
+    """Serve a precomputed demo response, or None when the sport is not in the corpus."""
+    responses, _, sports = load_demo_corpus()
+    sport = sports.get(sport.strip().lower())
+    if sport is None:
+        return None
+
+    variant = match_location(location)
+    response = copy.deepcopy(responses[(sport, variant)])
+    if location and variant is None:
+        # Unknown location: general content, labeled with the requested location
+        response["comprehensive_analysis"]["location"] = location
+    return response
@@ -0,0 +1,140 @@
+import contextvars
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+# Threads available to stage attempts; abandoned attempts hold one until their HTTP timeout fires
+ATTEMPT_WORKERS = 32
+
+
+class StageTimeoutError(TimeoutError):
+    """Raised when no attempt of a stage finishes within the stage deadline."""
+
+
+def llm_client_timeouts() -> Dict:
+    """Per-request HTTP timeout and retry count for the OpenAI clients.
+
+    Bounds how long a hung call can hold a thread after its stage has given up on it.
+    """
+    return {
+        "timeout": float(os.getenv("LLM_REQUEST_TIMEOUT", 60)),
+        "max_retries": int(os.getenv("LLM_MAX_RETRIES", 2))
+    }
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies per key, for straggler detection."""
+
+    def __init__(self, window: int = 200):
+        self._samples: Dict[Hashable, deque] = defaultdict(lambda: deque(maxlen=window))
+        self._lock = threading.Lock()
+
+    def record(self, key: Hashable, seconds: float):
+        with self._lock:
+            self._samples[key].append(seconds)
+
+    def percentile(self, key: Hashable, quantile: float, min_samples: int = 1) -> Optional[float]:
+        """Latency at the quantile, or None until the key has min_samples observations."""
+        with self._lock:
+            samples = sorted(self._samples.get(key, ()))
+        if len(samples) < max(1, min_samples):
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * quantile))]
+
+
+class HedgedRunner:
+    """Runs stage calls under a deadline, duplicating stragglers once they pass the observed tail latency.
+
+    A duplicate (hedge) is issued when the first attempt is still running after the stage's
+    observed percentile latency, and only while hedges stay under ``max_ratio`` of all calls and
+    the caller's spend check allows it. The first attempt to succeed wins; the other keeps
+    running to completion on its thread, since a blocking LLM call cannot be cancelled.
+    """
+
+    def __init__(self, enabled: bool = None, quantile: float = None, min_samples: int = None,
+                 min_delay: float = None, max_ratio: float = None, tracker: LatencyTracker = None):
+        self.enabled = enabled if enabled is not None else os.getenv("HEDGE_ENABLED", "").lower() in ("1", "true", "yes")
+        self.quantile = quantile or float(os.getenv("HEDGE_PERCENTILE", 0.95))
+        self.min_samples = min_samples or int(os.getenv("HEDGE_MIN_SAMPLES", 20))
+        self.min_delay = min_delay if min_delay is not None else float(os.getenv("HEDGE_MIN_DELAY", 1.0))
+        self.max_ratio = max_ratio if max_ratio is not None else float(os.getenv("HEDGE_MAX_RATIO", 0.1))
+        self.tracker = tracker or LatencyTracker()
+        self.counters = {"calls": 0, "hedges": 0, "hedge_wins": 0, "timeouts": 0, "hedges_denied": 0}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=ATTEMPT_WORKERS, thread_name_prefix="stage-attempt")
+
+    def hedge_delay(self, key: Hashable) -> Optional[float]:
+        """Seconds after which a call is a straggler, or None when hedging is off or not yet calibrated."""
+        if not self.enabled:
+            return None
+        observed = self.tracker.percentile(key, self.quantile, self.min_samples)
+        return None if observed is None else max(observed, self.min_delay)
+
+    def _take_hedge_slot(self, allow_hedge: Optional[Callable[[], bool]]) -> bool:
+        with self._lock:
+            over_ratio = self.counters["hedges"] + 1 > self.max_ratio * self.counters["calls"]
+            if over_ratio or (allow_hedge is not None and not allow_hedge()):
+                self.counters["hedges_denied"] += 1
+                return False
+            self.counters["hedges"] += 1
+            return True
+
+    def run(self, key: Hashable, attempt: Callable[[int], Any], timeout: float = None,
+            allow_hedge: Callable[[], bool] = None) -> Tuple[Any, Dict]:
+        """Run ``attempt(0)``, hedging with ``attempt(1)`` if it straggles; returns (result, info).
+
+        ``allow_hedge`` is asked right before a duplicate is issued and should reserve its spend.
+        Raises StageTimeoutError at the deadline, or the first attempt's error if every attempt fails.
+        """
+        with self._lock:
+            self.counters["calls"] += 1
+        delay = self.hedge_delay(key)
+        if timeout is None and delay is None:
+            # Nothing to enforce: run inline without a thread hop
+            start = time.perf_counter()
+            result = attempt(0)
+            self.tracker.record(key, time.perf_counter() - start)
+            return result, {"hedged": False, "winner": 0}
+
+        start = time.perf_counter()
+        deadline = start + timeout if timeout is not None else None
+        attempts = {self._pool.submit(contextvars.copy_context().run, attempt, 0): 0}
+        pending = set(attempts)
+        info = {"hedged": False, "winner": None}
+        errors = []
+        while pending:
+            waits = [moment - time.perf_counter() for moment in (deadline, None if delay is None else start + delay)
+                     if moment is not None]
+            done, pending = wait(pending, timeout=max(0.0, min(waits)) if waits else None, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    self.tracker.record(key, time.perf_counter() - start)
+                    info["winner"] = attempts[future]
+                    if info["winner"] > 0:
+                        with self._lock:
+                            self.counters["hedge_wins"] += 1
+                    return future.result(), info
+                errors.append(future.exception())
+            if not pending:
+                break
+            now = time.perf_counter()
+            if deadline is not None and now >= deadline:
+                with self._lock:
+                    self.counters["timeouts"] += 1
+                raise StageTimeoutError(f"Stage did not finish within {timeout:.0f}s")
+            if delay is not None and now >= start + delay:
+                delay = None
+                if self._take_hedge_slot(allow_hedge):
+                    hedge = self._pool.submit(contextvars.copy_context().run, attempt, 1)
+                    attempts[hedge] = 1
+                    pending.add(hedge)
+                    info["hedged"] = True
+        raise errors[0]
+
+    def stats(self) -> Dict:
+        """Call, hedge and timeout counters."""
+        with self._lock:
+            return dict(self.counters, enabled=self.enabled, quantile=self.quantile, max_ratio=self.max_ratio)
@@ -0,0 +1,110 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List
+
+
+class PoolExhaustedError(TimeoutError):
+    """Raised when no pooled object becomes free within the acquire timeout."""
+
+
+class HelperPool:
+    """Bounded, thread-safe pool of pre-built helpers (or other costly objects), reused across calls.
+
+    At most ``size`` objects exist; callers wait up to ``acquire_timeout`` seconds for a free one.
+    ``reset`` runs on every object handed back, so no per-call state leaks into the next caller.
+    An object whose call raised is reset too, or dropped if its reset fails.
+    """
+
+    def __init__(self, factory: Callable[[], Any], size: int = None, acquire_timeout: float = None,
+                 reset: Callable[[Any], None] = None):
+        self.factory = factory
+        self.size = size or int(os.getenv("HELPER_POOL_SIZE", 4))
+        self.acquire_timeout = acquire_timeout if acquire_timeout is not None else float(os.getenv("HELPER_POOL_TIMEOUT", 30))
+        self.reset = reset
+        self._idle: List[Any] = []
+        self._created = 0
+        self._in_use = 0
+        self._condition = threading.Condition()
+        self.counters = {"acquired": 0, "waited": 0, "timeouts": 0, "discarded": 0}
+        self._wait_seconds = 0.0
+        self._max_wait_seconds = 0.0
+        self._build_seconds = 0.0
+
+    def _take(self) -> Any:
+        """Reserve an idle object, or None when a new one may be built; waits while the pool is full."""
+        started = time.perf_counter()
+        deadline = started + self.acquire_timeout
+        with self._condition:
+            waited = False
+            while not self._idle and self._created >= self.size:
+                waited = True
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0 or not self._condition.wait(remaining):
+                    if not self._idle and self._created >= self.size:
+                        self.counters["timeouts"] += 1
+                        raise PoolExhaustedError(f"No pooled object became free within {self.acquire_timeout:.0f}s")
+            if waited:
+                waited_for = time.perf_counter() - started
+                self.counters["waited"] += 1
+                self._wait_seconds += waited_for
+                self._max_wait_seconds = max(self._max_wait_seconds, waited_for)
+            self.counters["acquired"] += 1
+            self._in_use += 1
+            if self._idle:
+                return self._idle.pop()
+            # Reserve the slot before building outside the lock
+            self._created += 1
+            return None
+
+    def _give_back(self, obj: Any, keep: bool):
+        with self._condition:
+            self._in_use -= 1
+            if keep:
+                self._idle.append(obj)
+            else:
+                self._created -= 1
+                self.counters["discarded"] += 1
+            self._condition.notify()
+
+    @contextmanager
+    def acquire(self):
+        """Borrow an object for the duration of the block."""
+        obj = self._take()
+        if obj is None:
+            started = time.perf_counter()
+            try:
+                obj = self.factory()
+            except Exception:
+                with self._condition:
+                    self._in_use -= 1
+                    self._created -= 1
+                    self._condition.notify()
+                raise
+            with self._condition:
+                self._build_seconds += time.perf_counter() - started
+        keep = True
+        try:
+            yield obj
+        finally:
+            if self.reset is not None:
+                try:
+                    self.reset(obj)
+                except Exception:
+                    keep = False
+            self._give_back(obj, keep)
+
+    def stats(self) -> Dict:
+        """Pool size, occupancy, waits and construction time."""
+        with self._condition:
+            return dict(
+                self.counters,
+                size=self.size,
+                created=self._created,
+                idle=len(self._idle),
+                in_use=self._in_use,
+                wait_seconds=round(self._wait_seconds, 3),
+                max_wait_seconds=round(self._max_wait_seconds, 3),
+                build_seconds=round(self._build_seconds, 3)
+            )
@@ -0,0 +1,63 @@
+from typing import Dict, List, Optional
+from pydantic import BaseModel, Field
+
+
+class OutputProfile(BaseModel):
+    name: str
+    description: str = ""
+    max_output_tokens: Dict[str, int] = Field(default_factory=dict, description="Completion caps per stage, below the routing limits")
+    sections: Dict[str, List[str]] = Field(default_factory=dict, description="Sections each agent stage should write; all when absent")
+    verbosity: str = Field(default="", description="Length instruction added to every agent request")
+    skip_stages: List[str] = Field(default_factory=list, description="Optional stages this tier leaves out")
+
+    def output_limit(self, stage: str, routed_limit: Optional[int]) -> Optional[int]:
+        """Completion limit for a stage: the tighter of the profile cap and the routed limit."""
+        cap = self.max_output_tokens.get(stage)
+        if cap is None or routed_limit is None:
+            return cap if cap is not None else routed_limit
+        return min(cap, routed_limit)
+
+    def instructions(self, stage: str) -> Optional[str]:
+        """Instructions appended to an agent request, or None to use the agent's full task prompt."""
+        lines = []
+        if stage in self.sections:
+            lines.append("Only provide these sections, in this order:")
+            lines += [f"{number}. {section}" for number, section in enumerate(self.sections[stage], 1)]
+        if self.verbosity:
+            lines.append(self.verbosity)
+        return "\n".join(lines) or None
+
+
+OUTPUT_PROFILES = {
+    "basic": OutputProfile(
+        name="basic",
+        description="Store name, tagline and a product list",
+        max_output_tokens={"store_name": 80, "product": 200},
+        sections={"product": ["A comma-separated list of 10 to 15 must-have products"]},
+        verbosity="Answer with the list only, without an introduction or commentary.",
+        skip_stages=["marketing", "structured_analysis"]
+    ),
+    "standard": OutputProfile(
+        name="standard",
+        description="Focused plan: key branding, marketing and product decisions",
+        max_output_tokens={"store_name": 80, "naming": 350, "marketing": 400, "product": 450},
+        sections={
+            "naming": ["Store name rationale", "Tagline", "Brand colors", "Target audience"],
+            "marketing": ["Social media marketing strategy", "Local community engagement tactics", "Partnership opportunities"],
+            "product": ["Core product categories and must-have items", "Inventory mix recommendations", "Pricing strategy"]
+        },
+        verbosity="Keep each section to at most three short bullet points.",
+        skip_stages=["structured_analysis"]
+    ),
+    "comprehensive": OutputProfile(
+        name="comprehensive",
+        description="Full multi-agent business plan with structured analysis"
+    ),
+}
+
+
+def get_output_profile(tier: str) -> OutputProfile:
+    """Output profile of an analysis tier; raises ValueError for unknown tiers."""
+    if tier not in OUTPUT_PROFILES:
+        raise ValueError(f"Unknown analysis tier {tier!r}; expected one of {', '.join(OUTPUT_PROFILES)}")
+    return OUTPUT_PROFILES[tier]
@@ -0,0 +1,160 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+
+# Response keys that are per-request state rather than part of the plan
+_TRANSIENT_KEYS = ("conversation_history",)
+_TERM_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def _fts_query(text: str) -> str:
+    """Quote each word of free text as an FTS5 prefix term so user input is never parsed as query syntax."""
+    return " ".join(f'"{term}"*' for term in _TERM_PATTERN.findall(text or ""))
+
+
+def _plan_text(response: Dict) -> str:
+    """Searchable body of a plan: every generated section."""
+    analysis = response.get("comprehensive_analysis") or {}
+    return "\n\n".join(str(part) for part in [
+        response.get("tagline", ""),
+        response.get("branding_package", ""),
+        response.get("marketing_strategy", ""),
+        response.get("product_strategy", ""),
+        analysis.get("structured_analysis", "") if isinstance(analysis, dict) else analysis
+    ] if part)
+
+
+class PlanArchive:
+    """Local SQLite archive of generated plans with an FTS5 index over sport, location, store name and full text."""
+
+    def __init__(self, path: str = None):
+        self.path = path or os.getenv("PLAN_ARCHIVE_PATH", ".plan_archive.db")
+        self._lock = threading.Lock()
+        self._init_schema()
+
+    @contextmanager
+    def _connect(self):
+        # Short-lived connections keep the archive safe to use from worker threads and other processes
+        with self._lock:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            try:
+                with conn:
+                    yield conn
+            finally:
+                conn.close()
+
+    def _init_schema(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS plans (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    run_id TEXT,
+                    created_at TEXT NOT NULL,
+                    sport TEXT NOT NULL,
+                    location TEXT,
+                    store_name TEXT,
+                    tagline TEXT,
+                    total_cost REAL,
+                    response TEXT NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS plans_sport_location ON plans (sport COLLATE NOCASE, location COLLATE NOCASE)")
+            conn.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS plans_fts USING fts5(
+                    sport, location, store_name, body, content='plans_body', tokenize='porter unicode61'
+                )
+            """)
+            # Content table the FTS index reads snippets from
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS plans_body (
+                    rowid INTEGER PRIMARY KEY, sport TEXT, location TEXT, store_name TEXT, body TEXT
+                )
+            """)
+
+    def save(self, response: Dict, sport: str, location: str = None) -> int:
+        """Archive a generated plan and return its archive id."""
+        plan = {key: value for key, value in response.items() if key not in _TRANSIENT_KEYS}
+        row = (
+            plan.get("run_id"),
+            datetime.now().isoformat(),
+            sport,
+            location or None,
+            plan.get("store_name"),
+            plan.get("tagline"),
+            (plan.get("token_usage") or {}).get("total_cost"),
+            json.dumps(plan, default=str)
+        )
+        body = _plan_text(plan)
+        with self._connect() as conn:
+            plan_id = conn.execute(
+                "INSERT INTO plans (run_id, created_at, sport, location, store_name, tagline, total_cost, response) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", row
+            ).lastrowid
+            conn.execute("INSERT INTO plans_body (rowid, sport, location, store_name, body) VALUES (?, ?, ?, ?, ?)",
+                         (plan_id, sport, location or "", plan.get("store_name") or "", body))
+            conn.execute("INSERT INTO plans_fts (rowid, sport, location, store_name, body) VALUES (?, ?, ?, ?, ?)",
+                         (plan_id, sport, location or "", plan.get("store_name") or "", body))
+        return plan_id
+
+    def get(self, plan_id: int) -> Optional[Dict]:
+        """Full archived response of a plan, or None if unknown."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT id, response FROM plans WHERE id = ?", (plan_id,)).fetchone()
+        if row is None:
+            return None
+        response = json.loads(row["response"])
+        response["archive_id"] = row["id"]
+        response["source"] = "archive"
+        return response
+
+    def search(self, query: str = None, sport: str = None, location: str = None, limit: int = 20) -> List[Dict]:
+        """Archived plan summaries matching a full-text query and/or sport and location, best matches first."""
+        clauses, params = [], []
+        match = _fts_query(query)
+        if sport:
+            clauses.append("plans.sport = ? COLLATE NOCASE")
+            params.append(sport)
+        if location:
+            clauses.append("plans.location LIKE ? COLLATE NOCASE")
+            params.append(f"%{location}%")
+        if match:
+            sql = (
+                "SELECT plans.id, plans.run_id, plans.created_at, plans.sport, plans.location, plans.store_name, "
+                "plans.tagline, plans.total_cost, snippet(plans_fts, 3, '[', ']', '…', 12) AS snippet "
+                "FROM plans_fts JOIN plans ON plans.id = plans_fts.rowid "
+                f"WHERE {' AND '.join(['plans_fts MATCH ?'] + clauses)} ORDER BY plans_fts.rank LIMIT ?"
+            )
+            params = [match] + params + [limit]
+        else:
+            where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+            sql = (
+                "SELECT id, run_id, created_at, sport, location, store_name, tagline, total_cost, '' AS snippet "
+                f"FROM plans {where} ORDER BY id DESC LIMIT ?"
+            )
+            params.append(limit)
+        with self._connect() as conn:
+            return [dict(row) for row in conn.execute(sql, params).fetchall()]
+
+    def delete(self, plan_id: int):
+        """Remove a plan from the archive and its index."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT sport, location, store_name, body FROM plans_body WHERE rowid = ?", (plan_id,)).fetchone()
+            if row is not None:
+                conn.execute("INSERT INTO plans_fts (plans_fts, rowid, sport, location, store_name, body) VALUES ('delete', ?, ?, ?, ?, ?)",
+                             (plan_id, row["sport"], row["location"], row["store_name"], row["body"]))
+                conn.execute("DELETE FROM plans_body WHERE rowid = ?", (plan_id,))
+            conn.execute("DELETE FROM plans WHERE id = ?", (plan_id,))
+
+    def count(self) -> int:
+        """Number of archived plans."""
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM plans").fetchone()[0]
@@ -0,0 +1,159 @@
+import json
+import multiprocessing
+import os
+import re
+import zlib
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence
+
+from pydantic import BaseModel, Field
+
+# Free-text plan fields split into sections, keyed by the name used under response["sections"]
+SECTION_FIELDS = {"branding": "branding_package", "marketing": "marketing_strategy", "product": "product_strategy"}
+
+_HEADING = re.compile(r"^\s*(?:#{1,6}\s+|\d+[.)]\s+|\*\*)(?P<title>[^*:\n]{2,80}?)(?:\*\*)?\s*:?\s*(?:\*\*)?\s*$")
+
+
+def encode(value) -> bytes:
+    """Compact buffer for crossing the process boundary: compressed JSON."""
+    return zlib.compress(json.dumps(value, separators=(",", ":"), default=str).encode("utf-8"), 1)
+
+
+def decode(buffer: bytes):
+    return json.loads(zlib.decompress(buffer))
+
+
+def extract_store_name(branding_package: str) -> str:
+    """Extract store name from branding package."""
+    try:
+        # Simple extraction - look for patterns like "Store Name:" or "Name:"
+        lines = branding_package.split('\n')
+        for line in lines:
+            if any(keyword in line.lower() for keyword in ['store name:', 'name:', 'brand name:']):
+                return line.split(':')[-1].strip()
+        return "Sports Store"  # Fallback
+    except:
+        return "Sports Store"
+
+
+def split_sections(text: str) -> Dict[str, str]:
+    """Split agent free text into sections at numbered, markdown or bold headings."""
+    sections: Dict[str, List[str]] = {}
+    title = "Overview"
+    for line in (text or "").splitlines():
+        match = _HEADING.match(line)
+        if match:
+            title = match.group("title").strip()
+            sections.setdefault(title, [])
+            continue
+        sections.setdefault(title, []).append(line)
+    return {name: "\n".join(lines).strip() for name, lines in sections.items() if "\n".join(lines).strip()}
+
+
+def render_export(analysis: Dict, format: str = "json") -> str:
+    """Export analysis in specified format."""
+    if format.lower() == "json":
+        return json.dumps(analysis, indent=2)
+    elif format.lower() == "txt":
+        # Convert to readable text format
+        text_output = f"""
+SPORTS STORE ANALYSIS
+====================
+
+Sport: {analysis.get('sport', 'N/A')}
+Store Name: {analysis.get('store_name', 'N/A')}
+Location: {analysis.get('location', 'N/A')}
+
+BRANDING PACKAGE:
+{analysis.get('branding_package', 'N/A')}
+
+MARKETING STRATEGY:
+{analysis.get('marketing_strategy', 'N/A')}
+
+PRODUCT STRATEGY:
+{analysis.get('product_strategy', 'N/A')}
+
+STRUCTURED ANALYSIS:
+{analysis.get('comprehensive_analysis', {}).get('structured_analysis', 'N/A')}
+            """
+        return text_output
+    else:
+        return str(analysis)
+
+
+class PostprocessedPlan(BaseModel):
+    store_name: str = Field(min_length=1)
+    sections: Dict[str, Dict[str, str]]
+    exports: Dict[str, str] = Field(default_factory=dict)
+
+
+def postprocess_plan(buffer: bytes, formats: Sequence[str] = ()) -> bytes:
+    """Section parsing, store-name extraction, export rendering and validation of one plan.
+
+    Takes and returns compact buffers; only the derived fields travel back, not the plan itself.
+    """
+    response = decode(buffer)
+    plan = PostprocessedPlan(
+        store_name=response.get("store_name") or extract_store_name(response.get("branding_package", "")),
+        sections={name: split_sections(response.get(field, "")) for name, field in SECTION_FIELDS.items()},
+        exports={export_format: render_export(response, export_format) for export_format in formats}
+    )
+    return encode(plan.model_dump())
+
+
+class PostProcessor:
+    """Runs CPU-bound post-processing of batch results in a process pool, off the GIL of the I/O threads.
+
+    Pool size comes from POSTPROCESS_WORKERS (default: CPU count); 0 runs everything inline.
+    """
+
+    def __init__(self, workers: int = None):
+        self.workers = workers if workers is not None else int(os.getenv("POSTPROCESS_WORKERS", os.cpu_count() or 1))
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # Workers fork from a clean server process that only imports this module: forking the
+            # threaded parent directly is unsafe, and spawning would re-import the caller's __main__
+            if "forkserver" in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context("forkserver")
+                context.set_forkserver_preload([__name__])
+            else:
+                context = multiprocessing.get_context("spawn")
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+        return self._pool
+
+    def submit(self, response: Dict, formats: Sequence[str] = ()) -> Future:
+        """Queue one plan; the future resolves to its derived fields."""
+        if self.workers <= 0:
+            future = Future()
+            try:
+                future.set_result(decode(postprocess_plan(encode(response), tuple(formats))))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        buffer_future = self._executor().submit(postprocess_plan, encode(response), tuple(formats))
+        future = Future()
+
+        def unpack(done: Future):
+            if done.exception() is not None:
+                future.set_exception(done.exception())
+            else:
+                future.set_result(decode(done.result()))
+        buffer_future.add_done_callback(unpack)
+        return future
+
+    @staticmethod
+    def merge(response: Dict, derived: Dict) -> Dict:
+        """Attach derived fields to a response."""
+        response["sections"] = derived["sections"]
+        if derived["exports"]:
+            response["exports"] = derived["exports"]
+        if not response.get("store_name"):
+            response["store_name"] = derived["store_name"]
+        return response
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
@@ -0,0 +1,180 @@
+import cProfile
+import functools
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+
+# Python-side hot-path functions whose inclusive time is called out in every report
+FOCUS_FUNCTIONS = ("AdvancedLangChainHelper.__init__", "_invoke_agent", "fit_agent_prompt", "format_messages", "format_prompt",
+                   "_extract_store_name", "export_analysis", "parse_result", "_run_stage")
+
+
+def profiling_requested(argv: List[str] = None) -> bool:
+    """Whether profiling was switched on with PROFILE_ENABLED or a --profile command line flag."""
+    if os.getenv("PROFILE_ENABLED", "").lower() in ("1", "true", "yes"):
+        return True
+    return "--profile" in (sys.argv if argv is None else argv)
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{getattr(code, 'co_qualname', code.co_name)} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Samples the Python stacks of every thread at a fixed interval and folds them into collapsed stacks.
+
+    Stages run on worker threads, which cProfile (per thread) does not see; sampling covers all of them.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            self.samples += 1
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                if thread_id not in names:
+                    names = {thread.ident: thread.name for thread in threading.enumerate()}
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def collapsed(self) -> str:
+        """Stacks in the collapsed format read by flamegraph.pl, speedscope and inferno."""
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common()) + "\n"
+
+    def inclusive_seconds(self, function_names) -> Dict[str, float]:
+        """Approximate wall time each function spent on any thread's stack, callees included."""
+        totals = Counter()
+        for stack, count in self.stacks.items():
+            on_stack = {frame.split(" (", 1)[0] for frame in stack.split(";")}
+            for name in function_names:
+                if any(frame == name or frame.endswith(f".{name}") for frame in on_stack):
+                    totals[name] += count
+        return {name: totals[name] * self.interval for name in function_names}
+
+
+class Profiler:
+    """Opt-in CPU and allocation profiling of the helper's entry points.
+
+    Only the outermost profiled call records, so a batch is captured as one profile that
+    includes every item, stage and agent invocation it ran.
+    """
+
+    # Process-wide: tracemalloc and stack sampling see every thread, so only one profile can record at a time
+    _active_lock = threading.Lock()
+
+    def __init__(self, enabled: bool = None, directory: str = None, top_n: int = None, sample_interval: float = None):
+        self.enabled = profiling_requested() if enabled is None else enabled
+        self.directory = directory or os.getenv("PROFILE_DIR", ".profiles")
+        self.top_n = top_n or int(os.getenv("PROFILE_TOP_N", 25))
+        self.sample_interval = sample_interval or float(os.getenv("PROFILE_SAMPLE_INTERVAL", 0.005))
+        self.last_report: Optional[Dict] = None
+
+    @contextmanager
+    def profile(self, name: str):
+        """Profile the block; a no-op when profiling is off or another profile is already recording."""
+        if not self.enabled or not Profiler._active_lock.acquire(blocking=False):
+            yield
+            return
+        started_tracemalloc = not tracemalloc.is_tracing()
+        if started_tracemalloc:
+            tracemalloc.start(25)
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.take_snapshot()
+        sampler = StackSampler(self.sample_interval)
+        cpu_profile = cProfile.Profile()
+        start = time.perf_counter()
+        sampler.start()
+        cpu_profile.enable()
+        try:
+            yield
+        finally:
+            cpu_profile.disable()
+            sampler.stop()
+            wall_seconds = time.perf_counter() - start
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            if started_tracemalloc:
+                tracemalloc.stop()
+            try:
+                self.last_report = self._write(name, wall_seconds, cpu_profile, sampler, baseline, snapshot, peak)
+            finally:
+                Profiler._active_lock.release()
+
+    def _write(self, name: str, wall_seconds: float, cpu_profile: cProfile.Profile, sampler: StackSampler,
+               baseline: tracemalloc.Snapshot, snapshot: tracemalloc.Snapshot, peak: int) -> Dict:
+        os.makedirs(self.directory, exist_ok=True)
+        stem = os.path.join(self.directory, f"{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_{name}")
+
+        cpu_profile.dump_stats(f"{stem}.prof")
+        with open(f"{stem}.collapsed", "w") as f:
+            f.write(sampler.collapsed())
+
+        ignore = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+        allocations = snapshot.filter_traces(ignore).compare_to(baseline.filter_traces(ignore), "lineno")[:self.top_n]
+        cpu_stats = io.StringIO()
+        pstats.Stats(cpu_profile, stream=cpu_stats).sort_stats("cumulative").print_stats(self.top_n)
+        focus = sampler.inclusive_seconds(FOCUS_FUNCTIONS)
+
+        lines = [
+            f"Profile: {name}",
+            f"Wall time: {wall_seconds:.3f}s  Samples: {sampler.samples}  Peak traced memory: {peak / 1024:.1f} KiB",
+            "",
+            "Hot-path functions (sampled inclusive wall time, all threads):",
+        ]
+        lines += [f"  {function:<22} {seconds:8.3f}s" for function, seconds in focus.items() if seconds]
+        lines += ["", f"Top {self.top_n} allocations since start (by line):"]
+        lines += [f"  {stat}" for stat in allocations]
+        lines += ["", f"Top {self.top_n} functions by cumulative CPU time (calling thread):", cpu_stats.getvalue()]
+        with open(f"{stem}.txt", "w") as f:
+            f.write("\n".join(lines))
+
+        return {
+            "name": name,
+            "wall_seconds": wall_seconds,
+            "peak_bytes": peak,
+            "focus_seconds": focus,
+            "cpu_profile": f"{stem}.prof",
+            "collapsed_stacks": f"{stem}.collapsed",
+            "report": f"{stem}.txt"
+        }
+
+
+def profiled(name: str):
+    """Decorate a helper method so it is profiled under the given name by its ``profiler``."""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.profiler.profile(name):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
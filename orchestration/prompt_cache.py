@@ -0,0 +1,88 @@
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from langchain_core.tracers.context import register_configure_hook
+
+# OpenAI only caches prompts of at least this many tokens; shorter prompts never get cache hits
+MIN_CACHEABLE_PROMPT_TOKENS = 1024
+
+
+class PrefixCacheHandler(BaseCallbackHandler):
+    """Collects prompt tokens and provider-cached prompt tokens from LLM responses."""
+
+    def __init__(self):
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.calls = 0
+        # Calls long enough for the provider to cache their prompt prefix
+        self.cacheable_calls = 0
+        self._lock = threading.Lock()
+
+    def on_llm_end(self, response: LLMResult, **kwargs):
+        prompt_tokens, cached_tokens = 0, 0
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    prompt_tokens += usage.get("input_tokens", 0)
+                    cached_tokens += (usage.get("input_token_details") or {}).get("cache_read", 0) or 0
+        with self._lock:
+            self.calls += 1
+            self.cacheable_calls += prompt_tokens >= MIN_CACHEABLE_PROMPT_TOKENS
+            self.prompt_tokens += prompt_tokens
+            self.cached_tokens += cached_tokens
+
+    @property
+    def hit_rate(self) -> float:
+        return self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0.0
+
+
+prefix_cache_callback_var: ContextVar[Optional[PrefixCacheHandler]] = ContextVar("prefix_cache_callback", default=None)
+register_configure_hook(prefix_cache_callback_var, True)
+
+
+@contextmanager
+def track_prefix_cache():
+    """Collect prefix cache usage of every LLM call made inside the block."""
+    handler = PrefixCacheHandler()
+    token = prefix_cache_callback_var.set(handler)
+    try:
+        yield handler
+    finally:
+        prefix_cache_callback_var.reset(token)
+
+
+class PrefixCacheReport:
+    """Aggregates provider prompt-cache hits per pipeline stage across requests.
+
+    Stages whose prompts stay under MIN_CACHEABLE_PROMPT_TOKENS are reported as not cacheable, so a
+    hit rate of 0 there reads as a property of the prompt length, not a cache miss.
+    """
+
+    def __init__(self):
+        self._stages: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, handler: PrefixCacheHandler):
+        """Add one stage run to the totals."""
+        with self._lock:
+            totals = self._stages.setdefault(stage, {"calls": 0, "cacheable_calls": 0, "prompt_tokens": 0, "cached_tokens": 0})
+            totals["calls"] += handler.calls
+            totals["cacheable_calls"] += handler.cacheable_calls
+            totals["prompt_tokens"] += handler.prompt_tokens
+            totals["cached_tokens"] += handler.cached_tokens
+
+    def report(self) -> Dict[str, Dict]:
+        """Per-stage totals with the prefix hit rate and whether the stage's prompts can be cached at all."""
+        with self._lock:
+            report = {}
+            for stage, totals in self._stages.items():
+                entry = dict(totals, hit_rate=totals["cached_tokens"] / totals["prompt_tokens"] if totals["prompt_tokens"] else 0.0,
+                             cacheable=totals["cacheable_calls"] > 0)
+                if totals["calls"] and not entry["cacheable"]:
+                    entry["note"] = f"Prompts are below the {MIN_CACHEABLE_PROMPT_TOKENS}-token minimum for provider prompt caching"
+                report[stage] = entry
+            return report
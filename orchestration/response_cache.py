@@ -0,0 +1,167 @@
+import copy
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from orchestration.coordination import CoordinationBackend
+from orchestration.semantic_cache import SemanticIndex, location_key
+
+
+class ResponseCache:
+    """In-memory LRU cache of analyses keyed by sport, location and analysis tier.
+
+    Locations are normalized ("new york, NY." and "New York, NY" share a key). On an exact miss, the
+    semantic index serves the plan of the most similar cached location for the same sport
+    and tier, when its similarity reaches the threshold.
+
+    With a shared coordination backend, entries are also written to the backend and local misses
+    are read through from it, so worker processes serve each other's plans; the in-memory LRU
+    stays in front as the near tier.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = None, semantic_index: SemanticIndex = None,
+                 semantic: bool = None, backend: CoordinationBackend = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(os.getenv("RESPONSE_CACHE_TTL", 24 * 3600))
+        self.semantic = semantic if semantic is not None else os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+        self.semantic_index = semantic_index or SemanticIndex()
+        self.backend = backend
+        self._entries: "OrderedDict[Tuple[str, str, str], Tuple[float, Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.semantic_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(sport: str, location: str = None, tier: str = "comprehensive") -> Tuple[str, str, str]:
+        """Cache key for a sport, optional location and analysis tier."""
+        return sport.strip().lower(), location_key(location), tier
+
+    @staticmethod
+    def _bucket(key: Tuple[str, str, str]) -> Tuple[str, str]:
+        """Semantic index partition of a key: only locations of the same sport and tier are compared."""
+        return key[0], key[2]
+
+    @staticmethod
+    def _shared_prefix(bucket: Tuple[str, str]) -> str:
+        # Normalized locations hold no "|", so the location is everything after the prefix
+        return f"response:{bucket[1]}|{bucket[0]}|"
+
+    def _shared_key(self, key: Tuple[str, str, str]) -> str:
+        return self._shared_prefix(self._bucket(key)) + key[1]
+
+    def _fresh(self, key: Tuple[str, str, str]) -> Optional[Dict]:
+        """Response of a fresh entry, dropping it when expired; call with the lock held."""
+        entry = self._entries.get(key)
+        if entry is not None and time.time() - entry[0] > self.ttl_seconds:
+            del self._entries[key]
+            self.semantic_index.remove(self._bucket(key), key)
+            entry = None
+        return entry[1] if entry is not None else None
+
+    def _store(self, key: Tuple[str, str, str], location: Optional[str], entry: Dict, stored_at: float):
+        with self._lock:
+            self._entries[key] = (stored_at, entry)
+            self._entries.move_to_end(key)
+            if key[1] and self.semantic:
+                self.semantic_index.add(self._bucket(key), key, location)
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                self.semantic_index.remove(self._bucket(evicted), evicted)
+
+    def _pull(self, key: Tuple[str, str, str]) -> Optional[Dict]:
+        """Read an entry through from the shared backend into the local tier."""
+        value = self.backend.get(self._shared_key(key))
+        if value is None:
+            return None
+        stored = json.loads(value)
+        # The key's location keeps its state code, so it indexes like the original location
+        self._store(key, key[1], stored["response"], stored["stored_at"])
+        return stored["response"]
+
+    def _lookup(self, key: Tuple[str, str, str]) -> Tuple[Optional[Dict], bool]:
+        """Fresh response for an exact key, and whether it came from the shared backend."""
+        with self._lock:
+            response = self._fresh(key)
+        if response is not None or self.backend is None:
+            return response, False
+        response = self._pull(key)
+        return response, response is not None
+
+    def _index_shared(self, bucket: Tuple[str, str]):
+        """Add locations cached by other processes to the semantic index, so near-duplicates match them too."""
+        prefix = self._shared_prefix(bucket)
+        for shared_key in self.backend.keys(prefix):
+            key = (bucket[0], shared_key[len(prefix):], bucket[1])
+            with self._lock:
+                if key not in self._entries and key[1] and not self.semantic_index.has(bucket, key):
+                    self.semantic_index.add(bucket, key, key[1])
+
+    def get(self, sport: str, location: str = None, tier: str = "comprehensive") -> Optional[Dict]:
+        """Cached response for the location or a near-duplicate of it, or None on a miss or an expired entry."""
+        key = self.key(sport, location, tier)
+        match = None
+        response, shared = self._lookup(key)
+        if response is None and self.semantic and key[1]:
+            if self.backend is not None:
+                self._index_shared(self._bucket(key))
+            nearest = self.semantic_index.nearest(self._bucket(key), location)
+            if nearest is not None:
+                response, shared = self._lookup(nearest[0])
+                if response is not None:
+                    # Plans hold no top-level location; report the one the matched entry was indexed under
+                    key, match = nearest[0], {"location": nearest[2] or nearest[0][1], "similarity": round(nearest[1], 3)}
+                else:
+                    self.semantic_index.remove(self._bucket(nearest[0]), nearest[0])
+        with self._lock:
+            if response is None:
+                self.misses += 1
+                return None
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self.hits += 1
+            self.semantic_hits += match is not None
+            self.shared_hits += shared
+        cached = copy.deepcopy(response)
+        cached["source"] = "cache" if match is None else "semantic_cache"
+        if match is not None:
+            cached["semantic_match"] = match
+        return cached
+
+    def contains(self, sport: str, location: str = None, tier: str = "comprehensive") -> bool:
+        """Check for a fresh entry, locally or in the shared backend, without touching the hit/miss counters."""
+        key = self.key(sport, location, tier)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry[0] <= self.ttl_seconds:
+                return True
+        return self.backend is not None and self.backend.get(self._shared_key(key)) is not None
+
+    def set(self, sport: str, location: str, response: Dict, tier: str = "comprehensive"):
+        """Store a response; conversation history is session-specific and is not cached."""
+        entry = {k: v for k, v in response.items() if k != "conversation_history"}
+        entry["conversation_history"] = []
+        key = self.key(sport, location, tier)
+        stored_at = time.time()
+        self._store(key, location, entry, stored_at)
+        if self.backend is not None:
+            self.backend.set(self._shared_key(key), json.dumps({"stored_at": stored_at, "response": entry}, default=str),
+                             self.ttl_seconds)
+
+    def clear(self):
+        """Drop all cached responses, including those in the shared backend."""
+        with self._lock:
+            self._entries.clear()
+            self.semantic_index.clear()
+        if self.backend is not None:
+            self.backend.delete("response:")
+
+    def stats(self) -> Dict:
+        """Hit, miss and size counters; semantic and shared-backend hits are also counted as hits."""
+        with self._lock:
+            return {"hits": self.hits, "semantic_hits": self.semantic_hits, "shared_hits": self.shared_hits,
+                    "misses": self.misses, "size": len(self._entries), "shared": self.backend is not None}
@@ -0,0 +1,243 @@
+import os
+import threading
+from typing import Dict, List, Optional
+from pydantic import BaseModel, Field
+
+# USD per 1K tokens as (prompt, completion)
+MODEL_PRICING = {
+    "gpt-4o": (0.0025, 0.01),
+    "gpt-4o-mini": (0.00015, 0.0006),
+    "gpt-3.5-turbo": (0.0005, 0.0015),
+    "gpt-4": (0.03, 0.06),
+}
+
+DEFAULT_MODEL = "gpt-3.5-turbo"
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """Estimate the USD cost of a call from the pricing table."""
+    prompt_price, completion_price = MODEL_PRICING.get(model, MODEL_PRICING[DEFAULT_MODEL])
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1000
+
+
+class StageRoute(BaseModel):
+    models: List[str] = Field(description="Candidate models, preferred first, cheaper fallbacks after")
+    temperature: float = Field(description="Sampling temperature for the stage")
+    expected_prompt_tokens: int = Field(description="Typical prompt tokens the stage consumes")
+    expected_completion_tokens: int = Field(description="Typical completion tokens the stage produces")
+    optional: bool = Field(default=False, description="Whether the stage may be skipped near the budget")
+    max_input_tokens: Optional[int] = Field(default=None, description="Prompt token budget, enforced by truncation")
+    max_output_tokens: Optional[int] = Field(default=None, description="Completion limit sent as max_tokens")
+    timeout_seconds: Optional[float] = Field(default=None, description="Deadline for the stage, hedges included")
+
+
+class ModelRoutingPolicy(BaseModel):
+    stages: Dict[str, StageRoute]
+    max_tokens_per_request: Optional[int] = Field(default=None, description="Token ceiling per request")
+    max_cost_per_request: Optional[float] = Field(default=None, description="USD ceiling per request")
+
+    @classmethod
+    def default(cls) -> "ModelRoutingPolicy":
+        """Default policy: small model for naming, stronger model for the structured analysis."""
+        max_tokens = os.getenv("ROUTING_MAX_TOKENS_PER_REQUEST")
+        max_cost = os.getenv("ROUTING_MAX_COST_PER_REQUEST")
+        return cls(
+            stages={
+                "store_name": StageRoute(
+                    models=["gpt-4o-mini"], temperature=0.8,
+                    expected_prompt_tokens=250, expected_completion_tokens=60,
+                    max_output_tokens=80, timeout_seconds=20
+                ),
+                "naming": StageRoute(
+                    models=["gpt-4o-mini"], temperature=0.8,
+                    expected_prompt_tokens=1200, expected_completion_tokens=400,
+                    max_input_tokens=1500, max_output_tokens=600, timeout_seconds=60
+                ),
+                "marketing": StageRoute(
+                    models=["gpt-3.5-turbo", "gpt-4o-mini"], temperature=0.7,
+                    expected_prompt_tokens=1500, expected_completion_tokens=700, optional=True,
+                    max_input_tokens=2000, max_output_tokens=900, timeout_seconds=60
+                ),
+                "product": StageRoute(
+                    models=["gpt-3.5-turbo", "gpt-4o-mini"], temperature=0.6,
+                    expected_prompt_tokens=1500, expected_completion_tokens=800,
+                    max_input_tokens=2000, max_output_tokens=1000, timeout_seconds=60
+                ),
+                "location_delta": StageRoute(
+                    models=["gpt-4o-mini"], temperature=0.7,
+                    expected_prompt_tokens=1100, expected_completion_tokens=300,
+                    max_input_tokens=1600, max_output_tokens=500, timeout_seconds=30
+                ),
+                "structured_analysis": StageRoute(
+                    models=["gpt-4o", "gpt-4o-mini", "gpt-3.5-turbo"], temperature=0.7,
+                    expected_prompt_tokens=2500, expected_completion_tokens=700, optional=True,
+                    max_input_tokens=4000, max_output_tokens=900, timeout_seconds=60
+                ),
+            },
+            max_tokens_per_request=int(max_tokens) if max_tokens else None,
+            max_cost_per_request=float(max_cost) if max_cost else None
+        )
+
+
+class RoutingDecision(BaseModel):
+    stage: str
+    model: Optional[str] = Field(default=None, description="Model chosen, None when skipped")
+    temperature: float = 0.7
+    action: str = Field(description="routed, downgraded or skipped")
+    reason: str = ""
+    estimated_tokens: int = 0
+    estimated_cost: float = 0.0
+    max_input_tokens: Optional[int] = None
+    max_output_tokens: Optional[int] = None
+    preflight_prompt_tokens: Optional[int] = Field(default=None, description="Locally estimated prompt tokens")
+    truncated: bool = Field(default=False, description="Whether history or input was cut to fit the budget")
+    actual_prompt_tokens: int = 0
+    cached_prompt_tokens: int = Field(default=0, description="Prompt tokens served from the provider prefix cache")
+    actual_completion_tokens: int = 0
+    actual_tokens: int = 0
+    actual_cost: float = 0.0
+    timeout_seconds: Optional[float] = None
+    timed_out: bool = Field(default=False, description="Whether the stage missed its deadline")
+    hedged: bool = Field(default=False, description="Whether a duplicate call was issued for a straggler")
+    hedge_won: bool = Field(default=False, description="Whether the duplicate call finished first")
+    hedge_tokens: int = Field(default=0, description="Tokens spent by the duplicate call")
+    hedge_cost: float = 0.0
+
+
+class RequestBudget:
+    """Tracks token and cost spend of a single request against the policy ceilings."""
+
+    def __init__(self, max_tokens: Optional[int] = None, max_cost: Optional[float] = None, labels: Dict = None):
+        self.max_tokens = max_tokens
+        self.max_cost = max_cost
+        # Request attributes (sport, location, session_id, tier, run_id) its spend is recorded under
+        self.labels = labels or {}
+        self.spent_tokens = 0
+        self.spent_cost = 0.0
+        # Estimates of routed stages still running, so parallel stages share the ceiling
+        self.reserved_tokens = 0
+        self.reserved_cost = 0.0
+        self.decisions: List[RoutingDecision] = []
+        self._lock = threading.Lock()
+
+    def fits(self, tokens: int, cost: float) -> bool:
+        """Check whether additional spend stays within the ceilings."""
+        if self.max_tokens is not None and self.spent_tokens + self.reserved_tokens + tokens > self.max_tokens:
+            return False
+        if self.max_cost is not None and self.spent_cost + self.reserved_cost + cost > self.max_cost:
+            return False
+        return True
+
+    def reserve(self, decision: RoutingDecision):
+        """Hold a routed stage's estimate against the budget until it reports actual spend."""
+        with self._lock:
+            self.decisions.append(decision)
+            self.reserved_tokens += decision.estimated_tokens
+            self.reserved_cost += decision.estimated_cost
+
+    def record(self, decision: RoutingDecision, tokens: int, cost: float,
+               prompt_tokens: int = 0, completion_tokens: int = 0, preflight: Dict = None,
+               cached_prompt_tokens: int = 0):
+        """Record the actual spend of a routed stage next to its pre-flight estimate."""
+        with self._lock:
+            decision.actual_tokens = tokens
+            decision.actual_cost = cost
+            decision.actual_prompt_tokens = prompt_tokens
+            decision.actual_completion_tokens = completion_tokens
+            decision.cached_prompt_tokens = cached_prompt_tokens
+            if preflight:
+                decision.preflight_prompt_tokens = preflight["estimated_prompt_tokens"]
+                decision.truncated = bool(preflight["dropped_history_messages"] or preflight["truncated_input"])
+            self.reserved_tokens -= decision.estimated_tokens
+            self.reserved_cost -= decision.estimated_cost
+            self.spent_tokens += tokens
+            self.spent_cost += cost
+
+    def reserve_hedge(self, decision: RoutingDecision) -> bool:
+        """Reserve a duplicate call's estimate if it fits, so hedging never pushes a request past its ceilings."""
+        with self._lock:
+            if not self.fits(decision.estimated_tokens, decision.estimated_cost):
+                return False
+            decision.hedged = True
+            self.reserved_tokens += decision.estimated_tokens
+            self.reserved_cost += decision.estimated_cost
+            return True
+
+    def record_hedge(self, decision: RoutingDecision, tokens: int, cost: float):
+        """Record the spend of a stage's duplicate call and release its reservation."""
+        with self._lock:
+            decision.hedge_tokens += tokens
+            decision.hedge_cost += cost
+            self.reserved_tokens -= decision.estimated_tokens
+            self.reserved_cost -= decision.estimated_cost
+            self.spent_tokens += tokens
+            self.spent_cost += cost
+
+    def report(self) -> Dict:
+        """Summarize routing decisions and spend for the response."""
+        return {
+            "decisions": [decision.model_dump() for decision in self.decisions],
+            "spent_tokens": self.spent_tokens,
+            "spent_cost": self.spent_cost,
+            "max_tokens": self.max_tokens,
+            "max_cost": self.max_cost
+        }
+
+
+class ModelRouter:
+    """Chooses a model per pipeline stage from a policy while enforcing the request budget."""
+
+    def __init__(self, policy: ModelRoutingPolicy = None):
+        self.policy = policy or ModelRoutingPolicy.default()
+
+    def new_budget(self, **labels) -> RequestBudget:
+        """Create a budget tracker for one request, labeled for the spend ledger."""
+        return RequestBudget(self.policy.max_tokens_per_request, self.policy.max_cost_per_request, labels)
+
+    def stage_route(self, stage: str) -> StageRoute:
+        """Route configuration for a stage, falling back to the default model."""
+        return self.policy.stages.get(stage) or StageRoute(
+            models=[DEFAULT_MODEL], temperature=0.7,
+            expected_prompt_tokens=1000, expected_completion_tokens=500
+        )
+
+    def route(self, stage: str, budget: RequestBudget) -> RoutingDecision:
+        """Pick the best model for a stage that fits the remaining budget."""
+        route = self.stage_route(stage)
+        expected_tokens = route.expected_prompt_tokens + route.expected_completion_tokens
+
+        decision = None
+        for index, model in enumerate(route.models):
+            cost = estimate_cost(model, route.expected_prompt_tokens, route.expected_completion_tokens)
+            if budget.fits(expected_tokens, cost):
+                decision = RoutingDecision(
+                    stage=stage, model=model, temperature=route.temperature,
+                    action="routed" if index == 0 else "downgraded",
+                    reason="policy default" if index == 0 else f"{route.models[0]} would exceed the request budget",
+                    estimated_tokens=expected_tokens, estimated_cost=cost,
+                    max_input_tokens=route.max_input_tokens, max_output_tokens=route.max_output_tokens,
+                    timeout_seconds=route.timeout_seconds
+                )
+                break
+
+        if decision is None:
+            if route.optional:
+                decision = RoutingDecision(
+                    stage=stage, temperature=route.temperature, action="skipped",
+                    reason="optional stage skipped to stay within the request budget"
+                )
+            else:
+                # Required stages still run, on the cheapest candidate
+                model = route.models[-1]
+                decision = RoutingDecision(
+                    stage=stage, model=model, temperature=route.temperature,
+                    action="downgraded" if len(route.models) > 1 else "routed",
+                    reason="required stage over budget, using cheapest model",
+                    estimated_tokens=expected_tokens,
+                    estimated_cost=estimate_cost(model, route.expected_prompt_tokens, route.expected_completion_tokens),
+                    max_input_tokens=route.max_input_tokens, max_output_tokens=route.max_output_tokens,
+                    timeout_seconds=route.timeout_seconds
+                )
+
+        budget.reserve(decision)
+        return decision
@@ -0,0 +1,148 @@
+import math
+import os
+import re
+import threading
+import zlib
+from difflib import SequenceMatcher
+from typing import Dict, Hashable, List, Optional, Tuple
+
+# Common spellings of the same place, applied to whole normalized locations
+LOCATION_ALIASES = {
+    "nyc": "new york",
+    "new york city": "new york",
+    "la": "los angeles",
+    "sf": "san francisco",
+    "dc": "washington",
+    "washington dc": "washington",
+    "philly": "philadelphia",
+    "vegas": "las vegas",
+}
+US_STATES = {
+    "al", "ak", "az", "ar", "ca", "co", "ct", "de", "fl", "ga", "hi", "id", "il", "in", "ia", "ks", "ky", "la",
+    "me", "md", "ma", "mi", "mn", "ms", "mo", "mt", "ne", "nv", "nh", "nj", "nm", "ny", "nc", "nd", "oh", "ok",
+    "or", "pa", "ri", "sc", "sd", "tn", "tx", "ut", "vt", "va", "wa", "wv", "wi", "wy", "dc",
+}
+
+
+def normalize_location(location: Optional[str]) -> str:
+    """Lowercase, punctuation-free location with a trailing state code removed and aliases resolved.
+
+    "New York, NY", "new york" and "NYC" all normalize to "new york".
+    """
+    words = re.sub(r"[^\w\s]", " ", (location or "").lower()).split()
+    if len(words) > 1 and words[-1] in US_STATES and "," in (location or ""):
+        words = words[:-1]
+    text = " ".join(words)
+    return LOCATION_ALIASES.get(text, text)
+
+
+def location_state(location: Optional[str]) -> Optional[str]:
+    """Two-letter state code after the last comma ("Portland, OR" -> "or"), if any."""
+    if not location or "," not in location:
+        return None
+    state = location.rsplit(",", 1)[1].strip().lower().rstrip(".")
+    return state if state in US_STATES else None
+
+
+def location_key(location: Optional[str]) -> str:
+    """Exact cache-key form of a location: normalized, keeping the state code so same-named cities stay apart."""
+    state = location_state(location)
+    return f"{normalize_location(location)}, {state}" if state else normalize_location(location)
+
+
+def location_tokens(location: Optional[str]) -> List[str]:
+    """Words of a normalized location, also dropping a trailing state code written without a comma."""
+    words = normalize_location(location).split()
+    if len(words) > 1 and words[-1] in US_STATES:
+        words = words[:-1]
+    return words
+
+
+def tokens_match(a: List[str], b: List[str], min_ratio: float = 0.8) -> bool:
+    """Same words in the same order, allowing a typo in longer words but never an added or changed word.
+
+    "Austn" matches "Austin"; "East Los Angeles" does not match "Los Angeles", nor "City 7" "City 0".
+    """
+    if len(a) != len(b):
+        return False
+    for left, right in zip(a, b):
+        if left == right:
+            continue
+        if min(len(left), len(right)) < 4 or left.isdigit() or right.isdigit():
+            return False
+        if SequenceMatcher(None, left, right).ratio() < min_ratio:
+            return False
+    return True
+
+
+def embed(text: str, dimensions: int = 512, ngram: int = 3) -> Dict[int, float]:
+    """Unit-length sparse vector of hashed character n-grams; a local embedding with no model or service."""
+    padded = f" {text} "
+    vector: Dict[int, float] = {}
+    for start in range(max(1, len(padded) - ngram + 1)):
+        slot = zlib.crc32(padded[start:start + ngram].encode("utf-8")) % dimensions
+        vector[slot] = vector.get(slot, 0.0) + 1.0
+    norm = math.sqrt(sum(weight * weight for weight in vector.values())) or 1.0
+    return {slot: weight / norm for slot, weight in vector.items()}
+
+
+def cosine(a: Dict[int, float], b: Dict[int, float]) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(weight * b.get(slot, 0.0) for slot, weight in a.items())
+
+
+class SemanticIndex:
+    """Nearest-neighbor index of location embeddings, partitioned by an exact bucket (sport and tier).
+
+    Brute-force cosine search within a bucket; buckets stay small because the response cache is bounded.
+    Similar embeddings are not enough to match: the locations' words must also line up (tokens_match),
+    since n-gram similarity alone rates "St. Louis Park" close to "St. Louis".
+    """
+
+    def __init__(self, threshold: float = None, dimensions: int = 512):
+        self.threshold = threshold if threshold is not None else float(os.getenv("SEMANTIC_CACHE_THRESHOLD", 0.8))
+        self.dimensions = dimensions
+        self._buckets: Dict[Hashable, Dict[Hashable, Tuple[Dict[int, float], Optional[str], List[str], Optional[str]]]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, bucket: Hashable, key: Hashable, location: Optional[str]):
+        vector = embed(normalize_location(location), self.dimensions)
+        with self._lock:
+            self._buckets.setdefault(bucket, {})[key] = (vector, location_state(location), location_tokens(location), location)
+
+    def has(self, bucket: Hashable, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._buckets.get(bucket, {})
+
+    def remove(self, bucket: Hashable, key: Hashable):
+        with self._lock:
+            entries = self._buckets.get(bucket)
+            if entries is not None:
+                entries.pop(key, None)
+                if not entries:
+                    del self._buckets[bucket]
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+    def nearest(self, bucket: Hashable, location: Optional[str]) -> Optional[Tuple[Hashable, float, Optional[str]]]:
+        """Most similar key in the bucket at or above the threshold, as (key, similarity, indexed location).
+
+        Locations naming different states never match, so "Portland, OR" does not serve "Portland, ME".
+        """
+        vector = embed(normalize_location(location), self.dimensions)
+        state = location_state(location)
+        tokens = location_tokens(location)
+        best = None
+        with self._lock:
+            for key, (candidate, candidate_state, candidate_tokens, candidate_location) in self._buckets.get(bucket, {}).items():
+                if state and candidate_state and state != candidate_state:
+                    continue
+                if not tokens_match(tokens, candidate_tokens):
+                    continue
+                similarity = cosine(vector, candidate)
+                if similarity >= self.threshold and (best is None or similarity > best[1]):
+                    best = (key, similarity, candidate_location)
+        return best
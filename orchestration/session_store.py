@@ -0,0 +1,117 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List
+from langchain_core.messages import BaseMessage
+
+# Rough per-message object overhead on top of the content bytes
+MESSAGE_OVERHEAD_BYTES = 200
+
+# Chat roles of the message types a session holds
+MESSAGE_ROLES = {"human": "user", "ai": "assistant", "system": "system"}
+
+
+def _message_bytes(message: BaseMessage) -> int:
+    return len(str(message.content).encode("utf-8")) + MESSAGE_OVERHEAD_BYTES
+
+
+class SessionState:
+    """Conversation state of one user session, kept per agent."""
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.histories: Dict[str, List[BaseMessage]] = {}
+        self.bytes = 0
+        self.last_access = time.time()
+
+
+class SessionStore:
+    """Per-session conversation histories with idle-time and size-based eviction.
+
+    Agents and the orchestrator stay stateless; everything a session remembers lives here.
+    """
+
+    def __init__(self, max_sessions: int = None, idle_ttl_seconds: float = None, max_bytes: int = None,
+                 max_messages_per_agent: int = 20):
+        self.max_sessions = max_sessions or int(os.getenv("SESSION_MAX_COUNT", 1000))
+        self.idle_ttl_seconds = idle_ttl_seconds or float(os.getenv("SESSION_IDLE_TTL", 1800))
+        self.max_bytes = max_bytes or int(os.getenv("SESSION_MAX_BYTES", 50 * 1024 * 1024))
+        self.max_messages_per_agent = max_messages_per_agent
+        self._sessions: "OrderedDict[str, SessionState]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.counters = {"created": 0, "evicted_idle": 0, "evicted_size": 0}
+
+    def _touch(self, session_id: str) -> SessionState:
+        # Caller holds the lock; sessions are ordered least recently used first
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = SessionState(session_id)
+            self._sessions[session_id] = session
+            self.counters["created"] += 1
+        session.last_access = time.time()
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def _evict(self):
+        # Caller holds the lock
+        now = time.time()
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if now - session.last_access > self.idle_ttl_seconds:
+                self._drop(session.session_id)
+                self.counters["evicted_idle"] += 1
+            elif len(self._sessions) > self.max_sessions or self._bytes > self.max_bytes:
+                self._drop(session.session_id)
+                self.counters["evicted_size"] += 1
+            else:
+                break
+
+    def _drop(self, session_id: str):
+        session = self._sessions.pop(session_id, None)
+        if session is not None:
+            self._bytes -= session.bytes
+
+    def history(self, session_id: str, agent: str) -> List[BaseMessage]:
+        """Copy of a session's history with one agent."""
+        with self._lock:
+            self._evict()
+            return list(self._touch(session_id).histories.get(agent, []))
+
+    def append(self, session_id: str, agent: str, messages: List[BaseMessage]):
+        """Add messages to a session's history with one agent, keeping only the most recent ones."""
+        with self._lock:
+            session = self._touch(session_id)
+            history = session.histories.setdefault(agent, [])
+            history.extend(messages)
+            added = sum(_message_bytes(message) for message in messages)
+            removed = 0
+            while len(history) > self.max_messages_per_agent:
+                removed += _message_bytes(history.pop(0))
+            session.bytes += added - removed
+            self._bytes += added - removed
+            self._evict()
+
+    def messages(self, session_id: str) -> List[BaseMessage]:
+        """All messages of a session across agents."""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return []
+            return [message for history in session.histories.values() for message in history]
+
+    def transcript(self, session_id: str) -> List[Dict[str, str]]:
+        """All messages of a session as JSON-serializable ``{"role", "content"}`` dicts."""
+        return [{"role": MESSAGE_ROLES.get(message.type, message.type), "content": str(message.content)}
+                for message in self.messages(session_id)]
+
+    def clear(self, session_id: str):
+        """Forget a session."""
+        with self._lock:
+            self._drop(session_id)
+
+    def stats(self) -> Dict:
+        """Sessions held, bytes used and eviction counters."""
+        with self._lock:
+            return dict(self.counters, sessions=len(self._sessions), bytes=self._bytes)
@@ -0,0 +1,41 @@
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+from langchain_openai import ChatOpenAI
+
+from orchestration.hedging import llm_client_timeouts
+from orchestration.tracing import traced_http_client
+
+_components: Dict[Hashable, Any] = {}
+_lock = threading.RLock()
+
+
+def shared_component(key: Hashable, build: Callable[[], Any]) -> Any:
+    """Process-wide instance of an immutable component, built on first use.
+
+    Only for objects that hold configuration, not per-request state: chat model clients,
+    agent executors and tool sets are shared by every helper and agent in the process.
+    """
+    with _lock:
+        if key not in _components:
+            _components[key] = build()
+        return _components[key]
+
+
+def chat_model(model: str, temperature: float, max_tokens: int = None, api_key: str = None) -> ChatOpenAI:
+    """Shared chat model client for a model, temperature, completion limit and API key."""
+    timeouts = llm_client_timeouts()
+    key = ("chat_model", model, temperature, max_tokens, api_key, timeouts["timeout"], timeouts["max_retries"])
+    return shared_component(key, lambda: ChatOpenAI(
+        model=model,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        api_key=api_key,
+        http_client=traced_http_client(),
+        **timeouts
+    ))
+
+
+def shared_component_count() -> int:
+    with _lock:
+        return len(_components)
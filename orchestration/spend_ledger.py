@@ -0,0 +1,210 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+# Columns spend can be grouped by
+GROUPS = ("day", "stage", "model", "sport", "location", "session_id", "api_key_id", "tier")
+
+
+class SpendCapError(Exception):
+    """Raised instead of making an LLM call once a daily spend cap is reached."""
+
+    def __init__(self, scope: str, spent: float, cap: float, retry_after: float):
+        super().__init__(f"{scope} spend cap of ${cap:.2f} reached (${spent:.4f} spent today)")
+        self.scope = scope
+        self.spent = spent
+        self.cap = cap
+        self.retry_after = retry_after
+
+
+def api_key_id(api_key: Optional[str]) -> str:
+    """Stable, non-reversible id of an API key; the ledger never stores keys themselves."""
+    if not api_key:
+        return "default"
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:12]
+
+
+def _today() -> str:
+    return datetime.now(timezone.utc).date().isoformat()
+
+
+def _seconds_until_tomorrow() -> float:
+    now = datetime.now(timezone.utc)
+    tomorrow = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), tzinfo=timezone.utc)
+    return (tomorrow - now).total_seconds()
+
+
+def _cap(value: Optional[float], env: str) -> Optional[float]:
+    if value is not None:
+        return value
+    configured = os.getenv(env)
+    return float(configured) if configured else None
+
+
+class SpendLedger:
+    """Append-only SQLite ledger of LLM token and cost spend, with daily caps checked before calls.
+
+    Every stage call is recorded with its stage, model, sport, location, session, tier and API key id.
+    Caps are per UTC day: ``daily_cap`` over all keys (SPEND_DAILY_CAP) and ``key_daily_cap`` per API
+    key (SPEND_KEY_DAILY_CAP). Today's totals are kept in memory and re-read from the database every
+    ``refresh_seconds``, so processes sharing the ledger file see each other's spend.
+    """
+
+    def __init__(self, path: str = None, daily_cap: float = None, key_daily_cap: float = None,
+                 refresh_seconds: float = None):
+        self.path = path or os.getenv("SPEND_LEDGER_PATH", ".spend_ledger.db")
+        self.daily_cap = _cap(daily_cap, "SPEND_DAILY_CAP")
+        self.key_daily_cap = _cap(key_daily_cap, "SPEND_KEY_DAILY_CAP")
+        self.refresh_seconds = refresh_seconds if refresh_seconds is not None else float(os.getenv("SPEND_LEDGER_REFRESH", 5))
+        self._lock = threading.Lock()
+        self._totals_lock = threading.Lock()
+        self._day = None
+        self._loaded_at = 0.0
+        self._spent_today = 0.0
+        self._spent_by_key: Dict[str, float] = {}
+        self.counters = {"recorded": 0, "refused": 0}
+        self._init_schema()
+
+    @contextmanager
+    def _connect(self):
+        # Short-lived connections keep the ledger safe to use from worker threads and other processes
+        with self._lock:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            try:
+                with conn:
+                    yield conn
+            finally:
+                conn.close()
+
+    def _init_schema(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS spend (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    created_at TEXT NOT NULL,
+                    day TEXT NOT NULL,
+                    stage TEXT NOT NULL,
+                    model TEXT,
+                    sport TEXT,
+                    location TEXT,
+                    session_id TEXT,
+                    tier TEXT,
+                    run_id TEXT,
+                    api_key_id TEXT NOT NULL,
+                    hedge INTEGER NOT NULL DEFAULT 0,
+                    prompt_tokens INTEGER NOT NULL,
+                    completion_tokens INTEGER NOT NULL,
+                    total_tokens INTEGER NOT NULL,
+                    cost REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS spend_day ON spend (day)")
+            conn.execute("CREATE INDEX IF NOT EXISTS spend_key_day ON spend (api_key_id, day)")
+
+    def _refresh(self):
+        """Reload today's totals on a new day or once they are older than refresh_seconds."""
+        day = _today()
+        with self._totals_lock:
+            if day == self._day and time.monotonic() - self._loaded_at < self.refresh_seconds:
+                return
+        with self._connect() as conn:
+            rows = conn.execute("SELECT api_key_id, SUM(cost) AS cost FROM spend WHERE day = ? GROUP BY api_key_id",
+                                (day,)).fetchall()
+        with self._totals_lock:
+            self._day = day
+            self._loaded_at = time.monotonic()
+            self._spent_by_key = {row["api_key_id"]: row["cost"] or 0.0 for row in rows}
+            self._spent_today = sum(self._spent_by_key.values())
+
+    def spent_today(self, api_key: str = None) -> Dict:
+        """Today's spend over all keys and for one key."""
+        self._refresh()
+        with self._totals_lock:
+            return {"all": self._spent_today, "key": self._spent_by_key.get(api_key_id(api_key), 0.0)}
+
+    def check(self, api_key: str = None, estimated_cost: float = 0.0):
+        """Raise SpendCapError if today's spend, plus the estimate of the next call, would pass a cap."""
+        spent = self.spent_today(api_key)
+        for scope, cap, amount in (("Daily", self.daily_cap, spent["all"]), ("API key daily", self.key_daily_cap, spent["key"])):
+            if cap is not None and (amount >= cap or amount + estimated_cost > cap):
+                with self._totals_lock:
+                    self.counters["refused"] += 1
+                raise SpendCapError(scope, amount, cap, _seconds_until_tomorrow())
+
+    def allows(self, api_key: str = None, estimated_cost: float = 0.0) -> bool:
+        try:
+            self.check(api_key, estimated_cost)
+            return True
+        except SpendCapError:
+            return False
+
+    def record(self, stage: str, model: Optional[str], prompt_tokens: int, completion_tokens: int, cost: float,
+               api_key: str = None, labels: Dict = None, hedge: bool = False):
+        """Append one call's spend; labels carry sport, location, session_id, tier and run_id."""
+        labels = labels or {}
+        key_id = api_key_id(api_key)
+        now = datetime.now(timezone.utc)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO spend (created_at, day, stage, model, sport, location, session_id, tier, run_id, api_key_id, "
+                "hedge, prompt_tokens, completion_tokens, total_tokens, cost) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (now.isoformat(), now.date().isoformat(), stage, model, labels.get("sport"), labels.get("location"),
+                 labels.get("session_id"), labels.get("tier"), labels.get("run_id"), key_id, int(hedge),
+                 prompt_tokens, completion_tokens, prompt_tokens + completion_tokens, cost)
+            )
+        with self._totals_lock:
+            self.counters["recorded"] += 1
+            if self._day == now.date().isoformat():
+                self._spent_today += cost
+                self._spent_by_key[key_id] = self._spent_by_key.get(key_id, 0.0) + cost
+
+    def aggregate(self, by: str = "stage", since: str = None, until: str = None, api_key: str = None,
+                  limit: int = 20) -> List[Dict]:
+        """Calls, tokens and cost grouped by one of GROUPS between two ISO days (inclusive), costliest first."""
+        if by not in GROUPS:
+            raise ValueError(f"Cannot group spend by {by!r}; expected one of {', '.join(GROUPS)}")
+        conditions, params = [], []
+        for condition, value in (("day >= ?", since), ("day <= ?", until), ("api_key_id = ?", api_key and api_key_id(api_key))):
+            if value:
+                conditions.append(condition)
+                params.append(value)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT {by}, COUNT(*) AS calls, SUM(prompt_tokens) AS prompt_tokens, "
+                f"SUM(completion_tokens) AS completion_tokens, SUM(total_tokens) AS total_tokens, SUM(cost) AS cost "
+                f"FROM spend {where} GROUP BY {by} ORDER BY cost DESC LIMIT ?", params + [limit]
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def summary(self, days: int = 1, api_key: str = None) -> Dict:
+        """Spend over the last ``days`` UTC days by stage, model and sport, with today's totals against the caps."""
+        since = (datetime.now(timezone.utc).date() - timedelta(days=max(1, days) - 1)).isoformat()
+        spent = self.spent_today(api_key)
+        return {
+            "since": since,
+            "spent_today": spent["all"],
+            "spent_today_key": spent["key"],
+            "daily_cap": self.daily_cap,
+            "key_daily_cap": self.key_daily_cap,
+            "by_day": self.aggregate("day", since),
+            "by_stage": self.aggregate("stage", since),
+            "by_model": self.aggregate("model", since),
+            "by_sport": self.aggregate("sport", since),
+            "by_api_key": self.aggregate("api_key_id", since)
+        }
+
+    def stats(self) -> Dict:
+        """Today's spend against the caps, and record/refusal counters."""
+        spent = self.spent_today()
+        with self._totals_lock:
+            return dict(self.counters, spent_today=spent["all"], daily_cap=self.daily_cap, key_daily_cap=self.key_daily_cap)
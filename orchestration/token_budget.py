@@ -0,0 +1,101 @@
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+from langchain_core.messages import BaseMessage
+
+# Calibrated approximation for English prose when no tokenizer is available
+CHARS_PER_TOKEN = 4
+# Per-message framing overhead of the chat format
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+@lru_cache(maxsize=16)
+def _get_encoding(model: str):
+    """Tokenizer for a model, or None when tiktoken or its encoding files are unavailable."""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        try:
+            return tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            return None
+    except Exception:
+        return None
+
+
+def estimate_tokens(text: str, model: str = "gpt-3.5-turbo") -> int:
+    """Estimate the token count of a text locally."""
+    if not text:
+        return 0
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return max(1, len(text) // CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def estimate_messages_tokens(messages: List[BaseMessage], model: str = "gpt-3.5-turbo") -> int:
+    """Estimate the token count of chat messages, including framing overhead."""
+    return sum(estimate_tokens(str(message.content), model) + MESSAGE_OVERHEAD_TOKENS for message in messages)
+
+
+def truncate_text(text: str, max_tokens: int, model: str = "gpt-3.5-turbo") -> str:
+    """Cut a text down to at most max_tokens tokens."""
+    if max_tokens <= 0:
+        return ""
+    if estimate_tokens(text, model) <= max_tokens:
+        return text
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return text[:max_tokens * CHARS_PER_TOKEN] + " [truncated]"
+    return encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens]) + " [truncated]"
+
+
+def fit_agent_prompt(fixed_text: str, history: List[BaseMessage], input_text: str,
+                     max_input_tokens: Optional[int], model: str = "gpt-3.5-turbo") -> Tuple[List[BaseMessage], str, Dict]:
+    """Fit an agent prompt into its input budget before it is sent.
+
+    The static part (system prompt and tool schemas) is always kept. Replayed chat history is
+    dropped oldest-first, and only then is the request itself truncated.
+    Returns the kept history, the (possibly truncated) input and a pre-flight report.
+    """
+    fixed_tokens = estimate_tokens(fixed_text, model) + MESSAGE_OVERHEAD_TOKENS
+    input_tokens = estimate_tokens(input_text, model) + MESSAGE_OVERHEAD_TOKENS
+    kept_history = list(history)
+    history_tokens = estimate_messages_tokens(kept_history, model)
+    dropped_messages = 0
+    truncated_input = False
+
+    if max_input_tokens is not None:
+        while kept_history and fixed_tokens + history_tokens + input_tokens > max_input_tokens:
+            dropped = kept_history.pop(0)
+            history_tokens -= estimate_tokens(str(dropped.content), model) + MESSAGE_OVERHEAD_TOKENS
+            dropped_messages += 1
+        if fixed_tokens + input_tokens > max_input_tokens:
+            input_text = truncate_text(input_text, max_input_tokens - fixed_tokens - MESSAGE_OVERHEAD_TOKENS, model)
+            input_tokens = estimate_tokens(input_text, model) + MESSAGE_OVERHEAD_TOKENS
+            truncated_input = True
+
+    report = {
+        "estimated_prompt_tokens": fixed_tokens + history_tokens + input_tokens,
+        "max_input_tokens": max_input_tokens,
+        "dropped_history_messages": dropped_messages,
+        "truncated_input": truncated_input
+    }
+    return kept_history, input_text, report
+
+
+def fit_sections(sections: Dict[str, str], max_tokens: Optional[int], model: str = "gpt-3.5-turbo") -> Tuple[Dict[str, str], bool]:
+    """Truncate hand-off sections proportionally so together they fit in max_tokens."""
+    if max_tokens is None:
+        return sections, False
+    sizes = {name: estimate_tokens(text, model) for name, text in sections.items()}
+    total = sum(sizes.values())
+    if total <= max_tokens:
+        return sections, False
+    return {
+        name: truncate_text(text, max(1, max_tokens * sizes[name] // total), model)
+        for name, text in sections.items()
+    }, True
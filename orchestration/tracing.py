@@ -0,0 +1,282 @@
+import itertools
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, List, Optional
+from uuid import UUID
+
+import httpx
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from langchain_core.tracers.context import register_configure_hook
+
+
+class Span:
+    """One timed unit of work inside a trace."""
+
+    def __init__(self, span_id: int, parent_id: Optional[int], name: str, category: str, attributes: Dict = None):
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.name = name
+        self.category = category
+        self.attributes = dict(attributes or {})
+        self.thread_id = threading.get_ident()
+        self.start = time.perf_counter()
+        self.end = None
+
+    def set(self, **attributes):
+        """Attach attributes, e.g. token counts, to the span."""
+        self.attributes.update(attributes)
+
+    @property
+    def duration(self) -> float:
+        return (self.end or time.perf_counter()) - self.start
+
+
+class _NoopSpan:
+    """Stand-in span for unsampled requests; every call is a no-op."""
+
+    def set(self, **attributes):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Trace:
+    """Spans of one sampled request, collected across threads."""
+
+    def __init__(self, name: str, attributes: Dict = None):
+        self.trace_id = uuid.uuid4().hex
+        self.name = name
+        self.started_at = datetime.now()
+        self.start = time.perf_counter()
+        self.spans: List[Span] = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        # Open LLM span per thread, so HTTP calls made by the client nest under it
+        self.llm_spans: Dict[int, Span] = {}
+        self.root = self.open_span(name, "pipeline", None, attributes)
+
+    def open_span(self, name: str, category: str, parent: Optional[Span], attributes: Dict = None) -> Span:
+        with self._lock:
+            span = Span(next(self._ids), parent.span_id if parent else None, name, category, attributes)
+            self.spans.append(span)
+        return span
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+class ChromeTraceExporter:
+    """Writes each trace as a Chrome trace event file, viewable in Perfetto or chrome://tracing."""
+
+    def __init__(self, directory: str = None):
+        self.directory = directory or os.getenv("TRACE_DIR", ".traces")
+
+    def to_events(self, trace: Trace) -> List[Dict]:
+        pid = os.getpid()
+        events = [{"name": "process_name", "ph": "M", "pid": pid, "args": {"name": f"SportStore AI: {trace.name}"}}]
+        for span in trace.spans:
+            events.append({
+                "name": span.name,
+                "cat": span.category,
+                "ph": "X",
+                "ts": round((span.start - trace.start) * 1e6, 3),
+                "dur": round(span.duration * 1e6, 3),
+                "pid": pid,
+                "tid": span.thread_id,
+                "args": dict(span.attributes, span_id=span.span_id, parent_id=span.parent_id)
+            })
+        return events
+
+    def export(self, trace: Trace) -> str:
+        """Write the trace and return the file path."""
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{trace.started_at.strftime('%Y%m%d_%H%M%S')}_{trace.name}_{trace.trace_id[:8]}.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"traceEvents": self.to_events(trace), "displayTimeUnit": "ms",
+                       "otherData": {"trace_id": trace.trace_id, "started_at": trace.started_at.isoformat()}}, f, default=str)
+        os.replace(tmp_path, path)
+        return path
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """Turns LangChain chain, LLM and tool callbacks into nested spans of the current trace."""
+
+    def __init__(self, trace: Trace):
+        self.trace = trace
+        self._spans: Dict[UUID, Span] = {}
+        self._lock = threading.Lock()
+
+    def _open(self, run_id: UUID, parent_run_id: Optional[UUID], name: str, category: str, attributes: Dict = None) -> Span:
+        with self._lock:
+            parent = self._spans.get(parent_run_id) if parent_run_id else None
+        span = self.trace.open_span(name, category, parent or _current_span.get() or self.trace.root, attributes)
+        with self._lock:
+            self._spans[run_id] = span
+        return span
+
+    def _close(self, run_id: UUID, **attributes) -> Optional[Span]:
+        with self._lock:
+            span = self._spans.pop(run_id, None)
+        if span is not None:
+            span.set(**attributes)
+            span.end = time.perf_counter()
+        return span
+
+    @staticmethod
+    def _name(serialized: Optional[Dict], kwargs: Dict, default: str) -> str:
+        return kwargs.get("name") or (serialized or {}).get("name") or default
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, **kwargs):
+        with self._lock:
+            parent = self._spans.get(parent_run_id) if parent_run_id else None
+        # Direct children of the executor are the agent's reasoning iterations
+        category = "agent_step" if parent is not None and parent.name == "AgentExecutor" else "chain"
+        self._open(run_id, parent_run_id, self._name(serialized, kwargs, "chain"), category)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._close(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._close(run_id, error=str(error))
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, **kwargs):
+        model = (kwargs.get("invocation_params") or {}).get("model") or (kwargs.get("metadata") or {}).get("ls_model_name")
+        span = self._open(run_id, parent_run_id, self._name(serialized, kwargs, "llm"), "llm",
+                          {"model": model, "messages": sum(len(batch) for batch in messages)})
+        self.trace.llm_spans[threading.get_ident()] = span
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, **kwargs):
+        span = self._open(run_id, parent_run_id, self._name(serialized, kwargs, "llm"), "llm")
+        self.trace.llm_spans[threading.get_ident()] = span
+
+    def on_llm_end(self, response: LLMResult, *, run_id, **kwargs):
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        if not usage:
+            for generations in response.generations:
+                for generation in generations:
+                    metadata = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                    usage = {"prompt_tokens": metadata.get("input_tokens", 0),
+                             "completion_tokens": metadata.get("output_tokens", 0),
+                             "total_tokens": metadata.get("total_tokens", 0)}
+        self.trace.llm_spans.pop(threading.get_ident(), None)
+        self._close(run_id, prompt_tokens=usage.get("prompt_tokens", 0),
+                    completion_tokens=usage.get("completion_tokens", 0), total_tokens=usage.get("total_tokens", 0))
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self.trace.llm_spans.pop(threading.get_ident(), None)
+        self._close(run_id, error=str(error))
+
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, **kwargs):
+        self._open(run_id, parent_run_id, self._name(serialized, kwargs, "tool"), "tool", {"input": str(input_str)[:200]})
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._close(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._close(run_id, error=str(error))
+
+
+trace_callback_var: ContextVar[Optional[TracingCallbackHandler]] = ContextVar("trace_callback", default=None)
+register_configure_hook(trace_callback_var, True)
+
+
+class Tracer:
+    """Samples requests and records nested pipeline, stage, agent, tool, LLM and HTTP spans for them.
+
+    Sampling is decided once per request from TRACE_SAMPLE_RATE; unsampled requests only pay for a random draw.
+    """
+
+    def __init__(self, sample_rate: float = None, exporter: ChromeTraceExporter = None):
+        self.sample_rate = sample_rate if sample_rate is not None else float(os.getenv("TRACE_SAMPLE_RATE", "0") or 0)
+        self.exporter = exporter or ChromeTraceExporter()
+        self.last_trace_path = None
+
+    @contextmanager
+    def trace(self, name: str, **attributes):
+        """Root span of one request; exported when the block exits if the request was sampled."""
+        if _current_trace.get() is not None:
+            # Already inside a trace (e.g. a batch item): nest instead of starting a new one
+            with self.span(name, "pipeline", **attributes) as span:
+                yield span
+            return
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            yield NOOP_SPAN
+            return
+
+        trace = Trace(name, attributes)
+        trace_token = _current_trace.set(trace)
+        span_token = _current_span.set(trace.root)
+        callback_token = trace_callback_var.set(TracingCallbackHandler(trace))
+        try:
+            yield trace.root
+        except Exception as e:
+            trace.root.set(error=str(e))
+            raise
+        finally:
+            trace.root.end = time.perf_counter()
+            trace_callback_var.reset(callback_token)
+            _current_span.reset(span_token)
+            _current_trace.reset(trace_token)
+            self.last_trace_path = self.exporter.export(trace)
+
+    @contextmanager
+    def span(self, name: str, category: str = "stage", **attributes):
+        """Child span of the current span; a no-op outside a sampled trace."""
+        trace = _current_trace.get()
+        if trace is None:
+            yield NOOP_SPAN
+            return
+        span = trace.open_span(name, category, _current_span.get(), attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except Exception as e:
+            span.set(error=str(e))
+            raise
+        finally:
+            span.end = time.perf_counter()
+            _current_span.reset(token)
+
+
+class TracingTransport(httpx.HTTPTransport):
+    """HTTP transport that records every request as a span under the LLM call that made it.
+
+    The span ends when the response headers arrive; reading a streamed body is covered by the LLM span.
+    """
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        trace = _current_trace.get()
+        if trace is None:
+            return super().handle_request(request)
+        parent = trace.llm_spans.get(threading.get_ident()) or _current_span.get()
+        span = trace.open_span(f"{request.method} {request.url.path}", "http", parent,
+                               {"method": request.method, "url": str(request.url.copy_with(query=None))})
+        try:
+            response = super().handle_request(request)
+            span.set(status_code=response.status_code)
+            return response
+        except Exception as e:
+            span.set(error=str(e))
+            raise
+        finally:
+            span.end = time.perf_counter()
+
+
+@lru_cache(maxsize=1)
+def traced_http_client() -> httpx.Client:
+    """Process-wide HTTP client for the OpenAI clients, with request spans, cassettes and a shared connection pool."""
+    import openai
+    from orchestration.cassettes import CassetteTransport
+    return openai.DefaultHttpxClient(transport=CassetteTransport(TracingTransport()))
@@ -0,0 +1,100 @@
+import asyncio
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at capacity."""
+
+
+class WorkQueue:
+    """Bounded queue of blocking helper calls, drained by a fixed number of async workers.
+
+    The helper pipeline is synchronous, so each worker hands its job to a thread pool of the
+    same size; the event loop stays free to accept, reject and report on requests.
+    """
+
+    def __init__(self, workers: int = None, max_queue: int = None):
+        self.workers = workers or int(os.getenv("API_WORKERS", 4))
+        self.max_queue = max_queue or int(os.getenv("API_MAX_QUEUE", 32))
+        self._queue: Optional[asyncio.Queue] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._tasks: List[asyncio.Task] = []
+        self._in_flight = 0
+        self._latencies = deque(maxlen=1000)
+        self.counters = {"submitted": 0, "completed": 0, "failed": 0, "rejected": 0}
+
+    async def start(self):
+        """Start the workers on the running event loop."""
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="api-worker")
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Cancel the workers; jobs already running in threads finish on their own."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, fn: Callable, *args, **kwargs) -> asyncio.Future:
+        """Queue a blocking call and return a future for its result; raises QueueFullError when full."""
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((fn, args, kwargs, future, time.perf_counter()))
+        except asyncio.QueueFull:
+            self.counters["rejected"] += 1
+            raise QueueFullError(f"Work queue is full ({self.max_queue} jobs waiting)")
+        self.counters["submitted"] += 1
+        return future
+
+    async def run(self, fn: Callable, *args, timeout: float = None, **kwargs) -> Any:
+        """Queue a blocking call and wait for it; raises asyncio.TimeoutError after timeout seconds.
+
+        A timed-out job keeps running, so its checkpoints and cache entry are still written.
+        """
+        future = self.submit(fn, *args, **kwargs)
+        return await asyncio.wait_for(asyncio.shield(future), timeout)
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            fn, args, kwargs, future, queued_at = await self._queue.get()
+            self._in_flight += 1
+            try:
+                result = await loop.run_in_executor(self._executor, lambda: fn(*args, **kwargs))
+                self.counters["completed"] += 1
+                if not future.done():
+                    future.set_result(result)
+            except Exception as e:
+                self.counters["failed"] += 1
+                if not future.done():
+                    future.set_exception(e)
+            finally:
+                self._in_flight -= 1
+                self._latencies.append(time.perf_counter() - queued_at)
+                self._queue.task_done()
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    @property
+    def free_slots(self) -> int:
+        return self.max_queue - self.depth
+
+    def stats(self) -> Dict:
+        """Queue depth, in-flight jobs, counters and job latency (queue wait plus run time)."""
+        latencies = sorted(self._latencies)
+        return dict(
+            self.counters,
+            workers=self.workers,
+            max_queue=self.max_queue,
+            queue_depth=self.depth,
+            in_flight=self._in_flight,
+            latency_p50=latencies[len(latencies) // 2] if latencies else 0.0,
+            latency_p95=latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else 0.0
+        )
@@ -4,8 +4,11 @@ Test script for SportStore AI enhanced features.
 This script demonstrates the multi-agent architecture and advanced capabilities.
 """
 
+import json
 import os
 import sys
+import threading
+import time
 from datetime import datetime
 
 # Add the project root to the path
@@ -16,6 +19,79 @@ from agents.naming_agent import NamingAgent
 from agents.marketing_agent import MarketingAgent
 from agents.product_agent import ProductAgent
 from tools.market_research import MarketResearchTool, CompetitorAnalysisTool
+from orchestration.routing import ModelRouter, ModelRoutingPolicy
+from orchestration.checkpoints import CheckpointStore
+from orchestration.demo_corpus import available_demo_sports, get_demo_response
+from orchestration.token_budget import estimate_tokens, fit_agent_prompt
+from orchestration.session_store import SessionStore
+from orchestration.plan_archive import PlanArchive
+from orchestration.tracing import ChromeTraceExporter, Tracer
+from orchestration.profiling import Profiler, profiling_requested
+from orchestration.work_queue import QueueFullError, WorkQueue
+from orchestration.hedging import HedgedRunner, StageTimeoutError
+from orchestration.routing import RequestBudget, RoutingDecision
+from orchestration.circuit_breaker import CircuitBreaker
+from orchestration.cassettes import CassetteTransport, use_cassette
+from orchestration.output_profiles import get_output_profile
+from orchestration.postprocess import PostProcessor, decode, encode
+from orchestration.spend_ledger import SpendLedger
+from memory_benchmark import BASELINE_PATH, DEFAULT_TOLERANCE, retained_kib
+
+class StubAgent:
+    """Stand-in for the naming, marketing and product agents: instant answers and recorded calls.
+    
+    ``delays`` and ``failures`` map a stage ("store_name", "branding", "marketing", "product")
+    to seconds to sleep and an exception to raise.
+    """
+    
+    def __init__(self, delays=None, failures=None):
+        self.delays = delays or {}
+        self.failures = failures or {}
+        self.calls = []
+        self._lock = threading.Lock()
+    
+    def _answer(self, stage, sport, location, **result):
+        with self._lock:
+            self.calls.append((stage, sport, location))
+        time.sleep(self.delays.get(stage, 0))
+        if stage in self.failures:
+            raise self.failures[stage]
+        return result
+    
+    def count(self, stage):
+        return sum(1 for call in self.calls if call[0] == stage)
+    
+    def generate_store_name(self, sport, location=None, **kwargs):
+        return self._answer("store_name", sport, location, store_name=f"{sport} Hub", tagline="Play on")
+    
+    def generate_complete_branding(self, sport, location=None, **kwargs):
+        package = f"Store Name: {sport} Hub\nTagline: Play on"
+        return self._answer("branding", sport, location, branding_package=package,
+                            exchange={"input": f"Brand a {sport} store", "output": package})
+    
+    def generate_marketing_strategy(self, store_name, sport, location=None, **kwargs):
+        strategy = f"League nights at {store_name}"
+        return self._answer("marketing", sport, location, marketing_strategy=strategy,
+                            exchange={"input": f"Market {store_name}", "output": strategy})
+    
+    def generate_product_strategy(self, sport, store_name, location=None, **kwargs):
+        strategy = f"{sport} gear for {location or 'everyone'}"
+        return self._answer("product", sport, location, product_strategy=strategy,
+                            exchange={"input": f"Stock {store_name}", "output": strategy})
+
+def stub_helper(directory, agent=None, **kwargs):
+    """Helper on temporary stores whose agents are one StubAgent, so pipelines run without LLM calls."""
+    kwargs.setdefault("postprocessor", PostProcessor(0))
+    kwargs.setdefault("checkpoint_store", CheckpointStore(os.path.join(directory, "checkpoints")))
+    kwargs.setdefault("plan_archive", PlanArchive(os.path.join(directory, "plans.db")))
+    kwargs.setdefault("ledger", SpendLedger(os.path.join(directory, "spend.db")))
+    kwargs.setdefault("warmup_pairs", [])
+    helper = AdvancedLangChainHelper(api_key="sk-test", **kwargs)
+    helper.naming_agent = helper.marketing_agent = helper.product_agent = agent or StubAgent()
+    helper._generate_structured_analysis = lambda sport, store_name, location, *results, **options: {
+        "structured_analysis": "{}", "sport": sport, "store_name": store_name, "location": location
+    }
+    return helper
 
 def test_basic_functionality():
     """Test basic store name and items generation."""
@@ -116,10 +192,10 @@ def test_memory_and_export():
     
     try:
         # Generate analysis
-        result = helper.generate_comprehensive_store_analysis(sport)
+        result = helper.generate_comprehensive_store_analysis(sport, session_id="memory-test")
         
         # Test memory
-        history = helper.get_conversation_history()
+        history = helper.get_conversation_history("memory-test")
         print(f"✅ Memory test passed - {len(history)} messages in history")
         
         # Test export
@@ -155,6 +231,1255 @@ def test_error_handling():
         print(f"❌ Error handling test failed: {e}")
         return False
 
+def test_model_routing():
+    """Test per-stage model routing under a tight request budget."""
+    print("\n🧭 Testing Model Routing...")
+    
+    try:
+        policy = ModelRoutingPolicy.default()
+        policy.max_cost_per_request = 0.003
+        router = ModelRouter(policy)
+        budget = router.new_budget()
+        
+        decisions = {}
+        for stage in ["naming", "marketing", "product", "structured_analysis"]:
+            decision = router.route(stage, budget)
+            budget.record(decision, decision.estimated_tokens, decision.estimated_cost)
+            decisions[stage] = decision
+        
+        if decisions["naming"].model != "gpt-4o-mini":
+            print("❌ Model routing test failed - naming not on the small model")
+            return False
+        if decisions["structured_analysis"].action != "skipped":
+            print("❌ Model routing test failed - optional stage not skipped near the budget")
+            return False
+        
+        print("✅ Model routing test passed")
+        print(f"Routed spend: ${budget.spent_cost:.4f} of ${budget.max_cost:.4f}")
+        return True
+    except Exception as e:
+        print(f"❌ Model routing test failed: {e}")
+        return False
+
+def test_demo_corpus():
+    """Test that the precomputed demo corpus covers every selectable sport."""
+    print("\n🎮 Testing Demo Corpus...")
+    
+    sports = ["Basketball", "Soccer", "Baseball", "Cricket", "Tennis", "Football",
+              "Hockey", "Volleyball", "Golf", "Swimming", "Running", "Cycling"]
+    
+    try:
+        missing = [sport for sport in sports if sport not in available_demo_sports()]
+        if missing:
+            print(f"❌ Demo corpus test failed - missing sports: {missing}")
+            return False
+        
+        response = get_demo_response("Golf", "NYC")
+        if response["comprehensive_analysis"]["location"] != "New York, NY" or "⛳" not in response["store_name"]:
+            print("❌ Demo corpus test failed - location variant not served")
+            return False
+        
+        print("✅ Demo corpus test passed")
+        return True
+    except Exception as e:
+        print(f"❌ Demo corpus test failed: {e}")
+        return False
+
+def test_prompt_budget():
+    """Test pre-flight token estimation and history truncation."""
+    print("\n📏 Testing Prompt Budgets...")
+    
+    try:
+        from langchain_core.messages import HumanMessage, AIMessage
+        
+        history = [HumanMessage(content="old request " * 400), AIMessage(content="old answer " * 400),
+                   HumanMessage(content="recent request"), AIMessage(content="recent answer")]
+        kept, prompt, report = fit_agent_prompt("You are a branding expert.", history,
+                                                "Create a branding package for a Golf store.", 300)
+        
+        if report["estimated_prompt_tokens"] > 300 or report["dropped_history_messages"] != 2:
+            print(f"❌ Prompt budget test failed - report: {report}")
+            return False
+        if kept[-1].content != "recent answer" or estimate_tokens(prompt) == 0:
+            print("❌ Prompt budget test failed - wrong history kept")
+            return False
+        
+        print("✅ Prompt budget test passed")
+        print(f"Estimated prompt tokens: {report['estimated_prompt_tokens']}")
+        return True
+    except Exception as e:
+        print(f"❌ Prompt budget test failed: {e}")
+        return False
+
+def test_session_store():
+    """Test per-session isolation and idle eviction."""
+    print("\n🧠 Testing Session Store...")
+    
+    try:
+        import time
+        from langchain_core.messages import HumanMessage, AIMessage
+        
+        store = SessionStore(max_sessions=2, idle_ttl_seconds=0.2)
+        store.append("alice", "naming", [HumanMessage(content="Golf"), AIMessage(content="Fairway Co")])
+        store.append("bob", "naming", [HumanMessage(content="Tennis"), AIMessage(content="Ace Supply")])
+        
+        if [m.content for m in store.history("alice", "naming")] != ["Golf", "Fairway Co"] or store.history("alice", "product"):
+            print("❌ Session store test failed - sessions are not isolated")
+            return False
+        
+        time.sleep(0.3)
+        store.history("carol", "naming")
+        stats = store.stats()
+        if stats["sessions"] != 1 or stats["evicted_idle"] != 2:
+            print(f"❌ Session store test failed - stats: {stats}")
+            return False
+        
+        print("✅ Session store test passed")
+        print(f"Session stats: {stats}")
+        return True
+    except Exception as e:
+        print(f"❌ Session store test failed: {e}")
+        return False
+
+def test_plan_archive():
+    """Test archiving and full-text search of generated plans."""
+    print("\n📚 Testing Plan Archive...")
+    
+    try:
+        import tempfile
+        
+        archive = PlanArchive(os.path.join(tempfile.mkdtemp(), "plans.db"))
+        plan_id = archive.save(get_demo_response("Golf"), "Golf", "Boston, MA")
+        archive.save(get_demo_response("Tennis"), "Tennis")
+        
+        results = archive.search("golf", location="boston")
+        if [plan["id"] for plan in results] != [plan_id] or archive.search('"unbalanced (') != []:
+            print(f"❌ Plan archive test failed - results: {results}")
+            return False
+        if archive.get(plan_id)["source"] != "archive" or len(archive.search(sport="tennis")) != 1:
+            print("❌ Plan archive test failed - retrieval")
+            return False
+        
+        print("✅ Plan archive test passed")
+        print(f"Top match: {results[0]['store_name']}")
+        return True
+    except Exception as e:
+        print(f"❌ Plan archive test failed: {e}")
+        return False
+
+def test_tracing():
+    """Test nested spans, sampling and the Chrome trace exporter."""
+    print("\n🔍 Testing Tracing...")
+    
+    try:
+        import json
+        import tempfile
+        
+        trace_dir = tempfile.mkdtemp()
+        tracer = Tracer(sample_rate=1.0, exporter=ChromeTraceExporter(trace_dir))
+        with tracer.trace("comprehensive_analysis", sport="Golf"):
+            with tracer.span("stage:naming") as span:
+                span.set(prompt_tokens=120)
+        
+        events = json.load(open(tracer.last_trace_path))["traceEvents"]
+        spans = {event["name"]: event for event in events if event["ph"] == "X"}
+        if spans["stage:naming"]["args"]["parent_id"] != spans["comprehensive_analysis"]["args"]["span_id"] \
+                or spans["stage:naming"]["args"]["prompt_tokens"] != 120:
+            print(f"❌ Tracing test failed - spans: {spans}")
+            return False
+        
+        unsampled = Tracer(sample_rate=0.0, exporter=ChromeTraceExporter(trace_dir))
+        with unsampled.trace("comprehensive_analysis"):
+            pass
+        if unsampled.last_trace_path is not None or len(os.listdir(trace_dir)) != 1:
+            print("❌ Tracing test failed - unsampled request was exported")
+            return False
+        
+        print("✅ Tracing test passed")
+        print(f"Trace file: {tracer.last_trace_path}")
+        return True
+    except Exception as e:
+        print(f"❌ Tracing test failed: {e}")
+        return False
+
+def test_profiling():
+    """Test the profiling switch and its report files."""
+    print("\n🧪 Testing Profiling...")
+    
+    try:
+        import tempfile
+        import time
+        
+        if not profiling_requested(["main.py", "--profile"]) or profiling_requested(["main.py"]):
+            print("❌ Profiling test failed - CLI flag not detected")
+            return False
+        
+        profiler = Profiler(enabled=True, directory=tempfile.mkdtemp(), top_n=5, sample_interval=0.001)
+        with profiler.profile("export_analysis"):
+            with profiler.profile("nested"):
+                deadline = time.perf_counter() + 0.05
+                while time.perf_counter() < deadline:
+                    ["x" * 100 for _ in range(100)]
+        
+        report = profiler.last_report
+        if report["name"] != "export_analysis" or not all(os.path.exists(report[key]) for key in
+                                                          ("cpu_profile", "collapsed_stacks", "report")):
+            print(f"❌ Profiling test failed - report: {report}")
+            return False
+        if not open(report["collapsed_stacks"]).read().strip():
+            print("❌ Profiling test failed - no stacks sampled")
+            return False
+        
+        print("✅ Profiling test passed")
+        print(f"Wall time: {report['wall_seconds']:.3f}s")
+        return True
+    except Exception as e:
+        print(f"❌ Profiling test failed: {e}")
+        return False
+
+def test_work_queue():
+    """Test async workers and 429-style backpressure of the API work queue."""
+    print("\n📬 Testing Work Queue...")
+    
+    try:
+        import asyncio
+        import time
+        
+        async def scenario():
+            queue = WorkQueue(workers=1, max_queue=2)
+            await queue.start()
+            running = queue.submit(time.sleep, 0.2)
+            await asyncio.sleep(0.05)
+            queued = [queue.submit(time.sleep, 0.01) for _ in range(2)]
+            try:
+                queue.submit(time.sleep, 0.01)
+                rejected = False
+            except QueueFullError:
+                rejected = True
+            await asyncio.gather(running, *queued)
+            result = await queue.run(sum, [1, 2, 3], timeout=1)
+            await queue.stop()
+            return rejected, result, queue.stats()
+        
+        rejected, result, stats = asyncio.run(scenario())
+        if not rejected or result != 6 or stats["completed"] != 4 or stats["rejected"] != 1:
+            print(f"❌ Work queue test failed - stats: {stats}")
+            return False
+        
+        print("✅ Work queue test passed")
+        print(f"Queue stats: {stats}")
+        return True
+    except Exception as e:
+        print(f"❌ Work queue test failed: {e}")
+        return False
+
+def test_hedging():
+    """Test stage deadlines and budget-limited hedging of straggling calls."""
+    print("\n🏁 Testing Hedged Stage Calls...")
+    
+    try:
+        import time
+        
+        runner = HedgedRunner(enabled=True, min_samples=5, min_delay=0.01, max_ratio=1.0)
+        for _ in range(5):
+            runner.run("naming", lambda index: time.sleep(0.01))
+        
+        # The first attempt straggles; the duplicate finishes first
+        budget = RequestBudget(max_tokens=2000)
+        decision = RoutingDecision(stage="naming", action="routed", estimated_tokens=500)
+        budget.reserve(decision)
+        result, info = runner.run("naming", lambda index: time.sleep(0.5 if index == 0 else 0.01) or index,
+                                  timeout=2, allow_hedge=lambda: budget.reserve_hedge(decision))
+        if result != 1 or not info["hedged"] or not decision.hedged:
+            print(f"❌ Hedging test failed - result: {result}, info: {info}")
+            return False
+        
+        # No room left in the budget: the straggler is waited for, not duplicated
+        tight = RequestBudget(max_tokens=500)
+        tight_decision = RoutingDecision(stage="naming", action="routed", estimated_tokens=500)
+        tight.reserve(tight_decision)
+        result, info = runner.run("naming", lambda index: time.sleep(0.1) or index,
+                                  timeout=2, allow_hedge=lambda: tight.reserve_hedge(tight_decision))
+        if result != 0 or info["hedged"]:
+            print(f"❌ Hedging test failed - over-budget hedge issued: {info}")
+            return False
+        
+        try:
+            HedgedRunner(enabled=False).run("product", lambda index: time.sleep(0.3), timeout=0.05)
+            print("❌ Hedging test failed - deadline not enforced")
+            return False
+        except StageTimeoutError:
+            pass
+        
+        print("✅ Hedging test passed")
+        print(f"Hedging stats: {runner.stats()}")
+        return True
+    except Exception as e:
+        print(f"❌ Hedging test failed: {e}")
+        return False
+
+def test_circuit_breaker():
+    """Test breaker trips, half-open recovery and degraded answers from stored content."""
+    print("\n🔌 Testing Circuit Breaker...")
+    
+    try:
+        import tempfile
+        import time
+        
+        breaker = CircuitBreaker(window_seconds=60, min_calls=4, error_rate=0.5, slow_call_seconds=5, open_seconds=0.1)
+        for failed in (False, True, False, True):
+            if breaker.allow():
+                breaker.record(0.1, RuntimeError("backend 503") if failed else None)
+        if breaker.state != "open" or breaker.allow():
+            print(f"❌ Circuit breaker test failed - did not open: {breaker.stats()}")
+            return False
+        
+        time.sleep(0.15)
+        probe, second = breaker.allow(), breaker.allow()
+        breaker.record(0.2)
+        if not probe or second or breaker.state != "closed":
+            print(f"❌ Circuit breaker test failed - half-open probe: {breaker.stats()}")
+            return False
+        
+        # While open, the helper answers from the demo corpus without touching the backend
+        with tempfile.TemporaryDirectory() as directory:
+            tripped = CircuitBreaker(min_calls=1, open_seconds=60)
+            tripped.record(0.1, RuntimeError("backend 503"))
+            helper = AdvancedLangChainHelper(api_key="sk-test", warmup_pairs=[], breaker=tripped,
+                                             plan_archive=PlanArchive(os.path.join(directory, "plans.db")))
+            response = helper.generate_comprehensive_store_analysis("Basketball", session_id=None)
+            basic = helper.generate_store_name_and_items("Basketball", session_id=None)
+        if response.get("degraded", {}).get("source") != "demo" or "degraded" not in basic:
+            print(f"❌ Circuit breaker test failed - response: {response.get('degraded')}")
+            return False
+        
+        print("✅ Circuit breaker test passed")
+        print(f"Breaker stats: {breaker.stats()}")
+        return True
+    except Exception as e:
+        print(f"❌ Circuit breaker test failed: {e}")
+        return False
+
+def test_location_comparison():
+    """Test location list handling and the shared base-plan prompt of comparison mode."""
+    print("\n🏙️ Testing Location Comparison...")
+    
+    try:
+        import tempfile
+        from langchain_community.callbacks.manager import openai_callback_var
+        from langchain_core.outputs import LLMResult
+        
+        scores = {"Austin, TX": 6, "Denver, CO": 9, "Boise, ID": 3}
+        
+        def location_delta(sport, location, base_plan, model=None, max_tokens=None):
+            """Delta stub that reports its usage like an OpenAI call: 100 prompt tokens plus 10 per score point."""
+            if location not in scores:
+                raise ValueError(f"No data for {location}")
+            openai_callback_var.get().on_llm_end(LLMResult(generations=[[]], llm_output={
+                "model_name": "gpt-4o-mini",
+                "token_usage": {"prompt_tokens": 100, "completion_tokens": 10 * scores[location], "total_tokens": 100 + 10 * scores[location]}
+            }))
+            return {"market_fit_score": scores[location], "recommendation": f"{sport} fits {location}",
+                    "location": location, "model": model, "preflight": {}}
+        
+        with tempfile.TemporaryDirectory() as directory:
+            helper = AdvancedLangChainHelper(api_key="sk-test", warmup_pairs=[],
+                                             plan_archive=PlanArchive(os.path.join(directory, "plans.db")))
+            empty = helper.generate_location_comparison("Tennis", ["", "  "])
+            base = get_demo_response("Tennis")
+            summary = helper._base_plan_summary(base, "gpt-4o-mini", 600)
+            
+            agent = StubAgent()
+            helper = stub_helper(directory, agent)
+            helper._generate_location_delta = location_delta
+            comparison = helper.generate_location_comparison("Tennis", ["Austin, TX", "Denver, CO", " Austin, TX ", "Nowhere", "Boise, ID"])
+        
+        if "error" not in empty or base["store_name"] not in summary or estimate_tokens(summary) > 600:
+            print(f"❌ Location comparison test failed - summary tokens: {estimate_tokens(summary)}")
+            return False
+        results = {item["location"]: item for item in comparison["locations"]}
+        if list(results) != ["Austin, TX", "Denver, CO", "Nowhere", "Boise, ID"] or "error" not in results["Nowhere"]:
+            print(f"❌ Location comparison test failed - locations: {list(results)}")
+            return False
+        if comparison["ranking"] != ["Denver, CO", "Austin, TX", "Boise, ID"] or agent.count("store_name") != 1:
+            print(f"❌ Location comparison test failed - ranking: {comparison['ranking']}")
+            return False
+        usage = comparison["token_usage"]
+        if [results[location]["total_tokens"] for location in scores] != [160, 190, 130] or usage["location_tokens"] != 480 \
+                or usage["total_tokens"] != usage["base_tokens"] + 480 or not usage["total_cost"]:
+            print(f"❌ Location comparison test failed - token usage: {usage}")
+            return False
+        
+        print("✅ Location comparison test passed")
+        print(f"Base plan summary: {estimate_tokens(summary)} tokens")
+        print(f"Ranking: {comparison['ranking']}, token usage: {usage}")
+        return True
+    except Exception as e:
+        print(f"❌ Location comparison test failed: {e}")
+        return False
+
+def test_cassettes():
+    """Test recording LLM HTTP traffic to a cassette and replaying it without a backend."""
+    print("\n📼 Testing Cassettes...")
+    
+    try:
+        import httpx
+        import tempfile
+        
+        calls = []
+        def backend(request):
+            calls.append(request)
+            return httpx.Response(200, json={"choices": [{"message": {"content": f"reply {len(calls)}"}}]})
+        def offline(request):
+            raise httpx.ConnectError("backend is offline")
+        
+        def tool_backend(request):
+            """Chat completions endpoint that asks for market research, then answers once the tool result is sent."""
+            messages = json.loads(request.content)["messages"]
+            if messages[-1]["role"] == "tool":
+                message = {"role": "assistant", "content": "Tennis demand in Austin is strong"}
+            else:
+                message = {"role": "assistant", "content": None, "tool_calls": [{
+                    "id": "call_1", "type": "function",
+                    "function": {"name": "market_research", "arguments": json.dumps({"sport": "Tennis", "location": "Austin, TX"})}
+                }]}
+            return httpx.Response(200, json={
+                "id": "chatcmpl-1", "object": "chat.completion", "created": 0, "model": "gpt-4o-mini",
+                "choices": [{"index": 0, "message": message, "finish_reason": "tool_calls" if message["content"] is None else "stop"}],
+                "usage": {"prompt_tokens": 80, "completion_tokens": 20, "total_tokens": 100}
+            })
+        
+        def chat(transport, content):
+            with httpx.Client(transport=transport, base_url="https://api.openai.com/v1") as client:
+                response = client.post("/chat/completions", json={"model": "gpt-4o-mini", "messages": [{"role": "user", "content": content}]})
+                return response.status_code, response.json()
+        
+        def tool_chat(transport):
+            """One tool-calling round trip through ChatOpenAI: the tool call, then the answer to its result."""
+            from langchain_core.messages import HumanMessage, ToolMessage
+            from langchain_openai import ChatOpenAI
+            
+            tool = MarketResearchTool()
+            llm = ChatOpenAI(model="gpt-4o-mini", api_key="sk-test", max_retries=0,
+                             http_client=httpx.Client(transport=transport)).bind_tools([tool])
+            messages = [HumanMessage("Research tennis in Austin, TX")]
+            call = llm.invoke(messages)
+            messages += [call] + [ToolMessage(tool.invoke(tool_call["args"]), tool_call_id=tool_call["id"]) for tool_call in call.tool_calls]
+            return call.tool_calls, llm.invoke(messages).content
+        
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "cassette.json.gz")
+            with use_cassette(path, "record"):
+                recorded = [chat(CassetteTransport(httpx.MockTransport(backend)), content) for content in ("a", "b", "a")]
+                recorded_tools = tool_chat(CassetteTransport(httpx.MockTransport(tool_backend)))
+            with use_cassette(path, "replay") as cassette:
+                replayed = [chat(CassetteTransport(httpx.MockTransport(offline)), content) for content in ("a", "b", "a")]
+                replayed_tools = tool_chat(CassetteTransport(httpx.MockTransport(offline)))
+                missing = chat(CassetteTransport(httpx.MockTransport(offline)), "never recorded")
+        
+        if replayed != recorded or missing[0] != 404 or cassette.counters["replayed"] != 5:
+            print(f"❌ Cassette test failed - recorded: {recorded}, replayed: {replayed}")
+            return False
+        if replayed_tools != recorded_tools or [call["name"] for call in replayed_tools[0]] != ["market_research"] \
+                or replayed_tools[0][0]["args"] != {"sport": "Tennis", "location": "Austin, TX"}:
+            print(f"❌ Cassette test failed - recorded tool calls: {recorded_tools}, replayed: {replayed_tools}")
+            return False
+        
+        print("✅ Cassette test passed")
+        print(f"Cassette counters: {cassette.counters}")
+        return True
+    except Exception as e:
+        print(f"❌ Cassette test failed: {e}")
+        return False
+
+def test_output_profiles():
+    """Test per-tier completion caps, section instructions and tier-aware caching."""
+    print("\n📏 Testing Output Profiles...")
+    
+    try:
+        from orchestration.response_cache import ResponseCache
+        
+        basic, standard, comprehensive = (get_output_profile(tier) for tier in ("basic", "standard", "comprehensive"))
+        if basic.output_limit("product", 1000) != 200 or comprehensive.output_limit("product", 1000) != 1000:
+            print("❌ Output profile test failed - completion caps")
+            return False
+        if "Partnership opportunities" not in standard.instructions("marketing") or comprehensive.instructions("marketing"):
+            print("❌ Output profile test failed - section instructions")
+            return False
+        if "structured_analysis" not in standard.skip_stages:
+            print("❌ Output profile test failed - standard tier should skip the structured analysis")
+            return False
+        
+        cache = ResponseCache()
+        cache.set("Golf", None, {"store_name": "Fairway"}, "standard")
+        if cache.contains("Golf") or not cache.contains("Golf", None, "standard"):
+            print("❌ Output profile test failed - cache entries leak across tiers")
+            return False
+        
+        try:
+            get_output_profile("premium")
+            print("❌ Output profile test failed - unknown tier accepted")
+            return False
+        except ValueError:
+            pass
+        
+        print("✅ Output profile test passed")
+        print(f"Standard marketing instructions:\n{standard.instructions('marketing')}")
+        return True
+    except Exception as e:
+        print(f"❌ Output profile test failed: {e}")
+        return False
+
+def test_postprocessing():
+    """Test section parsing and export rendering of batch results, inline and in the process pool."""
+    print("\n🧮 Testing Batch Post-processing...")
+    
+    try:
+        response = {
+            "sport": "Golf",
+            "location": "Austin",
+            "store_name": "",
+            "branding_package": "Store Name: Fairway Co\n1. Tagline:\nDrive further\n## Brand Colors\nGreen and white",
+            "marketing_strategy": "**Social Media**\nShort swing videos",
+            "product_strategy": "Clubs, balls and gloves",
+            "comprehensive_analysis": {"structured_analysis": "{}"}
+        }
+        if decode(encode(response)) != response:
+            print("❌ Post-processing test failed - buffer round trip")
+            return False
+        
+        inline = PostProcessor(0).submit(response, ["json", "txt"]).result()
+        pool = PostProcessor(2)
+        try:
+            pooled = pool.submit(response, ["json", "txt"]).result(timeout=60)
+        finally:
+            pool.close()
+        if pooled != inline:
+            print("❌ Post-processing test failed - pool and inline results differ")
+            return False
+        
+        merged = PostProcessor.merge(dict(response), inline)
+        branding = merged["sections"]["branding"]
+        if branding.get("Tagline") != "Drive further" or branding.get("Brand Colors") != "Green and white":
+            print(f"❌ Post-processing test failed - unexpected sections {branding}")
+            return False
+        if merged["store_name"] != "Fairway Co" or "Drive further" not in merged["exports"]["txt"]:
+            print("❌ Post-processing test failed - store name or exports missing")
+            return False
+        
+        print("✅ Post-processing test passed")
+        print(f"Branding sections: {list(branding)}")
+        return True
+    except Exception as e:
+        print(f"❌ Post-processing test failed: {e}")
+        return False
+
+def test_memory_footprint():
+    """Test that helpers share immutable components and stay within the tracked memory baseline."""
+    print("\n🧠 Testing Memory Footprint...")
+    
+    try:
+        first = AdvancedLangChainHelper(api_key="sk-test", warmup_pairs=[])
+        second = AdvancedLangChainHelper(api_key="sk-test", warmup_pairs=[])
+        if second.marketing_agent.agent is not first.marketing_agent.agent or second.naming_agent.tools is not first.naming_agent.tools:
+            print("❌ Memory test failed - agent executors or tools are not shared")
+            return False
+        if second.llm is not first.llm or hasattr(first, "output_parser"):
+            print("❌ Memory test failed - chat model not shared or unused parser still built")
+            return False
+        
+        with open(BASELINE_PATH) as f:
+            baseline = json.load(f)
+        per_instance = retained_kib(lambda: AdvancedLangChainHelper(api_key="sk-test", warmup_pairs=[]), 3)["kib"]
+        if per_instance > baseline["per_instance_kib"] * (1 + DEFAULT_TOLERANCE):
+            print(f"❌ Memory test failed - {per_instance:.1f} KiB per helper, baseline {baseline['per_instance_kib']} KiB")
+            return False
+        
+        print("✅ Memory footprint test passed")
+        print(f"Retained per helper instance: {per_instance:.1f} KiB (baseline {baseline['per_instance_kib']} KiB)")
+        return True
+    except Exception as e:
+        print(f"❌ Memory test failed: {e}")
+        return False
+
+def test_semantic_cache():
+    """Test that near-duplicate locations are served from one cached plan without mixing up places."""
+    print("\n♻️ Testing Semantic Cache...")
+    
+    try:
+        from orchestration.response_cache import ResponseCache
+        
+        def plan(store_name):
+            """Response shaped like the pipeline's output, which has no top-level location."""
+            return {"run_id": "run", "store_name": store_name, "tagline": "", "branding_package": f"Store Name: {store_name}",
+                    "marketing_strategy": "", "product_strategy": "", "token_usage": {"total_tokens": 0, "total_cost": 0.0},
+                    "tier": "comprehensive", "source": "live"}
+        
+        cache = ResponseCache(semantic=True)
+        cache.set("Basketball", "New York, NY", plan("Hoop Borough"))
+        cache.set("Basketball", "Portland, OR", plan("Rose Court"))
+        
+        for location in ("NYC", "new york", "New York City", "new york, ny."):
+            cached = cache.get("basketball", location)
+            if cached is None or cached["store_name"] != "Hoop Borough":
+                print(f"❌ Semantic cache test failed - {location!r} missed the New York plan")
+                return False
+            if cached["source"] == "semantic_cache" and cached["semantic_match"]["location"] != "New York, NY":
+                print(f"❌ Semantic cache test failed - match reported as {cached['semantic_match']}")
+                return False
+        if cache.get("Basketball", "Portland, ME") is not None or cache.get("Basketball", "Brooklyn, NY") is not None:
+            print("❌ Semantic cache test failed - a different place was served a cached plan")
+            return False
+        cache.set("Basketball", "Los Angeles, CA", plan("Angel Hoops"))
+        cache.set("Basketball", "St. Louis, MO", plan("Arch Court"))
+        cache.set("Basketball", "Benchmark City 0", plan("Zero Court"))
+        for location in ("East Los Angeles", "West Los Angeles, CA", "St. Louis Park", "Benchmark City 7"):
+            if cache.get("Basketball", location) is not None:
+                print(f"❌ Semantic cache test failed - {location!r} was served the plan of a similar-looking place")
+                return False
+        cache.set("Basketball", "Pittsburgh, PA", plan("Steel Court"))
+        typo = cache.get("Basketball", "Pittsburg, PA")
+        if typo is None or typo["store_name"] != "Steel Court" or typo["semantic_match"]["location"] != "Pittsburgh, PA":
+            print("❌ Semantic cache test failed - a misspelled location missed its plan")
+            return False
+        if cache.get("Basketball", "NYC", "standard") is not None:
+            print("❌ Semantic cache test failed - near-duplicates leak across tiers")
+            return False
+        
+        stats = cache.stats()
+        if stats["hits"] != 5 or stats["semantic_hits"] != 4:
+            print(f"❌ Semantic cache test failed - unexpected counters {stats}")
+            return False
+        
+        print("✅ Semantic cache test passed")
+        print(f"Cache stats: {stats}")
+        return True
+    except Exception as e:
+        print(f"❌ Semantic cache test failed: {e}")
+        return False
+
+def test_spend_ledger():
+    """Test persistent spend records, aggregation and daily caps enforced before calls."""
+    print("\n💰 Testing Spend Ledger...")
+    
+    try:
+        import tempfile
+        from orchestration.spend_ledger import SpendCapError, SpendLedger
+        
+        path = os.path.join(tempfile.mkdtemp(), "spend.db")
+        ledger = SpendLedger(path, key_daily_cap=0.01)
+        labels = {"sport": "Golf", "location": "Austin, TX", "session_id": "s1", "tier": "comprehensive"}
+        ledger.record("naming", "gpt-4o-mini", 300, 200, 0.004, "sk-team-a", labels)
+        ledger.record("marketing", "gpt-4o-mini", 300, 200, 0.005, "sk-team-a", labels)
+        ledger.record("naming", "gpt-4o-mini", 100, 50, 0.001, "sk-team-b", dict(labels, sport="Tennis"))
+        
+        by_stage = {row["stage"]: row for row in ledger.aggregate("stage")}
+        if by_stage["naming"]["calls"] != 2 or by_stage["naming"]["total_tokens"] != 650:
+            print(f"❌ Spend ledger test failed - unexpected stage totals {by_stage}")
+            return False
+        if [row["sport"] for row in ledger.aggregate("sport")] != ["Golf", "Tennis"]:
+            print("❌ Spend ledger test failed - sports not ranked by cost")
+            return False
+        
+        try:
+            ledger.check("sk-team-a", estimated_cost=0.002)
+            print("❌ Spend ledger test failed - call past the key cap was allowed")
+            return False
+        except SpendCapError as e:
+            if e.scope != "API key daily" or e.retry_after <= 0:
+                print(f"❌ Spend ledger test failed - unexpected cap error {e}")
+                return False
+        if not ledger.allows("sk-team-b", estimated_cost=0.002):
+            print("❌ Spend ledger test failed - caps leak across API keys")
+            return False
+        
+        reopened = SpendLedger(path, daily_cap=0.01)
+        if reopened.allows("sk-team-c"):
+            print("❌ Spend ledger test failed - daily spend not persisted across instances")
+            return False
+        with open(path, "rb") as f:
+            if b"sk-team-a" in f.read():
+                print("❌ Spend ledger test failed - raw API key stored")
+                return False
+        
+        # Checkpoint fallbacks and packed name batches are refused before any call too
+        agent = StubAgent()
+        helper = stub_helper(os.path.dirname(path), agent, ledger=reopened)
+        fallback = helper._checkpoint_fallback(helper.checkpoints.new_run_id(), "Golf")
+        helper.naming_agent = NamingAgent(api_key="sk-test")
+        try:
+            helper.generate_batch_store_names([{"sport": "Golf"}, {"sport": "Tennis"}])
+            print("❌ Spend ledger test failed - name batch ran past the daily cap")
+            return False
+        except SpendCapError:
+            pass
+        if agent.calls or "spend cap" not in fallback["store"]:
+            print(f"❌ Spend ledger test failed - checkpoint fallback ran past the cap: {fallback}")
+            return False
+        
+        print("✅ Spend ledger test passed")
+        print(f"Spent today: ${reopened.stats()['spent_today']:.4f}")
+        return True
+    except Exception as e:
+        print(f"❌ Spend ledger test failed: {e}")
+        return False
+
+def test_helper_pool():
+    """Test that the legacy helper pool is bounded, reuses helpers, resets them and reports usage."""
+    print("\n🏊 Testing Helper Pool...")
+    
+    try:
+        import threading
+        import time
+        from concurrent.futures import ThreadPoolExecutor
+        from orchestration.helper_pool import HelperPool, PoolExhaustedError
+        
+        built = []
+        
+        def build():
+            time.sleep(0.05)
+            helper = {"id": len(built), "state": []}
+            built.append(helper)
+            return helper
+        
+        pool = HelperPool(build, size=2, acquire_timeout=5, reset=lambda helper: helper["state"].clear())
+        in_use, peak, lock = [0], [0], threading.Lock()
+        
+        def call(index):
+            with pool.acquire() as helper:
+                with lock:
+                    in_use[0] += 1
+                    peak[0] = max(peak[0], in_use[0])
+                if helper["state"]:
+                    raise AssertionError("per-call state leaked into the next caller")
+                helper["state"].append(index)
+                time.sleep(0.01)
+                with lock:
+                    in_use[0] -= 1
+        
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(call, range(40)))
+        stats = pool.stats()
+        if len(built) != 2 or peak[0] > 2 or stats["acquired"] != 40 or stats["in_use"] != 0:
+            print(f"❌ Helper pool test failed - built {len(built)}, peak {peak[0]}, stats {stats}")
+            return False
+        
+        quick = HelperPool(build, size=1, acquire_timeout=0.1)
+        with quick.acquire():
+            try:
+                with quick.acquire():
+                    pass
+                print("❌ Helper pool test failed - acquire past the pool size did not time out")
+                return False
+            except PoolExhaustedError:
+                pass
+        
+        # The legacy API answers with its usual error dict instead of raising when the pool is exhausted
+        import LangChainHelper
+        saved = LangChainHelper._legacy_pool
+        LangChainHelper._legacy_pool = quick
+        try:
+            with quick.acquire():
+                legacy = LangChainHelper.generate_store_name_and_items("Golf")
+        finally:
+            LangChainHelper._legacy_pool = saved
+        if not legacy.get("store", "").startswith("Error generating store name") or "goods_name" not in legacy:
+            print(f"❌ Helper pool test failed - legacy API on an exhausted pool returned {legacy}")
+            return False
+        
+        print("✅ Helper pool test passed")
+        print(f"Pool stats: {stats}")
+        return True
+    except Exception as e:
+        print(f"❌ Helper pool test failed: {e}")
+        return False
+
+def test_coordination():
+    """Test that two backends on one SQLite file share cache entries, locks and rate-limit buckets."""
+    print("\n🔗 Testing Coordination Backend...")
+    
+    try:
+        import tempfile
+        from orchestration.coordination import CoordinationBackend, LocalBackend, RateLimiter, SQLiteBackend
+        from orchestration.response_cache import ResponseCache
+        
+        class CacheOnlyBackend(CoordinationBackend):
+            """Backend missing the bucket and lock methods."""
+            get, set, keys, delete = LocalBackend.get, LocalBackend.set, LocalBackend.keys, LocalBackend.delete
+        
+        for incomplete in (CoordinationBackend, CacheOnlyBackend):
+            try:
+                incomplete()
+            except TypeError:
+                continue
+            print(f"❌ Coordination test failed - {incomplete.__name__} could be instantiated")
+            return False
+        
+        path = os.path.join(tempfile.mkdtemp(), "coordination.db")
+        first, second = SQLiteBackend(path), SQLiteBackend(path)
+        writer, reader = ResponseCache(backend=first), ResponseCache(backend=second)
+        writer.set("Tennis", "Austin, TX", {"store_name": "Ace Austin", "location": "Austin, TX"})
+        # The near-duplicate is looked up first, before the reader holds any entry locally
+        near = reader.get("Tennis", "Austin TX")
+        exact = reader.get("tennis", "austin, tx")
+        if not exact or exact["store_name"] != "Ace Austin" or not reader.contains("Tennis", "Austin, TX"):
+            print(f"❌ Coordination test failed - cache entry not shared: {exact}")
+            return False
+        if not near or near["source"] != "semantic_cache" or reader.get("Tennis", "Boston, MA") is not None:
+            print(f"❌ Coordination test failed - near-duplicate lookup across backends: {near}")
+            return False
+        
+        token = first.try_lock("flight:tennis", 30)
+        if token is None or second.try_lock("flight:tennis", 30) is not None:
+            print("❌ Coordination test failed - single-flight lock was not exclusive")
+            return False
+        if not first.renew_lock("flight:tennis", token, 30) or second.renew_lock("flight:tennis", "stolen", 30):
+            print("❌ Coordination test failed - lease renewal ignored the lock owner")
+            return False
+        first.unlock("flight:tennis", token)
+        if second.try_lock("flight:tennis", 30) is None:
+            print("❌ Coordination test failed - released lock could not be taken")
+            return False
+        
+        # Two limiters draw from one bucket of 2 calls, refilled at 10 calls a second
+        limiters = [RateLimiter(first, per_minute=600, burst=2), RateLimiter(second, per_minute=600, burst=2)]
+        waited = [limiters[index % 2].wait("key") for index in range(4)]
+        if waited[0] or waited[1] or not waited[2] or not waited[3]:
+            print(f"❌ Coordination test failed - rate-limit bucket not shared: {waited}")
+            return False
+        
+        print("✅ Coordination test passed")
+        print(f"Reader cache stats: {reader.stats()}")
+        return True
+    except Exception as e:
+        print(f"❌ Coordination test failed: {e}")
+        return False
+
+def test_run_id_cache_lookup():
+    """Test that requests carrying a run id, as API and batch requests do, are served from cache."""
+    print("\n🆔 Testing Cache Lookup With Run Ids...")
+    
+    try:
+        import tempfile
+        
+        with tempfile.TemporaryDirectory() as directory:
+            agent = StubAgent()
+            helper = stub_helper(directory, agent)
+            responses = [
+                helper.generate_comprehensive_store_analysis("Golf", "Austin, TX", helper.checkpoints.new_run_id(), session_id=None)
+                for _ in range(3)
+            ]
+            batch = helper.generate_batch_store_analyses([{"sport": "Golf", "location": "Austin, TX"}] * 2)
+        
+        sources = [response.get("source") for response in responses + batch]
+        if agent.count("store_name") != 1 or sources != ["live", "cache", "cache", "cache", "cache"]:
+            print(f"❌ Run id cache test failed - {agent.count('store_name')} pipeline runs, sources {sources}")
+            return False
+        
+        print("✅ Run id cache test passed")
+        print(f"Sources: {sources}")
+        return True
+    except Exception as e:
+        print(f"❌ Run id cache test failed: {e}")
+        return False
+
+def test_checkpoint_resume():
+    """Test resuming a failed run from its checkpoints, the fallback and reuse of a run id for another request."""
+    print("\n💾 Testing Checkpoint Resume...")
+    
+    try:
+        import tempfile
+        
+        with tempfile.TemporaryDirectory() as directory:
+            agent = StubAgent(failures={"product": RuntimeError("backend 500")})
+            helper = stub_helper(directory, agent)
+            run_id = helper.checkpoints.new_run_id()
+            failed = helper.generate_comprehensive_store_analysis("Golf", "Austin, TX", run_id, session_id=None)
+            saved = helper.checkpoints.load(run_id)
+            if "error" not in failed or failed["fallback"]["store"] != "Golf Hub" or saved["status"] != "failed":
+                print(f"❌ Checkpoint test failed - failed run: {failed}")
+                return False
+            
+            agent.failures.clear()
+            resumed = helper.generate_comprehensive_store_analysis("Golf", "Austin, TX", run_id, session_id=None)
+            if resumed.get("resumed_stages") != ["branding", "marketing", "store_name"] or agent.count("store_name") != 1:
+                print(f"❌ Checkpoint test failed - resumed stages {resumed.get('resumed_stages')}")
+                return False
+            if helper.checkpoints.load(run_id) is not None:
+                print("❌ Checkpoint test failed - completed run was not deleted")
+                return False
+            
+            # A run id reused for another request starts over instead of serving the Golf stages
+            agent.failures["product"] = RuntimeError("backend 500")
+            reused = helper.checkpoints.new_run_id()
+            helper.generate_comprehensive_store_analysis("Golf", "Denver, CO", reused, session_id=None)
+            agent.failures.clear()
+            other = helper.generate_comprehensive_store_analysis("Tennis", "Boston, MA", reused, session_id=None)
+            archived = helper.search_archived_plans(sport="Golf")
+        
+        if other.get("store_name") != "Tennis Hub" or other.get("resumed_stages") or len(archived) != 1:
+            print(f"❌ Checkpoint test failed - reused run id: {other.get('store_name')}, {other.get('resumed_stages')}")
+            return False
+        
+        print("✅ Checkpoint resume test passed")
+        print(f"Resumed stages: {resumed['resumed_stages']}")
+        return True
+    except Exception as e:
+        print(f"❌ Checkpoint resume test failed: {e}")
+        return False
+
+def test_fallback_deadline():
+    """Test that the checkpoint fallback does not re-run a stage that just missed its deadline."""
+    print("\n⏱️ Testing Fallback Deadlines...")
+    
+    try:
+        import tempfile
+        
+        policy = ModelRoutingPolicy.default()
+        policy.stages["product"].timeout_seconds = 0.2
+        with tempfile.TemporaryDirectory() as directory:
+            agent = StubAgent(delays={"product": 1.0})
+            helper = stub_helper(directory, agent, routing_policy=policy)
+            started = time.perf_counter()
+            response = helper.generate_comprehensive_store_analysis("Golf", "Austin, TX", session_id=None)
+            elapsed = time.perf_counter() - started
+        
+        fallback = response.get("fallback", {})
+        if agent.count("product") != 1 or "timed out" not in fallback.get("goods_name", "") or fallback.get("store") != "Golf Hub":
+            print(f"❌ Fallback deadline test failed - {agent.count('product')} product calls, fallback {fallback}")
+            return False
+        
+        print("✅ Fallback deadline test passed")
+        print(f"Failed request answered in {elapsed:.2f}s")
+        return True
+    except Exception as e:
+        print(f"❌ Fallback deadline test failed: {e}")
+        return False
+
+def test_cache_warmup():
+    """Test that warm-up waits for interactive traffic, reports progress and joins in-flight generations."""
+    print("\n🔥 Testing Cache Warm-up...")
+    
+    try:
+        import tempfile
+        from orchestration.cache_warmup import CacheWarmer, PriorityGate
+        from orchestration.coordination import LocalBackend
+        from orchestration.response_cache import ResponseCache
+        
+        def finish(warmer, timeout=10):
+            deadline = time.monotonic() + timeout
+            while warmer.progress()["running"] and time.monotonic() < deadline:
+                time.sleep(0.05)
+            return warmer.progress()
+        
+        gate, generated = PriorityGate(), []
+        warmer = CacheWarmer(lambda sport, location: generated.append(sport) or {"sport": sport},
+                             lambda sport, location: sport == "Golf", gate,
+                             [("Golf", None), ("Tennis", "Austin, TX"), ("Soccer", None)], pause_seconds=0.05)
+        with gate.interactive():
+            warmer.start()
+            time.sleep(0.3)
+            paused = warmer.progress()
+        progress = finish(warmer)
+        if generated != ["Tennis", "Soccer"] or paused["completed"] or not paused["running"]:
+            print(f"❌ Cache warm-up test failed - ran during interactive traffic: {paused}, generated {generated}")
+            return False
+        if progress["completed"] != 2 or progress["skipped"] != 1 or progress["running"] or progress["gave_up"]:
+            print(f"❌ Cache warm-up test failed - unexpected progress {progress}")
+            return False
+        
+        # Traffic that never goes idle: stopping returns promptly, and an unstopped warmer gives up
+        busy = [CacheWarmer(lambda sport, location: generated.append(sport) or {"sport": sport},
+                            lambda sport, location: False, gate, [("Hockey", None)], pause_seconds=0.05, max_wait_seconds=wait)
+                for wait in (60, 0.3)]
+        with gate.interactive():
+            for warmer in busy:
+                warmer.start()
+            time.sleep(0.1)
+            started = time.monotonic()
+            busy[0].stop(timeout=5)
+            stopped_in = time.monotonic() - started
+            stalled = finish(busy[1], timeout=5)
+        if stopped_in > 1 or busy[0].progress()["running"] or not stalled["gave_up"] or stalled["running"] or "Hockey" in generated:
+            print(f"❌ Cache warm-up test failed - busy traffic: stop took {stopped_in:.2f}s, progress {stalled}")
+            return False
+        
+        # A generation already in flight elsewhere holds the single-flight lock; the warmer waits and reuses its plan
+        with tempfile.TemporaryDirectory() as directory:
+            coordination = LocalBackend()
+            token = coordination.try_lock("flight:" + "|".join(ResponseCache.key("Golf", "Austin, TX", "comprehensive")), 60)
+            agent = StubAgent()
+            helper = stub_helper(directory, agent, coordination=coordination, warmup_pairs=[("Golf", "Austin, TX")])
+            # Past the warmer's one-second pause, so it is waiting on the lock
+            time.sleep(1.5)
+            helper.response_cache.set("Golf", "Austin, TX", {"location": "Austin, TX", "store_name": "Fairway Co"})
+            coordination.unlock("flight:" + "|".join(ResponseCache.key("Golf", "Austin, TX", "comprehensive")), token)
+            warmed = finish(helper.cache_warmer)
+        if agent.calls or warmed["completed"] != 1:
+            print(f"❌ Cache warm-up test failed - warmer duplicated an in-flight generation: {agent.calls}, {warmed}")
+            return False
+        
+        print("✅ Cache warm-up test passed")
+        print(f"Warm-up progress: {progress}")
+        return True
+    except Exception as e:
+        print(f"❌ Cache warm-up test failed: {e}")
+        return False
+
+def test_batch_name_bisection():
+    """Test that an unparsable name batch is split in half, only items left without a name are retried and permanent failures stop the run."""
+    print("\n✂️ Testing Batch Name Bisection...")
+    
+    try:
+        import re
+        import tempfile
+        import httpx
+        import openai
+        from langchain_core.exceptions import OutputParserException
+        from langchain_core.runnables import RunnableLambda
+        from agents.naming_agent import BatchStoreName, BatchStoreNames
+        from orchestration.circuit_breaker import CircuitBreaker, CircuitOpenError
+        
+        batches = []
+        
+        def answer(prompt):
+            indexes = [int(number) for number in re.findall(r"^(\d+)\.", prompt.to_messages()[-1].content, re.M)]
+            batches.append(indexes)
+            if len(indexes) > 2:
+                raise OutputParserException("Could not parse the structured output")
+            # A partial answer: the first half comes back without item 1
+            answered = [0] if indexes == [0, 1] else indexes
+            return BatchStoreNames(names=[BatchStoreName(index=index, store_name=f"Store {index}", tagline="Play on")
+                                          for index in answered])
+        
+        class StubLLM:
+            def __init__(self, respond=answer):
+                self.respond = respond
+            
+            def with_structured_output(self, schema):
+                return RunnableLambda(self.respond)
+        
+        agent = NamingAgent(api_key="sk-test")
+        agent._get_llm = lambda model=None, max_tokens=None: StubLLM()
+        requests = [{"sport": sport} for sport in ("Golf", "Tennis", "Soccer", "Hockey")]
+        results = agent.generate_batch_store_names(requests)
+        
+        names = [result["store_name"] for result in results]
+        if batches != [[0, 1, 2, 3], [0, 1], [2, 3], [1]] or names != ["Store 0", "Store 1", "Store 2", "Store 3"]:
+            print(f"❌ Batch bisection test failed - batches {batches}, names {names}")
+            return False
+        
+        # A connection failure is not fixed by smaller batches: one call, then the whole run fails
+        failed_calls = []
+        def unreachable(prompt):
+            failed_calls.append(prompt)
+            raise openai.APIConnectionError(request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions"))
+        
+        with tempfile.TemporaryDirectory() as directory:
+            helper = stub_helper(directory, breaker=CircuitBreaker(min_calls=1, open_seconds=60))
+            helper.naming_agent = NamingAgent(api_key="sk-test")
+            helper.naming_agent._get_llm = lambda model=None, max_tokens=None: StubLLM(unreachable)
+            many = [{"sport": f"Sport {index}"} for index in range(40)]
+            outcomes = []
+            for _ in range(2):
+                try:
+                    helper.generate_batch_store_names(many)
+                    outcomes.append(None)
+                except Exception as e:
+                    outcomes.append(type(e))
+        
+        # The first failure opens the breaker, so the second run makes no call at all
+        if outcomes != [openai.APIConnectionError, CircuitOpenError] or len(failed_calls) != 1:
+            print(f"❌ Batch bisection test failed - permanent failure made {len(failed_calls)} calls, raised {outcomes}")
+            return False
+        
+        print("✅ Batch bisection test passed")
+        print(f"Calls per batch: {batches}")
+        return True
+    except Exception as e:
+        print(f"❌ Batch bisection test failed: {e}")
+        return False
+
+def test_prefix_cache_report():
+    """Test per-stage prefix cache totals, hit rates and the provider's minimum cacheable prompt length."""
+    print("\n🧷 Testing Prefix Cache Report...")
+    
+    try:
+        from langchain_core.messages import AIMessage
+        from langchain_core.outputs import ChatGeneration, LLMResult
+        from orchestration.prompt_cache import PrefixCacheHandler, PrefixCacheReport
+        
+        def call(handler, prompt_tokens, cached_tokens=0):
+            usage = {"input_tokens": prompt_tokens, "output_tokens": 50, "total_tokens": prompt_tokens + 50,
+                     "input_token_details": {"cache_read": cached_tokens}}
+            message = AIMessage(content="ok", usage_metadata=usage)
+            handler.on_llm_end(LLMResult(generations=[[ChatGeneration(message=message)]]))
+        
+        report = PrefixCacheReport()
+        for cached in (0, 1024):
+            handler = PrefixCacheHandler()
+            call(handler, 2048, cached)
+            report.record("structured_analysis", handler)
+        short = PrefixCacheHandler()
+        call(short, 300)
+        report.record("store_name", short)
+        stages = report.report()
+        
+        analysis, naming = stages["structured_analysis"], stages["store_name"]
+        if analysis["calls"] != 2 or analysis["hit_rate"] != 0.25 or not analysis["cacheable"] or "note" in analysis:
+            print(f"❌ Prefix cache report test failed - cacheable stage {analysis}")
+            return False
+        if naming["cacheable"] or "1024-token minimum" not in naming.get("note", ""):
+            print(f"❌ Prefix cache report test failed - short prompts not flagged {naming}")
+            return False
+        
+        print("✅ Prefix cache report test passed")
+        print(f"Report: {stages}")
+        return True
+    except Exception as e:
+        print(f"❌ Prefix cache report test failed: {e}")
+        return False
+
+def test_early_store_name():
+    """Test that the store name comes first and downstream stages start before branding finishes."""
+    print("\n🏷️ Testing Early Store Name...")
+    
+    try:
+        import tempfile
+        
+        class TimedAgent(StubAgent):
+            """StubAgent that also records when each stage starts and ends and the store name it was given."""
+            
+            def __init__(self, **kwargs):
+                super().__init__(**kwargs)
+                self.started, self.finished, self.names = {}, {}, {}
+            
+            def _answer(self, stage, sport, location, **result):
+                self.started[stage] = time.monotonic()
+                try:
+                    return super()._answer(stage, sport, location, **result)
+                finally:
+                    self.finished[stage] = time.monotonic()
+            
+            def generate_complete_branding(self, sport, location=None, store_name=None, **kwargs):
+                self.names["branding"] = store_name
+                return super().generate_complete_branding(sport, location, **kwargs)
+            
+            def generate_marketing_strategy(self, store_name, sport, location=None, **kwargs):
+                self.names["marketing"] = store_name
+                return super().generate_marketing_strategy(store_name, sport, location, **kwargs)
+            
+            def generate_product_strategy(self, sport, store_name, location=None, **kwargs):
+                self.names["product"] = store_name
+                return super().generate_product_strategy(sport, store_name, location, **kwargs)
+        
+        with tempfile.TemporaryDirectory() as directory:
+            agent = TimedAgent(delays={"branding": 1.0})
+            helper = stub_helper(directory, agent)
+            result = helper.generate_comprehensive_store_analysis("Tennis", "Austin, TX", session_id=None)
+            
+            if result.get("store_name") != "Tennis Hub" or result.get("tagline") != "Play on":
+                print(f"❌ Early store name test failed - store name {result.get('store_name')!r}")
+                return False
+            if agent.started["store_name"] > agent.started["branding"] or agent.finished["store_name"] > agent.started["branding"]:
+                print("❌ Early store name test failed - branding started before the name was known")
+                return False
+            if any(agent.started[stage] >= agent.finished["branding"] for stage in ("marketing", "product")):
+                print("❌ Early store name test failed - downstream stages waited for the branding package")
+                return False
+            if set(agent.names.values()) != {"Tennis Hub"}:
+                print(f"❌ Early store name test failed - downstream stages got {agent.names}")
+                return False
+            lead = agent.finished["branding"] - max(agent.started["marketing"], agent.started["product"])
+            
+            # Without a structured name the pipeline falls back to parsing the branding package
+            agent = TimedAgent()
+            agent.generate_store_name = lambda sport, location=None, **kwargs: {"store_name": "", "tagline": ""}
+            helper = stub_helper(directory, agent)
+            result = helper.generate_comprehensive_store_analysis("Rugby", "Denver, CO", session_id=None)
+            if result.get("store_name") != "Rugby Hub" or agent.count("branding") != 1 or agent.names.get("marketing") != "Rugby Hub":
+                print(f"❌ Early store name test failed - fallback gave {result.get('store_name')!r}")
+                return False
+        
+        print("✅ Early store name test passed")
+        print(f"Downstream stages started {lead:.2f}s before branding finished")
+        return True
+    except Exception as e:
+        print(f"❌ Early store name test failed: {e}")
+        return False
+
+def test_session_history():
+    """Test that session history is kept only for callers with a session id and exports as JSON."""
+    print("\n🗂️ Testing Session History...")
+    
+    try:
+        import tempfile
+        
+        with tempfile.TemporaryDirectory() as directory:
+            helper = stub_helper(directory)
+            result = helper.generate_comprehensive_store_analysis("Tennis", "Austin, TX", session_id="user-1")
+            exported = json.loads(helper.export_analysis(result, "json"))
+            history = exported["conversation_history"]
+            if len(history) != 6 or {message["role"] for message in history} != {"user", "assistant"} \
+                    or helper.get_conversation_history("user-1") != history:
+                print(f"❌ Session history test failed - exported history: {history}")
+                return False
+            
+            # Batch items, plans without a session id and basic runs leave every session untouched
+            helper.generate_batch_store_analyses([{"sport": "Golf", "location": "Austin, TX"}, {"sport": "Golf", "location": "Denver, CO"}])
+            helper.generate_comprehensive_store_analysis("Rugby", "Boise, ID")
+            basic = helper.generate_store_name_and_items("Rugby")
+            sessions = helper.sessions.stats()["sessions"]
+            if sessions != 1 or len(helper.get_conversation_history("user-1")) != 6 or "error" in basic:
+                print(f"❌ Session history test failed - {sessions} sessions after runs without a session id")
+                return False
+        
+        print("✅ Session history test passed")
+        print(f"Exported {len(history)} history messages")
+        return True
+    except Exception as e:
+        print(f"❌ Session history test failed: {e}")
+        return False
+
+def test_single_flight_lease():
+    """Test that a single-flight lock outlives its lease while a slow plan is still generating."""
+    print("\n🪁 Testing Single-Flight Lease...")
+    
+    try:
+        import tempfile
+        from orchestration.coordination import LocalBackend
+        from orchestration.response_cache import ResponseCache
+        
+        with tempfile.TemporaryDirectory() as directory:
+            # Two workers share the coordination backend and cache; the plan takes several leases to generate
+            agent = StubAgent(delays={"product": 1.2})
+            coordination = LocalBackend()
+            shared = {"coordination": coordination, "response_cache": ResponseCache(backend=coordination)}
+            workers = [stub_helper(os.path.join(directory, str(index)), agent, **shared) for index in range(2)]
+            for worker in workers:
+                worker.single_flight_lease = 0.3
+            
+            results = [None, None]
+            def request(index):
+                results[index] = workers[index].generate_comprehensive_store_analysis("Golf", "Austin, TX")
+            threads = [threading.Thread(target=request, args=(index,)) for index in range(2)]
+            threads[0].start()
+            time.sleep(0.5)
+            threads[1].start()
+            for thread in threads:
+                thread.join()
+        
+        if agent.count("store_name") != 1 or not results[1].get("single_flight") or results[0]["store_name"] != results[1]["store_name"]:
+            print(f"❌ Single-flight lease test failed - plan generated {agent.count('store_name')} times")
+            return False
+        
+        print("✅ Single-flight lease test passed")
+        print("Second worker waited for the first worker's plan past the lock's lease")
+        return True
+    except Exception as e:
+        print(f"❌ Single-flight lease test failed: {e}")
+        return False
+
 def run_performance_benchmark():
     """Run a performance benchmark."""
     print("\n⚡ Running Performance Benchmark...")
@@ -198,7 +1523,35 @@ def main():
         ("Comprehensive Analysis", test_comprehensive_analysis),
         ("Market Research Tools", test_market_research_tools),
         ("Memory and Export", test_memory_and_export),
-        ("Error Handling", test_error_handling)
+        ("Error Handling", test_error_handling),
+        ("Model Routing", test_model_routing),
+        ("Demo Corpus", test_demo_corpus),
+        ("Prompt Budgets", test_prompt_budget),
+        ("Session Store", test_session_store),
+        ("Plan Archive", test_plan_archive),
+        ("Tracing", test_tracing),
+        ("Profiling", test_profiling),
+        ("Work Queue", test_work_queue),
+        ("Hedging", test_hedging),
+        ("Circuit Breaker", test_circuit_breaker),
+        ("Location Comparison", test_location_comparison),
+        ("Cassettes", test_cassettes),
+        ("Output Profiles", test_output_profiles),
+        ("Batch Post-processing", test_postprocessing),
+        ("Memory Footprint", test_memory_footprint),
+        ("Semantic Cache", test_semantic_cache),
+        ("Spend Ledger", test_spend_ledger),
+        ("Helper Pool", test_helper_pool),
+        ("Coordination", test_coordination),
+        ("Cache Lookup With Run Ids", test_run_id_cache_lookup),
+        ("Checkpoint Resume", test_checkpoint_resume),
+        ("Fallback Deadlines", test_fallback_deadline),
+        ("Cache Warm-up", test_cache_warmup),
+        ("Batch Name Bisection", test_batch_name_bisection),
+        ("Prefix Cache Report", test_prefix_cache_report),
+        ("Early Store Name", test_early_store_name),
+        ("Session History", test_session_history),
+        ("Single-Flight Lease", test_single_flight_lease)
     ]
     
     passed = 0